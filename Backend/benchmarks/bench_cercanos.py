@@ -0,0 +1,82 @@
+"""Latencia de services.geo_cajeros.IndiceCajeros con cajeros sintéticos.
+
+No usa la base: genera ``--cajeros`` puntos alrededor de ``--lat/--lon``,
+construye el índice y mide ``--consultas`` búsquedas de los ``--limit`` más
+cercanos desde puntos aleatorios de la misma zona. Con ``--verificar``
+compara cada resultado contra una búsqueda por fuerza bruta.
+
+Uso:
+    python -m benchmarks.bench_cercanos --cajeros 50000 --consultas 5000 --verificar
+"""
+import argparse
+import json
+import random
+import time
+from types import SimpleNamespace
+from services.geo_cajeros import IndiceCajeros, GEO_CELDA_GRADOS, haversine
+
+
+def generar(args, rnd):
+    return [
+        SimpleNamespace(
+            cajero_id=f"C{i:09d}",
+            cajero_ubicacion=f"Cajero {i}",
+            cajero_estado="ACTIVO",
+            cajero_latitud=args.lat + rnd.uniform(-args.extension, args.extension),
+            cajero_longitud=args.lon + rnd.uniform(-args.extension, args.extension),
+        )
+        for i in range(args.cajeros)
+    ]
+
+
+def fuerza_bruta(cajeros, lat, lon, radio, limit):
+    distancias = sorted(
+        (haversine(lat, lon, c.cajero_latitud, c.cajero_longitud), c.cajero_id) for c in cajeros
+    )
+    return [cajero_id for d, cajero_id in distancias if d <= radio][:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cajeros", type=int, default=50000)
+    parser.add_argument("--consultas", type=int, default=5000)
+    parser.add_argument("--lat", type=float, default=-0.2)
+    parser.add_argument("--lon", type=float, default=-78.5)
+    parser.add_argument("--extension", type=float, default=2.0, help="Semiancho de la zona en grados")
+    parser.add_argument("--radio", type=float, default=5000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--verificar", action="store_true")
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    cajeros = generar(args, rnd)
+    indice = IndiceCajeros(GEO_CELDA_GRADOS)
+    inicio = time.perf_counter()
+    indice.reconstruir(cajeros, 0)
+    construccion = time.perf_counter() - inicio
+
+    latencias = []
+    errores = 0
+    for _ in range(args.consultas):
+        lat = args.lat + rnd.uniform(-args.extension, args.extension)
+        lon = args.lon + rnd.uniform(-args.extension, args.extension)
+        inicio = time.perf_counter()
+        resultado = indice.cercanos(lat, lon, args.radio, args.limit)
+        latencias.append(time.perf_counter() - inicio)
+        if args.verificar and [r[1] for r in resultado] != fuerza_bruta(cajeros, lat, lon, args.radio, args.limit):
+            errores += 1
+
+    latencias.sort()
+    reporte = {
+        "cajeros": len(indice),
+        "construccion_ms": round(construccion * 1000, 1),
+        "p50_ms": round(latencias[len(latencias) // 2] * 1000, 4),
+        "p99_ms": round(latencias[int(len(latencias) * 0.99) - 1] * 1000, 4),
+    }
+    if args.verificar:
+        reporte["discrepancias"] = errores
+    print(json.dumps(reporte, indent=2))
+
+
+if __name__ == "__main__":
+    main()
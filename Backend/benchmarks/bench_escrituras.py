@@ -0,0 +1,168 @@
+"""Benchmark: sentencias SQL por petición de los endpoints crear_* / actualizar_*.
+
+Crea un cliente nuevo y, con su sesión, crea y actualiza una cuenta, un
+cajero y una tarjeta de cada tipo, y actualiza el cliente; al final borra
+todo lo creado. Cada petición va por ClienteASGI (en el mismo proceso), que
+cuenta las sentencias que ejecutó, y el reporte es un JSON paso -> sentencias.
+
+Para el antes/después se mide la app de otro checkout con ``--app-dir`` (se
+importa su main.py y su config/ en lugar de los de este árbol), por ejemplo
+el commit anterior a escribir las respuestas desde RETURNING:
+
+    git worktree add /tmp/antes <commit>^
+    python -m benchmarks.bench_escrituras --app-dir /tmp/antes/Backend --salida antes.json
+    python -m benchmarks.bench_escrituras --comparar antes.json
+
+Necesita la base configurada en .env con el esquema migrado.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from datetime import date
+
+PASSWORD = "bench-escrituras"
+
+TARJETA = {
+    "tarjeta_nombre": "BENCH ESCRITURAS",
+    "tarjeta_pin_seguridad": "123456",
+    "tarjeta_fecha_caducidad": "2030-12-31",
+    "tarjeta_fecha_emision": date.today().isoformat(),
+    "tarjeta_estado": "ACTIVA",
+    "tarjeta_cvv": "123",
+    "tarjeta_estilo": "CLASICA",
+}
+
+# (ruta de creación, campos extra al crear, cambios al actualizar)
+TARJETAS = {
+    "tarjeta": ("/tarjetas/", {}, {"tarjeta_estado": "INACTIVA"}),
+    "tarjeta_credito": ("/tarjetas-credito/", {
+        "tarjetacredito_cupo": "1500.00", "tarjetacredito_pago_minimo": "50.00", "tarjeta_credito_pago_total": "0.00",
+    }, {"tarjeta_estado": "INACTIVA", "tarjetacredito_cupo": "2000.00"}),
+    "tarjeta_debito": ("/tarjetas-debito/", {}, {"tarjeta_estado": "INACTIVA"}),
+}
+
+
+def cedula_aleatoria(azar):
+    """Cédula de 10 dígitos con dígito verificador válido (prefijo 98, fuera de los clientes sembrados)."""
+    base = "98" + "".join(azar.choice("0123456789") for _ in range(7))
+    suma = 0
+    for i, digito in enumerate(base):
+        producto = int(digito) * (2 if i % 2 == 0 else 1)
+        suma += producto - 9 if producto >= 10 else producto
+    return base + str((10 - suma % 10) % 10)
+
+
+class Pasos:
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.token = None
+        self.sentencias = {}
+
+    async def pedir(self, paso, metodo, ruta, **kwargs):
+        respuesta = await self.cliente.solicitar(metodo, ruta, token=self.token, **kwargs)
+        if respuesta.status != 200:
+            raise RuntimeError(f"{paso}: HTTP {respuesta.status} {respuesta.cuerpo[:200]!r}")
+        if paso is not None:
+            self.sentencias[paso] = respuesta.sentencias
+        return respuesta.json()
+
+
+async def medir(semilla):
+    from main import app
+    from benchmarks.suite.asgi import ClienteASGI
+    from config.database import async_engine
+
+    cliente = ClienteASGI(app)
+    await cliente.iniciar()
+    pasos = Pasos(cliente)
+    cliente_id = cedula_aleatoria(random.Random(semilla))
+    creados = []
+    try:
+        await pasos.pedir("crear_cliente", "POST", "/clientes/", json_={
+            "cliente_id": cliente_id,
+            "cliente_nombres": "Bench",
+            "cliente_apellidos": "Escrituras",
+            "cliente_correo": f"bench{cliente_id}@example.com",
+            "cliente_celular": "0999999999",
+            "cliente_direccion": "Av. Siempre Viva 123",
+            "cliente_provincia": "Pichincha",
+            "cliente_ciudad": "Quito",
+            "cliente_fchnacimiento": "1990-01-01",
+            "cliente_contrasena": PASSWORD,
+        })
+        creados.append(f"/clientes/{cliente_id}")
+        login = await pasos.pedir(None, "POST", "/token", form={"username": cliente_id, "password": PASSWORD})
+        pasos.token = login["access_token"]
+
+        cuenta = await pasos.pedir("crear_cuenta", "POST", "/cuentas/", json_={
+            "cliente_id": cliente_id,
+            "cuenta_nombre": "Bench escrituras",
+            "cuenta_saldo": "100.00",
+            "cuenta_apertura": date.today().isoformat(),
+            "cuenta_estado": "ACTIVA",
+            "cuenta_limite_trans_web": "1000.00",
+            "cuenta_limite_trans_movil": "500.00",
+        })
+        cuenta_id = cuenta["cuenta_id"]
+        creados.append(f"/cuentas/{cuenta_id}")
+        await pasos.pedir("actualizar_cuenta", "PUT", f"/cuentas/{cuenta_id}", json_={
+            "cuenta_nombre": "Bench actualizada", "cuenta_apertura": date.today().isoformat(),
+        })
+
+        cajero = await pasos.pedir("crear_cajero", "POST", "/cajeros/", json_={
+            "cajero_ubicacion": "Bench escrituras", "cajero_tipo": "MULTIFUNCION", "cajero_estado": "INACTIVO",
+        })
+        creados.append(f"/cajeros/{cajero['cajero_id']}")
+        await pasos.pedir("actualizar_cajero", "PUT", f"/cajeros/{cajero['cajero_id']}", json_={"cajero_tipo": "DISPENSADOR"})
+
+        for nombre, (ruta, extra, cambios) in TARJETAS.items():
+            tarjeta = await pasos.pedir(f"crear_{nombre}", "POST", ruta, json_={"cuenta_id": cuenta_id, **TARJETA, **extra})
+            creados.append(f"{ruta}{tarjeta['tarjeta_id']}")
+            await pasos.pedir(f"actualizar_{nombre}", "PUT", f"{ruta}{tarjeta['tarjeta_id']}", json_=cambios)
+
+        await pasos.pedir("actualizar_cliente", "PUT", f"/clientes/{cliente_id}", json_={"cliente_ciudad": "Cuenca"})
+    finally:
+        # Borrar en orden inverso: tarjetas, cajero, cuenta y cliente
+        for ruta in reversed(creados):
+            try:
+                await pasos.pedir(None, "DELETE", ruta)
+            except Exception as e:
+                print(f"No se pudo borrar {ruta}: {e}", file=sys.stderr)
+        await cliente.cerrar()
+        await async_engine.dispose()
+    return pasos.sentencias
+
+
+def comparar(antes, despues):
+    print(f"{'paso':<28}{'antes':>7}{'después':>9}")
+    for paso in despues:
+        previo = antes.get(paso)
+        print(f"{paso:<28}{'-' if previo is None else previo:>7}{despues[paso]:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", help="Directorio Backend de otro checkout cuya app se mide")
+    parser.add_argument("--salida", help="Guardar el reporte JSON en este archivo")
+    parser.add_argument("--comparar", help="Reporte JSON de referencia (antes) contra el que comparar")
+    parser.add_argument("--semilla", type=int)
+    args = parser.parse_args()
+
+    if args.app_dir:
+        # Primero en el path: main y config salen del otro checkout; benchmarks, de este
+        sys.path.insert(0, args.app_dir)
+    resultado = asyncio.run(medir(args.semilla))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            comparar(json.load(archivo), resultado)
+    else:
+        print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Mide el tiempo de services.lotes.aplicar_lote con un lote sintético.
+
+Genera ``-n`` ítems alternando depósitos y retiros sin tarjeta sobre las
+cuentas indicadas, los aplica en una transacción y hace rollback, así que no
+modifica datos.
+
+Uso:
+    python -m benchmarks.bench_lote --cliente 1712345678 --cuentas 1a2b3c4d5e,6f7a8b9c0d --cajero c1 -n 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+from config.database import AsyncSessionLocal, async_engine
+from services.lotes import aplicar_lote
+
+
+def generar_items(args):
+    cuentas = args.cuentas.split(",")
+    items = []
+    for i in range(args.n):
+        item = {
+            "tipo": "deposito" if i % 2 == 0 else "retiro",
+            "cuenta_id": cuentas[i % len(cuentas)],
+            "monto": "1.00",
+            "generar_recibo": i % 10 == 0,
+            "cajero_id": args.cajero,
+        }
+        if item["tipo"] == "retiro":
+            item["usar_tarjeta"] = False
+        items.append(item)
+    return items
+
+
+async def main_async(args):
+    items = generar_items(args)
+    async with AsyncSessionLocal() as db:
+        inicio = time.perf_counter()
+        resultado = await aplicar_lote(db, args.cliente, items)
+        duracion = time.perf_counter() - inicio
+        await db.rollback()
+    await async_engine.dispose()
+    return {
+        "items": len(items),
+        "aplicados": resultado["aplicados"],
+        "rechazados": resultado["rechazados"],
+        "segundos": round(duracion, 3),
+        "items_por_segundo": round(len(items) / duracion, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cliente", required=True)
+    parser.add_argument("--cuentas", required=True, help="IDs de cuenta separados por comas")
+    parser.add_argument("--cajero", required=True)
+    parser.add_argument("-n", type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
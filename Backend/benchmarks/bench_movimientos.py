@@ -0,0 +1,103 @@
+"""Benchmark de latencia del depósito: sentencias secuenciales vs. cadena de CTEs.
+
+Ejecuta contra una base Postgres local el flujo de depósito de dos formas y
+reporta p50/p99 de cada una:
+
+  secuencial: SELECT CUENTA, SELECT CAJERO, INSERT TRANSACCION, INSERT DEPOSITO,
+              UPDATE CUENTA, INSERT RECIBO (un viaje por sentencia, como antes)
+  cte:        services.movimientos.DEPOSITO_CTE (un solo viaje)
+
+Cada iteración se deshace con rollback, así que no modifica datos.
+
+Uso:
+    python -m benchmarks.bench_movimientos --cuenta 1a2b3c4d5e --cliente 1712345678 --cajero c1 -n 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from decimal import Decimal
+import pytz
+from sqlalchemy.sql import text
+from config.database import AsyncSessionLocal, async_engine
+from services.movimientos import DEPOSITO_CTE, nuevo_transaccion_id
+from services.saldos import dia_limite
+
+SECUENCIAL = [
+    text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id AND CUENTA_ESTADO = 'ACTIVA'"),
+    text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id AND CAJERO_ESTADO = 'ACTIVO'"),
+    text("""
+        INSERT INTO TRANSACCION (TRANSACCION_ID, CUENTA_ID, TIPO, TRANSACCION_MONTO,
+            TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO)
+        VALUES (:transaccion_id, :cuenta_id, 'DEPOSITO', :monto, :costo, :fecha, :recibo)
+    """),
+    text("""
+        INSERT INTO DEPOSITO (TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO)
+        VALUES (:transaccion_id, :cuenta_id, :costo, :fecha, :recibo)
+    """),
+    text("UPDATE CUENTA SET CUENTA_SALDO = CUENTA_SALDO + :monto WHERE CUENTA_ID = :cuenta_id"),
+    text("INSERT INTO RECIBO (TRANSACCION_ID, CAJERO_ID, RECIBO_COSTO) VALUES (:transaccion_id, :cajero_id, :recibo_costo)"),
+]
+
+
+def parametros(args):
+    fecha = datetime.now(pytz.UTC)
+    return {
+        "transaccion_id": nuevo_transaccion_id(),
+        "cuenta_id": args.cuenta,
+        "cliente_id": args.cliente,
+        "cajero_id": args.cajero,
+        "monto": Decimal("10.00"),
+        "costo": Decimal("0.50"),
+        "fecha": fecha,
+        "dia": dia_limite(fecha),
+        "recibo": 1,
+        "con_recibo": True,
+        "recibo_costo": Decimal("0.25"),
+    }
+
+
+async def secuencial(db, params):
+    for query in SECUENCIAL:
+        await db.execute(query, params)
+
+
+async def cte(db, params):
+    await db.execute(DEPOSITO_CTE, params)
+
+
+async def medir(nombre, flujo, args):
+    latencias = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(args.n):
+            params = parametros(args)
+            inicio = time.perf_counter()
+            await flujo(db, params)
+            latencias.append(time.perf_counter() - inicio)
+            await db.rollback()
+    latencias.sort()
+    return nombre, {
+        "p50_ms": round(latencias[len(latencias) // 2] * 1000, 3),
+        "p99_ms": round(latencias[int(len(latencias) * 0.99) - 1] * 1000, 3),
+    }
+
+
+async def main_async(args):
+    resultados = dict([await medir("secuencial", secuencial, args), await medir("cte", cte, args)])
+    await async_engine.dispose()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cuenta", required=True)
+    parser.add_argument("--cliente", required=True)
+    parser.add_argument("--cajero", required=True)
+    parser.add_argument("-n", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Historial por cuenta sobre TRANSACCION particionada vs. una copia sin particionar.
+
+Pensado para una base de pruebas, no para producción:
+
+  --sembrar   crea un cliente y ``--cuentas`` cuentas con prefijo B y carga
+              ``--filas`` transacciones repartidas en los últimos ``--meses``
+              meses (crea las particiones que falten).
+  --plana     copia esas filas a BENCH_TRANSACCION_PLANA (sin particionar, con
+              el mismo índice por cuenta y fecha) para comparar; --comparar
+              reutiliza una copia ya creada.
+  --limpiar   borra los datos sembrados y la copia.
+
+Luego mide p50/p99 de las consultas de services.transacciones (primera
+página, página profunda con cursor y un mes con filtro de monto) sobre ambas
+tablas, y agrega por escenario cuántas particiones y buffers tocó un EXPLAIN
+(ANALYZE, BUFFERS).
+
+Uso:
+    python -m benchmarks.bench_particiones --sembrar --plana --filas 50000000 --cuentas 10000
+    python -m benchmarks.bench_particiones -n 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy.sql import text
+from config.database import AsyncSessionLocal, async_engine
+from services.transacciones import consulta_pagina_transacciones, codificar_cursor
+from comandos.particiones import mes_actual, sumar_meses
+
+CLIENTE_BENCH = "B000000000"
+LOTE_SIEMBRA = 1_000_000
+
+SEMBRAR_CLIENTE = text("""
+    INSERT INTO CLIENTE (CLIENTE_ID, CLIENTE_NOMBRES, CLIENTE_APELLIDOS, CLIENTE_CORREO, CLIENTE_CELULAR,
+        CLIENTE_DIRECCION, CLIENTE_PROVINCIA, CLIENTE_CIUDAD, CLIENTE_FCHNACIMIENTO, CLIENTE_CONTRASENA)
+    VALUES (:cliente_id, 'Bench', 'Bench', 'bench@example.com', '0999999999',
+        'N/A', 'Pichincha', 'Quito', DATE '1990-01-01', 'x')
+    ON CONFLICT DO NOTHING
+""")
+SEMBRAR_CUENTAS = text("""
+    INSERT INTO CUENTA (CUENTA_ID, CLIENTE_ID, CUENTA_NOMBRE, CUENTA_SALDO, CUENTA_APERTURA,
+        CUENTA_ESTADO, CUENTA_LIMITE_TRANS_WEB, CUENTA_LIMITE_TRANS_MOVIL)
+    SELECT 'B' || lpad(g::text, 9, '0'), :cliente_id, 'Bench', 0, CURRENT_DATE, 'ACTIVA', 0, 0
+    FROM generate_series(0, :cuentas - 1) g
+    ON CONFLICT DO NOTHING
+""")
+SEMBRAR_TRANSACCIONES = text("""
+    INSERT INTO TRANSACCION (TRANSACCION_ID, CUENTA_ID, TIPO, TRANSACCION_MONTO,
+        TRANSACCION_COSTO, TRANSACCION_FECHA)
+    SELECT 'B' || lpad(to_hex(g), 15, '0'),
+           'B' || lpad((g % :cuentas)::text, 9, '0'),
+           CASE WHEN g % 2 = 0 THEN 'DEPOSITO' ELSE 'RETIRO' END,
+           (g % 500) + 1, 0.50,
+           CAST(:inicio AS TIMESTAMPTZ) + (g * CAST(:segundos AS DOUBLE PRECISION) / :filas) * interval '1 second'
+    FROM generate_series(CAST(:desde AS BIGINT), CAST(:hasta AS BIGINT)) g
+""")
+COPIA_PLANA = [
+    text("DROP TABLE IF EXISTS BENCH_TRANSACCION_PLANA"),
+    text("CREATE TABLE BENCH_TRANSACCION_PLANA AS SELECT * FROM TRANSACCION WHERE CUENTA_ID LIKE 'B%'"),
+    text("""
+        CREATE INDEX IDX_BENCH_PLANA_CUENTA_FECHA
+        ON BENCH_TRANSACCION_PLANA (CUENTA_ID, TRANSACCION_FECHA DESC, TRANSACCION_ID DESC)
+    """),
+    text("ANALYZE BENCH_TRANSACCION_PLANA"),
+]
+LIMPIAR = [
+    text("DROP TABLE IF EXISTS BENCH_TRANSACCION_PLANA"),
+    text("DELETE FROM TRANSACCION WHERE CUENTA_ID LIKE 'B%'"),
+    text("DELETE FROM CUENTA WHERE CLIENTE_ID = :cliente_id"),
+    text("DELETE FROM CLIENTE WHERE CLIENTE_ID = :cliente_id"),
+]
+
+
+def rango(args):
+    fin = datetime.now(pytz.UTC)
+    return fin - timedelta(days=30 * args.meses), fin
+
+
+async def sembrar(args):
+    inicio, fin = rango(args)
+    async with AsyncSessionLocal() as db:
+        primer_mes = sumar_meses(mes_actual(), -args.meses - 1)
+        for n in range(args.meses + 3):
+            await db.execute(text("SELECT CREAR_PARTICION_MENSUAL('transaccion', :mes)"),
+                             {"mes": sumar_meses(primer_mes, n)})
+        await db.execute(SEMBRAR_CLIENTE, {"cliente_id": CLIENTE_BENCH})
+        await db.execute(SEMBRAR_CUENTAS, {"cliente_id": CLIENTE_BENCH, "cuentas": args.cuentas})
+        await db.commit()
+        for desde in range(0, args.filas, LOTE_SIEMBRA):
+            hasta = min(desde + LOTE_SIEMBRA, args.filas) - 1
+            await db.execute(SEMBRAR_TRANSACCIONES, {
+                "cuentas": args.cuentas, "filas": args.filas, "inicio": inicio,
+                "segundos": (fin - inicio).total_seconds(), "desde": desde, "hasta": hasta,
+            })
+            await db.commit()
+            print(f"  {hasta + 1}/{args.filas} filas")
+        await db.execute(text("ANALYZE TRANSACCION"))
+        await db.commit()
+
+
+async def ejecutar(consultas, params=None):
+    async with AsyncSessionLocal() as db:
+        for query in consultas:
+            await db.execute(query, params or {"cliente_id": CLIENTE_BENCH})
+        await db.commit()
+
+
+def escenarios(args, rnd):
+    """Genera (nombre, query, params) con una cuenta al azar en cada llamada."""
+    inicio, fin = rango(args)
+    cuenta = f"B{rnd.randrange(args.cuentas):09d}"
+    medio = inicio + (fin - inicio) / 2
+    mes = medio.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    yield ("primera página",) + consulta_pagina_transacciones(cuenta, 50)
+    yield ("página profunda",) + consulta_pagina_transacciones(cuenta, 50, codificar_cursor(medio, "Z"))
+    yield ("un mes, monto >= 400",) + consulta_pagina_transacciones(
+        cuenta, 50, desde=mes, hasta=mes + timedelta(days=31), monto_min=400
+    )
+
+
+def sobre(query, tabla):
+    return text(query.text.replace("FROM TRANSACCION", f"FROM {tabla}")) if tabla != "TRANSACCION" else query
+
+
+def nodos(plan):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from nodos(hijo)
+
+
+async def medir(args, tabla):
+    rnd = random.Random(7)
+    latencias = {}
+    explicados = {}
+    async with AsyncSessionLocal() as db:
+        for _ in range(args.n):
+            for nombre, query, params in escenarios(args, rnd):
+                query = sobre(query, tabla)
+                inicio = time.perf_counter()
+                (await db.execute(query, params)).fetchall()
+                latencias.setdefault(nombre, []).append(time.perf_counter() - inicio)
+                if nombre not in explicados:
+                    explain = text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.text)
+                    plan = (await db.execute(explain, params)).scalar()
+                    plan = json.loads(plan) if isinstance(plan, str) else plan
+                    raiz = plan[0]["Plan"]
+                    explicados[nombre] = {
+                        "relaciones": len({n["Relation Name"] for n in nodos(raiz) if "Relation Name" in n}),
+                        "buffers": raiz.get("Shared Hit Blocks", 0) + raiz.get("Shared Read Blocks", 0),
+                    }
+        await db.rollback()
+    resultado = {}
+    for nombre, valores in latencias.items():
+        valores.sort()
+        resultado[nombre] = {
+            "p50_ms": round(valores[len(valores) // 2] * 1000, 3),
+            "p99_ms": round(valores[max(0, int(len(valores) * 0.99) - 1)] * 1000, 3),
+            **explicados[nombre],
+        }
+    return resultado
+
+
+async def main_async(args):
+    if args.limpiar:
+        await ejecutar(LIMPIAR)
+        await async_engine.dispose()
+        return {"limpiado": True}
+    if args.sembrar:
+        await sembrar(args)
+    if args.plana:
+        await ejecutar(COPIA_PLANA)
+    resultados = {"particionada": await medir(args, "TRANSACCION")}
+    if args.plana or args.comparar:
+        resultados["plana"] = await medir(args, "BENCH_TRANSACCION_PLANA")
+    await async_engine.dispose()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sembrar", action="store_true")
+    parser.add_argument("--plana", action="store_true", help="Crear la copia sin particionar y comparar")
+    parser.add_argument("--comparar", action="store_true", help="Comparar contra una copia plana ya creada")
+    parser.add_argument("--limpiar", action="store_true")
+    parser.add_argument("--filas", type=int, default=50_000_000)
+    parser.add_argument("--cuentas", type=int, default=10_000)
+    parser.add_argument("--meses", type=int, default=24)
+    parser.add_argument("-n", type=int, default=200, help="Repeticiones por escenario")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
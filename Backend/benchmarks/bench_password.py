@@ -0,0 +1,82 @@
+"""Benchmark: ráfaga de logins con bcrypt en línea vs. pool dedicado.
+
+Simula ``--logins`` verificaciones de contraseña concurrentes (como /token)
+mientras una corrutina mide cada 10 ms la latencia del event loop, que es lo
+que sufre el resto de endpoints. Reporta throughput y p50/p99 de ambos.
+
+Uso:
+    python -m benchmarks.bench_password --logins 200 --rounds 12
+"""
+import argparse
+import asyncio
+import json
+import time
+from passlib.context import CryptContext
+from services.password_hashing import PasswordHasher
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[max(int(len(valores) * p) - 1, 0)]
+
+
+async def sondear_loop(detener, latencias):
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(0.01)
+        latencias.append(time.perf_counter() - inicio - 0.01)
+
+
+async def escenario(verificar, logins, password, hashed):
+    detener = asyncio.Event()
+    latencias_loop = []
+    sonda = asyncio.create_task(sondear_loop(detener, latencias_loop))
+    await asyncio.sleep(0)
+
+    async def login():
+        inicio = time.perf_counter()
+        await verificar(password, hashed)
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    latencias = await asyncio.gather(*(login() for _ in range(logins)))
+    duracion = time.perf_counter() - inicio
+    detener.set()
+    await sonda
+    return {
+        "logins_por_segundo": round(logins / duracion, 1),
+        "login_p50_ms": round(percentil(latencias, 0.50) * 1000, 1),
+        "login_p99_ms": round(percentil(latencias, 0.99) * 1000, 1),
+        "loop_lag_p99_ms": round(percentil(latencias_loop or [0.0], 0.99) * 1000, 1),
+    }
+
+
+async def main_async(args):
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    password = "contrasena-segura"
+    hashed = context.hash(password)
+
+    async def en_linea(pwd, h):
+        return context.verify(pwd, h)
+
+    hasher = PasswordHasher(context, args.workers, max_pending=args.logins)
+    return {
+        "rounds": args.rounds,
+        "logins": args.logins,
+        "workers": args.workers,
+        "en_linea": await escenario(en_linea, args.logins, password, hashed),
+        "pool": await escenario(hasher.verify, args.logins, password, hashed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
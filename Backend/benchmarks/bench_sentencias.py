@@ -0,0 +1,119 @@
+"""Benchmark: CPU por petición con text() en línea vs. el registro de services.sentencias.
+
+Reproduce lo que hace SQLAlchemy en cada execute antes de ir a la base
+(construir el text() si hace falta, generar su cache key y buscar el SQL
+compilado en la caché del motor) para las sentencias de dos endpoints:
+
+  tarjeta   crear_tarjeta: CLIENTE_DE_CUENTA + INSERTAR_TARJETA
+  update    actualizar_tarjeta_credito: el UPDATE parcial con set_clause
+
+Con ``--db`` además mide contra la base configurada la latencia de una
+consulta por clave con y sin sentencias preparadas de psycopg
+(prepare_threshold), que ahorra el parse y el plan del lado del servidor.
+
+Uso:
+    python -m benchmarks.bench_sentencias --iteraciones 50000
+    python -m benchmarks.bench_sentencias --db --consultas 5000
+"""
+import argparse
+import json
+import time
+from sqlalchemy.sql import text
+from sqlalchemy.util import LRUCache
+from config.database import engine, async_engine
+from services.escrituras import set_clause, TARJETA_CREDITO_COLUMNAS, tarjeta_credito_returning
+from services.sentencias import CLIENTE_DE_CUENTA, INSERTAR_TARJETA, sentencia_actualizar
+
+UPDATE_DATOS = {"tarjeta_estado": "ACTIVA", "tarjetacredito_cupo": 1500}
+
+
+def en_linea_tarjeta():
+    return [
+        text("SELECT CLIENTE_ID AS cliente_id FROM CUENTA WHERE CUENTA_ID = :cuenta_id"),
+        text("""
+            INSERT INTO TARJETA (
+                TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
+                TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO,
+                TARJETA_CVV, TARJETA_ESTILO
+            ) VALUES (
+                :tarjeta_id, :cuenta_id, :nombre, :pin_seguridad, :fecha_caducidad,
+                :fecha_emision, :estado, :cvv, :estilo
+            ) RETURNING *
+        """),
+    ]
+
+
+def registro_tarjeta():
+    return [CLIENTE_DE_CUENTA, INSERTAR_TARJETA]
+
+
+def en_linea_update():
+    return [text(f"""
+            UPDATE TARJETA_DE_CREDITO t SET {set_clause(UPDATE_DATOS, TARJETA_CREDITO_COLUMNAS)}
+            FROM CUENTA c
+            WHERE t.CUENTA_ID = c.CUENTA_ID AND t.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
+            RETURNING {tarjeta_credito_returning("t")}
+        """)]
+
+
+def registro_update():
+    return [sentencia_actualizar("tarjeta_credito", tuple(UPDATE_DATOS))]
+
+
+def medir(sentencias, iteraciones):
+    """Microsegundos de CPU por petición hasta tener el SQL compilado de sus sentencias."""
+    dialecto = async_engine.dialect
+    # La misma ruta que Connection.execute: cache key + LRU de SQL compilado del motor
+    cache = LRUCache(500)
+    inicio = time.process_time()
+    for _ in range(iteraciones):
+        for stmt in sentencias():
+            stmt._compile_w_cache(dialecto, compiled_cache=cache, column_keys=[])
+    return round((time.process_time() - inicio) / iteraciones * 1e6, 2)
+
+
+def medir_db(consultas):
+    """Milisegundos por consulta por clave, sin y con sentencias preparadas."""
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        conn.autocommit = True
+        resultados = {}
+        for nombre, umbral in (("sin_preparar", None), ("preparada", 0)):
+            conn.prepare_threshold = umbral
+            inicio = time.perf_counter()
+            for i in range(consultas):
+                conn.execute("SELECT * FROM CUENTA WHERE CUENTA_ID = %s", (f"{i % 1000:010d}",)).fetchall()
+            resultados[nombre] = round((time.perf_counter() - inicio) / consultas * 1000, 4)
+        return resultados
+    finally:
+        raw.close()
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteraciones", type=int, default=50_000)
+    parser.add_argument("--db", action="store_true", help="Medir también sentencias preparadas contra la base")
+    parser.add_argument("--consultas", type=int, default=5000)
+    args = parser.parse_args()
+
+    resultado = {"iteraciones": args.iteraciones}
+    for nombre, en_linea, registro in (
+        ("tarjeta", en_linea_tarjeta, registro_tarjeta),
+        ("update", en_linea_update, registro_update),
+    ):
+        us_en_linea = medir(en_linea, args.iteraciones)
+        us_registro = medir(registro, args.iteraciones)
+        resultado[nombre] = {
+            "en_linea_us": us_en_linea,
+            "registro_us": us_registro,
+            "ahorro_us": round(us_en_linea - us_registro, 2),
+        }
+    if args.db:
+        resultado["db_ms_por_consulta"] = medir_db(args.consultas)
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
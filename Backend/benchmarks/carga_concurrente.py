@@ -0,0 +1,68 @@
+"""Prueba de carga: concurrencia por worker de uvicorn.
+
+Lanza el mismo GET autenticado con distintos niveles de concurrencia contra
+un único worker y reporta el throughput. Con la capa de base de datos
+asíncrona el throughput debe crecer con la concurrencia (hasta el tamaño
+del pool); con la capa síncrona se mantiene plano porque cada consulta
+bloquea el event loop.
+
+Uso (con la API corriendo con un solo worker):
+    uvicorn main:app --workers 1
+    python -m benchmarks.carga_concurrente --cedula 1712345678 --password secreto
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def obtener_token(base_url, cedula, password):
+    data = urllib.parse.urlencode({"username": cedula, "password": password}).encode()
+    with urllib.request.urlopen(f"{base_url}/token", data=data) as resp:
+        return json.load(resp)["access_token"]
+
+
+def peticion(url, token):
+    req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+    inicio = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+    return time.perf_counter() - inicio
+
+
+def medir(url, token, concurrencia, total):
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        inicio = time.perf_counter()
+        latencias = list(pool.map(lambda _: peticion(url, token), range(total)))
+        duracion = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "concurrencia": concurrencia,
+        "peticiones": total,
+        "rps": round(total / duracion, 1),
+        "p50_ms": round(statistics.median(latencias) * 1000, 2),
+        "p99_ms": round(latencias[int(len(latencias) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--cedula", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--ruta", default=None, help="Ruta a medir (por defecto /clientes/{cedula}/cuentas)")
+    parser.add_argument("--niveles", default="1,4,16,32")
+    parser.add_argument("--peticiones", type=int, default=400)
+    args = parser.parse_args()
+
+    token = obtener_token(args.base_url, args.cedula, args.password)
+    url = args.base_url + (args.ruta or f"/clientes/{args.cedula}/cuentas")
+    resultados = [medir(url, token, int(c), args.peticiones) for c in args.niveles.split(",")]
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
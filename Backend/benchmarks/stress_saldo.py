@@ -0,0 +1,92 @@
+"""Prueba de estrés de concurrencia sobre una sola cuenta.
+
+Lanza ``--workers`` tareas que debitan ``--monto`` de la misma cuenta
+``--intentos`` veces cada una, cada débito en su propia transacción, usando
+services.saldos. Al final comprueba que:
+
+    saldo_final == saldo_inicial - debitos_exitosos * monto   y   saldo_final >= 0
+
+Termina con código 1 si se perdió alguna actualización o hubo sobregiro.
+Restaura el saldo inicial al terminar.
+
+Uso (contra una base de pruebas):
+    python -m benchmarks.stress_saldo --cuenta 1a2b3c4d5e --cliente 1712345678 --workers 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from decimal import Decimal
+from sqlalchemy.sql import text
+from config.database import AsyncSessionLocal, async_engine
+from services.saldos import debitar, SaldoInsuficiente
+
+LEER_SALDO = text("SELECT CUENTA_SALDO AS cuenta_saldo FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
+FIJAR_SALDO = text("UPDATE CUENTA SET CUENTA_SALDO = :saldo WHERE CUENTA_ID = :cuenta_id")
+
+
+async def leer_saldo(cuenta_id):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(LEER_SALDO, {"cuenta_id": cuenta_id})).fetchone().cuenta_saldo
+
+
+async def worker(args, monto, contadores):
+    for _ in range(args.intentos):
+        async with AsyncSessionLocal() as db:
+            try:
+                await debitar(db, args.cuenta, args.cliente, monto)
+                await db.commit()
+                contadores["exitosos"] += 1
+            except SaldoInsuficiente:
+                await db.rollback()
+                contadores["rechazados"] += 1
+
+
+async def main_async(args):
+    monto = Decimal(args.monto)
+    saldo_inicial = await leer_saldo(args.cuenta)
+    if args.saldo is not None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(FIJAR_SALDO, {"saldo": Decimal(args.saldo), "cuenta_id": args.cuenta})
+            await db.commit()
+    saldo_prueba = await leer_saldo(args.cuenta)
+
+    contadores = {"exitosos": 0, "rechazados": 0}
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker(args, monto, contadores) for _ in range(args.workers)))
+    duracion = time.perf_counter() - inicio
+    saldo_final = await leer_saldo(args.cuenta)
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(FIJAR_SALDO, {"saldo": saldo_inicial, "cuenta_id": args.cuenta})
+        await db.commit()
+    await async_engine.dispose()
+
+    esperado = saldo_prueba - contadores["exitosos"] * monto
+    reporte = {
+        "saldo_inicial": str(saldo_prueba),
+        "saldo_final": str(saldo_final),
+        "saldo_esperado": str(esperado),
+        **contadores,
+        "debitos_por_segundo": round((contadores["exitosos"] + contadores["rechazados"]) / duracion, 1),
+        "ok": saldo_final == esperado and saldo_final >= 0,
+    }
+    print(json.dumps(reporte, indent=2))
+    return reporte["ok"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cuenta", required=True)
+    parser.add_argument("--cliente", required=True)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--intentos", type=int, default=20)
+    parser.add_argument("--monto", default="1.00")
+    parser.add_argument("--saldo", default="500.00", help="Saldo con el que arranca la prueba")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main_async(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Suite de carga: corre escenarios contra la app real y emite un reporte JSON.
+
+La app de main.py se llama en el mismo proceso por ASGI (ver asgi.py), con su
+lifespan, sus middlewares y la base configurada en el entorno, sobre los
+datos de benchmarks.suite.sembrar. ``--usuarios`` usuarios virtuales eligen
+escenarios según ``--mezcla`` durante ``--duracion`` segundos (las mediciones
+de los primeros ``--calentamiento`` segundos se descartan).
+
+Por paso reporta peticiones, errores, throughput, p50/p95/p99 y sentencias
+SQL por petición. Con ``--comparar`` muestra la diferencia contra un reporte
+anterior y, si se da ``--tolerancia``, termina con código 1 cuando el p95 de
+algún paso empeora más que ese porcentaje.
+
+Uso:
+    python -m benchmarks.suite.sembrar --clientes 10000
+    python -m benchmarks.suite --usuarios 50 --duracion 60 --salida reporte.json
+    python -m benchmarks.suite --salida nuevo.json --comparar reporte.json --tolerancia 10
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+import pytz
+from benchmarks.suite.asgi import ClienteASGI
+from benchmarks.suite.escenarios import ESCENARIOS, UsuarioVirtual, FalloEscenario
+from benchmarks.suite.sembrar import PASSWORD_DEFECTO
+
+MEZCLA_DEFECTO = "login=1,dashboard=4,movimientos=3,historial=2"
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[max(int(len(valores) * p) - 1, 0)]
+
+
+def leer_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        if nombre not in ESCENARIOS:
+            raise argparse.ArgumentTypeError(f"Escenario desconocido: {nombre}")
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Mediciones:
+    def __init__(self):
+        self.activo = False
+        self.pasos = {}
+        self.escenarios = {}
+
+    def paso(self, nombre, respuesta, ok):
+        if not self.activo:
+            return
+        datos = self.pasos.setdefault(nombre, {"latencias": [], "sentencias": [], "errores": 0, "estados": {}})
+        datos["latencias"].append(respuesta.segundos)
+        datos["sentencias"].append(respuesta.sentencias)
+        estado = str(respuesta.status)
+        datos["estados"][estado] = datos["estados"].get(estado, 0) + 1
+        if not ok:
+            datos["errores"] += 1
+
+    def escenario(self, nombre, ok):
+        if not self.activo:
+            return
+        datos = self.escenarios.setdefault(nombre, {"ejecuciones": 0, "fallos": 0})
+        datos["ejecuciones"] += 1
+        if not ok:
+            datos["fallos"] += 1
+
+    def reporte(self, segundos):
+        pasos = {}
+        for nombre, datos in sorted(self.pasos.items()):
+            latencias, sentencias = datos["latencias"], datos["sentencias"]
+            pasos[nombre] = {
+                "peticiones": len(latencias),
+                "errores": datos["errores"],
+                "estados": datos["estados"],
+                "rps": round(len(latencias) / segundos, 1),
+                "p50_ms": round(percentil(latencias, 0.50) * 1000, 2),
+                "p95_ms": round(percentil(latencias, 0.95) * 1000, 2),
+                "p99_ms": round(percentil(latencias, 0.99) * 1000, 2),
+                "sentencias_media": round(sum(sentencias) / len(sentencias), 2),
+                "sentencias_max": max(sentencias),
+            }
+        todas = [l for datos in self.pasos.values() for l in datos["latencias"]] or [0.0]
+        peticiones = sum(p["peticiones"] for p in pasos.values())
+        return {
+            "total": {
+                "segundos": round(segundos, 1),
+                "peticiones": peticiones,
+                "errores": sum(p["errores"] for p in pasos.values()),
+                "rps": round(peticiones / segundos, 1),
+                "p50_ms": round(percentil(todas, 0.50) * 1000, 2),
+                "p95_ms": round(percentil(todas, 0.95) * 1000, 2),
+                "p99_ms": round(percentil(todas, 0.99) * 1000, 2),
+            },
+            "pasos": pasos,
+            "escenarios": dict(sorted(self.escenarios.items())),
+        }
+
+
+async def usuario_virtual(usuario, mezcla, mediciones, fin):
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    while time.perf_counter() < fin:
+        nombre = usuario.azar.choices(nombres, pesos)[0]
+        try:
+            await ESCENARIOS[nombre](usuario)
+            mediciones.escenario(nombre, True)
+        except FalloEscenario:
+            mediciones.escenario(nombre, False)
+            # Sesión inválida o cliente sin datos: el próximo escenario vuelve a loguear
+            usuario.token = None
+
+
+async def correr(args):
+    from main import app
+    from config.database import async_engine
+
+    cliente = ClienteASGI(app)
+    await cliente.iniciar()
+    mediciones = Mediciones()
+    try:
+        usuarios = [
+            UsuarioVirtual(cliente, args.clientes, args.cajeros, args.password, mediciones.paso, args.semilla + i)
+            for i in range(args.usuarios)
+        ]
+        inicio = time.perf_counter()
+        fin = inicio + args.calentamiento + args.duracion
+        tareas = [asyncio.create_task(usuario_virtual(u, args.mezcla, mediciones, fin)) for u in usuarios]
+        await asyncio.sleep(args.calentamiento)
+        mediciones.activo = True
+        medicion = time.perf_counter()
+        await asyncio.gather(*tareas)
+        segundos = time.perf_counter() - medicion
+    finally:
+        await cliente.cerrar()
+        await async_engine.dispose()
+
+    reporte = mediciones.reporte(segundos)
+    reporte["meta"] = {
+        "commit": commit_actual(),
+        "fecha": datetime.now(pytz.UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parametros": {
+            "usuarios": args.usuarios, "duracion": args.duracion, "calentamiento": args.calentamiento,
+            "mezcla": args.mezcla, "clientes": args.clientes, "cajeros": args.cajeros, "semilla": args.semilla,
+        },
+    }
+    return reporte
+
+
+def imprimir(reporte):
+    print(f"{'paso':<24}{'pet':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'sql':>7}")
+    for nombre, p in reporte["pasos"].items():
+        print(f"{nombre:<24}{p['peticiones']:>8}{p['errores']:>6}{p['rps']:>9}"
+              f"{p['p50_ms']:>9}{p['p95_ms']:>9}{p['p99_ms']:>9}{p['sentencias_media']:>7}")
+    t = reporte["total"]
+    print(f"{'total':<24}{t['peticiones']:>8}{t['errores']:>6}{t['rps']:>9}{t['p50_ms']:>9}{t['p95_ms']:>9}{t['p99_ms']:>9}")
+
+
+def comparar(reporte, anterior, tolerancia):
+    """Imprime la diferencia por paso; devuelve los pasos cuyo p95 empeoró más que la tolerancia."""
+    regresiones = []
+    print(f"\nContra {anterior['meta'].get('commit')} ({anterior['meta'].get('fecha')}):")
+    for nombre, p in reporte["pasos"].items():
+        previo = anterior["pasos"].get(nombre)
+        if not previo:
+            continue
+        delta_p95 = (p["p95_ms"] - previo["p95_ms"]) / previo["p95_ms"] * 100 if previo["p95_ms"] else 0.0
+        delta_rps = (p["rps"] - previo["rps"]) / previo["rps"] * 100 if previo["rps"] else 0.0
+        delta_sql = p["sentencias_media"] - previo["sentencias_media"]
+        print(f"  {nombre:<24} p95 {delta_p95:+6.1f}%  rps {delta_rps:+6.1f}%  sql {delta_sql:+.2f}")
+        if tolerancia is not None and delta_p95 > tolerancia:
+            regresiones.append(nombre)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos medidos")
+    parser.add_argument("--calentamiento", type=float, default=5, help="Segundos iniciales descartados")
+    parser.add_argument("--mezcla", type=leer_mezcla, default=leer_mezcla(MEZCLA_DEFECTO),
+                        help=f"Pesos de los escenarios (por defecto {MEZCLA_DEFECTO})")
+    parser.add_argument("--clientes", type=int, default=10_000, help="Clientes sembrados (el mismo valor que en sembrar)")
+    parser.add_argument("--cajeros", type=int, default=500)
+    parser.add_argument("--password", default=PASSWORD_DEFECTO)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", help="Archivo donde guardar el reporte JSON")
+    parser.add_argument("--comparar", help="Reporte JSON anterior contra el que comparar")
+    parser.add_argument("--tolerancia", type=float, help="Empeoramiento máximo del p95 por paso, en %%")
+    args = parser.parse_args()
+
+    reporte = asyncio.run(correr(args))
+    imprimir(reporte)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(reporte, indent=2, ensure_ascii=False))
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        regresiones = comparar(reporte, anterior, args.tolerancia)
+        if regresiones:
+            sys.exit(f"p95 empeoró más de {args.tolerancia}% en: {', '.join(regresiones)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Cliente ASGI mínimo: llama a la app de FastAPI en el mismo proceso, sin red ni httpx.
+
+Además de la respuesta cuenta las sentencias SQL que ejecutó cada petición:
+un listener before_cursor_execute del motor asíncrono suma en el contador
+de la ContextVar, que cada petición fija antes de entrar a la app (las
+sesiones async corren en greenlets que heredan el contexto de la tarea).
+"""
+import asyncio
+import json
+import time
+import urllib.parse
+from contextvars import ContextVar
+from sqlalchemy import event
+from config.database import async_engine
+
+_sentencias = ContextVar("sentencias", default=None)
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _contar_sentencia(conn, cursor, statement, parameters, context, executemany):
+    contador = _sentencias.get()
+    if contador is not None:
+        contador[0] += 1
+
+
+class Respuesta:
+    __slots__ = ("status", "headers", "cuerpo", "segundos", "sentencias")
+
+    def __init__(self, status, headers, cuerpo, segundos, sentencias):
+        self.status = status
+        self.headers = headers
+        self.cuerpo = cuerpo
+        self.segundos = segundos
+        self.sentencias = sentencias
+
+    def json(self):
+        return json.loads(self.cuerpo)
+
+
+class ClienteASGI:
+    def __init__(self, app):
+        self.app = app
+        self._vida = None
+        self._eventos = None
+
+    async def iniciar(self):
+        """Corre el lifespan de la app (startup) como lo haría uvicorn."""
+        self._eventos = asyncio.Queue()
+        respuestas = asyncio.Queue()
+        await self._eventos.put({"type": "lifespan.startup"})
+
+        async def send(mensaje):
+            await respuestas.put(mensaje)
+
+        self._vida = asyncio.create_task(
+            self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, self._eventos.get, send)
+        )
+        mensaje = await respuestas.get()
+        if mensaje["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"La app no arrancó: {mensaje}")
+
+    async def cerrar(self):
+        if self._vida is not None:
+            await self._eventos.put({"type": "lifespan.shutdown"})
+            await self._vida
+
+    async def solicitar(self, metodo, ruta, token=None, json_=None, form=None, params=None, headers=None):
+        cabeceras = dict(headers or {})
+        cuerpo = b""
+        if json_ is not None:
+            cuerpo = json.dumps(json_).encode()
+            cabeceras["content-type"] = "application/json"
+        elif form is not None:
+            cuerpo = urllib.parse.urlencode(form).encode()
+            cabeceras["content-type"] = "application/x-www-form-urlencoded"
+        if token:
+            cabeceras["authorization"] = f"Bearer {token}"
+        cabeceras["content-length"] = str(len(cuerpo))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": metodo,
+            "scheme": "http",
+            "path": ruta,
+            "raw_path": ruta.encode(),
+            "query_string": urllib.parse.urlencode(params or {}).encode(),
+            "root_path": "",
+            "headers": [(k.lower().encode(), str(v).encode()) for k, v in cabeceras.items()],
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+            "state": {},
+        }
+        pendiente = [{"type": "http.request", "body": cuerpo, "more_body": False}]
+        desconexion = asyncio.Event()
+
+        async def receive():
+            if pendiente:
+                return pendiente.pop()
+            # Sin desconexión del cliente hasta terminar (StreamingResponse la escucha)
+            await desconexion.wait()
+            return {"type": "http.disconnect"}
+
+        estado = {}
+        partes = []
+
+        async def send(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["status"] = mensaje["status"]
+                estado["headers"] = {k.decode().lower(): v.decode() for k, v in mensaje.get("headers", [])}
+            elif mensaje["type"] == "http.response.body":
+                partes.append(mensaje.get("body", b""))
+
+        contador = [0]
+        token_ctx = _sentencias.set(contador)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            segundos = time.perf_counter() - inicio
+            desconexion.set()
+            _sentencias.reset(token_ctx)
+        return Respuesta(estado.get("status", 0), estado.get("headers", {}), b"".join(partes), segundos, contador[0])
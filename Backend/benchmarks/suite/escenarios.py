@@ -0,0 +1,102 @@
+"""Escenarios de la suite: lo que hace un cliente típico de la banca web.
+
+Cada escenario es una corrutina que recibe el usuario virtual y hace sus
+peticiones con ``usuario.pedir(paso, ...)``; el nombre del paso es la clave
+con la que se agregan las mediciones en el reporte.
+"""
+import random
+from decimal import Decimal
+from benchmarks.suite.sembrar import cliente_id, cuentas_de, cajero_id
+
+
+class FalloEscenario(Exception):
+    pass
+
+
+class UsuarioVirtual:
+    def __init__(self, cliente, clientes, cajeros, password, registrar, semilla):
+        self.cliente = cliente
+        self.clientes = clientes
+        self.cajeros = cajeros
+        self.password = password
+        self.registrar = registrar
+        self.azar = random.Random(semilla)
+        self.token = None
+        self.g = None
+
+    def elegir_cliente(self):
+        self.g = self.azar.randrange(self.clientes)
+        self.token = None
+
+    @property
+    def cuentas(self):
+        return cuentas_de(self.g)
+
+    async def pedir(self, paso, metodo, ruta, esperado=(200,), **kwargs):
+        respuesta = await self.cliente.solicitar(metodo, ruta, token=self.token, **kwargs)
+        ok = respuesta.status in esperado
+        self.registrar(paso, respuesta, ok)
+        if not ok:
+            raise FalloEscenario(f"{paso}: HTTP {respuesta.status} {respuesta.cuerpo[:200]!r}")
+        return respuesta
+
+    async def asegurar_sesion(self):
+        if self.token is None:
+            await login(self)
+
+
+async def login(usuario):
+    usuario.elegir_cliente()
+    respuesta = await usuario.pedir(
+        "login", "POST", "/token",
+        form={"username": cliente_id(usuario.g), "password": usuario.password},
+    )
+    usuario.token = respuesta.json()["access_token"]
+
+
+async def dashboard(usuario):
+    """Pantalla de inicio: resumen del cliente, límites de la cuenta principal y cajeros."""
+    await usuario.asegurar_sesion()
+    await usuario.pedir("dashboard.resumen", "GET", f"/clientes/{cliente_id(usuario.g)}/resumen")
+    await usuario.pedir("dashboard.limites", "GET", f"/cuentas/{usuario.cuentas[0]}/limites")
+    await usuario.pedir("dashboard.cajeros", "GET", "/cajeros/")
+
+
+async def movimientos(usuario):
+    """Un depósito o un retiro (con o sin tarjeta) en un cajero sembrado al azar."""
+    await usuario.asegurar_sesion()
+    azar = usuario.azar
+    cuenta = azar.choice(usuario.cuentas)
+    cajero = cajero_id(azar.randrange(usuario.cajeros))
+    monto = str(Decimal(azar.randint(100, 20000)) / 100)
+    if azar.random() < 0.5:
+        await usuario.pedir("movimientos.deposito", "POST", "/transacciones/deposito", json_={
+            "cuenta_id": cuenta, "monto": monto, "generar_recibo": azar.random() < 0.2, "cajero_id": cajero,
+        })
+    else:
+        usar_tarjeta = azar.random() < 0.5
+        await usuario.pedir("movimientos.retiro", "POST", "/transacciones/retiro", json_={
+            "cuenta_id": cuenta, "monto": monto, "generar_recibo": azar.random() < 0.2, "cajero_id": cajero,
+            "usar_tarjeta": usar_tarjeta, "tarjeta_id": "ST" + cuenta[1:] if usar_tarjeta else None,
+        })
+
+
+async def historial(usuario, paginas=3):
+    """Primeras páginas del historial de una cuenta siguiendo X-Next-Cursor."""
+    await usuario.asegurar_sesion()
+    cuenta = usuario.azar.choice(usuario.cuentas)
+    params = {"limit": 50}
+    for _ in range(paginas):
+        respuesta = await usuario.pedir("historial.pagina", "GET", f"/cuentas/{cuenta}/transacciones", params=params)
+        cursor = respuesta.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        params = {"limit": 50, "cursor": cursor}
+
+
+ESCENARIOS = {
+    "login": login,
+    "dashboard": dashboard,
+    "movimientos": movimientos,
+    "historial": historial,
+}
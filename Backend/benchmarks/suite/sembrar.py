@@ -0,0 +1,202 @@
+"""Carga una base local de pruebas con volúmenes realistas para benchmarks.suite.
+
+Genera con generate_series (sin pasar filas por Python):
+
+  --clientes       clientes con cédula 99NNNNNNNN y la misma contraseña (--password)
+  1 a 3 cuentas    por cliente (S + 9 dígitos), saldo y límites altos
+  --cajeros        cajeros activos con coordenadas alrededor de Quito
+  tarjetas         una TARJETA y una de débito por cuenta, crédito en una de cada tres
+  --transacciones  movimientos repartidos en los últimos --meses meses
+
+Después reconstruye RESUMEN_CUENTA de las cuentas sembradas (las demás no
+se tocan) y corre ANALYZE. El prefijo 99 no es un código de provincia
+válido y las cuentas de la app son hex en minúsculas, así que los datos
+sembrados no chocan con los reales; --limpiar borra sólo esos.
+
+Uso:
+    python -m benchmarks.suite.sembrar --clientes 10000 --transacciones 2000000
+    python -m benchmarks.suite.sembrar --limpiar
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy.sql import text
+from config.database import AsyncSessionLocal, async_engine
+from services.password_hashing import pwd_context
+from services.resumen_cuentas import reconstruir_resumen
+from comandos.particiones import TABLAS_PARTICIONADAS, mes_actual, sumar_meses
+
+PASSWORD_DEFECTO = "Bench123!"
+LOTE_TRANSACCIONES = 500_000
+# LIKE de las cuentas sembradas: lo usan la reconstrucción del resumen y --limpiar
+CUENTAS_SEMBRADAS = "S%"
+
+
+def cliente_id(g):
+    return f"99{g:08d}"
+
+
+def cuentas_de(g):
+    """Cuentas sembradas del cliente g (misma fórmula que SEMBRAR_CUENTAS)."""
+    return [f"S{g * 3 + k:09d}" for k in range(g % 3 + 1)]
+
+
+def cajero_id(i):
+    return f"S{i:09d}"
+
+
+SEMBRAR = [
+    text("""
+        INSERT INTO CLIENTE (CLIENTE_ID, CLIENTE_NOMBRES, CLIENTE_APELLIDOS, CLIENTE_CORREO, CLIENTE_CELULAR,
+            CLIENTE_DIRECCION, CLIENTE_PROVINCIA, CLIENTE_CIUDAD, CLIENTE_FCHNACIMIENTO, CLIENTE_CONTRASENA)
+        SELECT '99' || lpad(g::text, 8, '0'), 'Cliente ' || g, 'Bench', 'cliente' || g || '@bench.test',
+               '09' || lpad((g % 100000000)::text, 8, '0'), 'Av. Amazonas ' || g, 'Pichincha', 'Quito',
+               DATE '1970-01-01' + (g % 12000), :hash
+        FROM generate_series(0, :clientes - 1) g
+        ON CONFLICT DO NOTHING
+    """),
+    text("""
+        INSERT INTO CUENTA (CUENTA_ID, CLIENTE_ID, CUENTA_NOMBRE, CUENTA_SALDO, CUENTA_APERTURA,
+            CUENTA_ESTADO, CUENTA_LIMITE_TRANS_WEB, CUENTA_LIMITE_TRANS_MOVIL)
+        SELECT 'S' || lpad((c.g * 3 + k)::text, 9, '0'), '99' || lpad(c.g::text, 8, '0'), 'Cuenta ' || (k + 1),
+               100000 + (c.g % 5000), CURRENT_DATE - (c.g % 3000), 'ACTIVA', 1000000, 1000000
+        FROM generate_series(0, :clientes - 1) c(g)
+        CROSS JOIN LATERAL generate_series(0, c.g % 3) k
+        ON CONFLICT DO NOTHING
+    """),
+    text("""
+        INSERT INTO CAJERO (CAJERO_ID, CAJERO_UBICACION, CAJERO_TIPO, CAJERO_ESTADO, CAJERO_LATITUD, CAJERO_LONGITUD)
+        SELECT 'S' || lpad(g::text, 9, '0'), 'Cajero bench ' || g, 'MULTIFUNCION', 'ACTIVO',
+               -0.18 + ((g * 7919) % 1000) / 4000.0, -78.48 + ((g * 104729) % 1000) / 4000.0
+        FROM generate_series(0, :cajeros - 1) g
+        ON CONFLICT DO NOTHING
+    """),
+    text("""
+        INSERT INTO TARJETA (TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD, TARJETA_FECHA_CADUCIDAD,
+            TARJETA_FECHA_EMISION, TARJETA_ESTADO, TARJETA_CVV, TARJETA_ESTILO)
+        SELECT 'ST' || substr(CUENTA_ID, 2), CUENTA_ID, 'BENCH', '123456', CURRENT_DATE + 1460,
+               CURRENT_DATE - 30, 'ACTIVA', '123', 'CLASICA'
+        FROM CUENTA WHERE CUENTA_ID LIKE 'S%'
+        ON CONFLICT DO NOTHING
+    """),
+    text("""
+        INSERT INTO TARJETA_DE_DEBITO (TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
+            TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO, TARJETA_CVV, TARJETA_ESTILO)
+        SELECT 'SD' || substr(CUENTA_ID, 2), CUENTA_ID, 'BENCH', '123456', CURRENT_DATE + 1460,
+               CURRENT_DATE - 30, 'ACTIVA', '123', 'CLASICA'
+        FROM CUENTA WHERE CUENTA_ID LIKE 'S%'
+        ON CONFLICT DO NOTHING
+    """),
+    text("""
+        INSERT INTO TARJETA_DE_CREDITO (TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
+            TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO, TARJETA_CVV, TARJETA_ESTILO,
+            TARJETACREDITO_CUPO, TARJETA_CREDITO_PAGO_MINIMO, TARJETA_CREDITO_PAGO_TOTAL)
+        SELECT 'SC' || substr(CUENTA_ID, 2), CUENTA_ID, 'BENCH', '123456', CURRENT_DATE + 1460,
+               CURRENT_DATE - 30, 'ACTIVA', '123', 'BLACK', 5000, 0, 0
+        FROM CUENTA WHERE CUENTA_ID LIKE 'S%' AND substr(CUENTA_ID, 2)::bigint % 3 = 0
+        ON CONFLICT DO NOTHING
+    """),
+]
+
+# La cuenta de cada movimiento sale de la misma fórmula que SEMBRAR_CUENTAS:
+# cliente g = x % clientes y una de sus g % 3 + 1 cuentas
+SEMBRAR_TRANSACCIONES = text("""
+    INSERT INTO TRANSACCION (TRANSACCION_ID, CUENTA_ID, TIPO, TRANSACCION_MONTO, TRANSACCION_COSTO,
+        TRANSACCION_FECHA, TRANSACCION_DESCRIPCION, TRANSACCION_RECIBO)
+    SELECT 'S' || lpad(to_hex(x), 15, '0'),
+           'S' || lpad(((x % :clientes) * 3 + (x / :clientes) % ((x % :clientes) % 3 + 1))::text, 9, '0'),
+           (ARRAY['DEPOSITO', 'RETIRO', 'RETIRO', 'RETIRO_SIN_TARJETA'])[1 + (x % 4)],
+           round((1 + random() * 499)::numeric, 2), 0.50,
+           now() - random() * CAST(:dias AS INTEGER) * interval '1 day',
+           NULL, CASE WHEN x % 5 = 0 THEN 1 END
+    FROM generate_series(CAST(:desde AS BIGINT), CAST(:hasta AS BIGINT)) x
+    ON CONFLICT DO NOTHING
+""")
+
+LIMPIAR = [
+    text("DELETE FROM RECIBO WHERE TRANSACCION_ID LIKE 'S%' OR CAJERO_ID LIKE 'S%'"),
+    text("DELETE FROM RETIRO_CON_TARJETA WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM RETIRO_SIN_TARJETA WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM RETIRO WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM DEPOSITO WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM TRANSACCION WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM RESUMEN_CUENTA WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM TARJETA WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM TARJETA_DE_DEBITO WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM TARJETA_DE_CREDITO WHERE CUENTA_ID LIKE :cuentas"),
+    text("DELETE FROM CUENTA WHERE CLIENTE_ID LIKE '99%'"),
+    text("DELETE FROM CLIENTE WHERE CLIENTE_ID LIKE '99%'"),
+    text("DELETE FROM CAJERO WHERE CAJERO_ID LIKE 'S%'"),
+]
+
+
+async def crear_particiones(db, meses):
+    """Crea las particiones del rango sembrado si la base ya tiene la migración 0006."""
+    if not (await db.execute(text("SELECT to_regproc('crear_particion_mensual')"))).scalar():
+        return
+    primer_mes = sumar_meses(mes_actual(), -meses)
+    for n in range(meses + 2):
+        for tabla in TABLAS_PARTICIONADAS:
+            await db.execute(text("SELECT CREAR_PARTICION_MENSUAL(:tabla, :mes)"),
+                             {"tabla": tabla, "mes": sumar_meses(primer_mes, n)})
+
+
+async def sembrar(args):
+    inicio = time.perf_counter()
+    params = {
+        "clientes": args.clientes,
+        "cajeros": args.cajeros,
+        "hash": pwd_context.hash(args.password),
+    }
+    async with AsyncSessionLocal() as db:
+        await crear_particiones(db, args.meses)
+        for query in SEMBRAR:
+            await db.execute(query, params)
+        await db.commit()
+        print(f"Clientes, cuentas, cajeros y tarjetas: {time.perf_counter() - inicio:.1f} s")
+
+        for desde in range(0, args.transacciones, LOTE_TRANSACCIONES):
+            hasta = min(desde + LOTE_TRANSACCIONES, args.transacciones) - 1
+            await db.execute(SEMBRAR_TRANSACCIONES, {
+                "clientes": args.clientes, "dias": args.meses * 30, "desde": desde, "hasta": hasta,
+            })
+            await db.commit()
+            print(f"  {hasta + 1}/{args.transacciones} transacciones")
+
+        filas = await reconstruir_resumen(db, patron=CUENTAS_SEMBRADAS)
+        await db.commit()
+        print(f"RESUMEN_CUENTA: {filas} filas")
+        await db.execute(text("ANALYZE"))
+        await db.commit()
+    print(f"Siembra completa en {time.perf_counter() - inicio:.1f} s")
+
+
+async def limpiar():
+    async with AsyncSessionLocal() as db:
+        for query in LIMPIAR:
+            await db.execute(query, {"cuentas": CUENTAS_SEMBRADAS})
+        await db.commit()
+
+
+async def main_async(args):
+    if args.limpiar:
+        await limpiar()
+    else:
+        await sembrar(args)
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=10_000)
+    parser.add_argument("--cajeros", type=int, default=500)
+    parser.add_argument("--transacciones", type=int, default=2_000_000)
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--password", default=PASSWORD_DEFECTO)
+    parser.add_argument("--limpiar", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Archiva los meses cerrados de TRANSACCION y sus subtipos en Parquet.
+
+Para cada mes anterior a la ventana de retención (del más viejo al más nuevo)
+vuelca las particiones de las cinco tablas (las que siguen adjuntas y las que
+comandos.particiones ya movió al esquema ARCHIVO) a
+``ARCHIVO_DIR/<tabla>/mes=AAAA-MM/bucket=NN.parquet``, con compresión zstd y
+filas repartidas por hash de CUENTA_ID y ordenadas por cuenta, fecha e id.
+Recién con los archivos completos publica el manifiesto (el historial y la
+exportación pasan a leer ese mes del archivo) y después borra las particiones.
+Si una corrida anterior murió antes de borrarlas, la siguiente las borra
+primero (los meses del manifiesto cuyas particiones siguen en la base).
+
+Sólo TRANSACCION se lee de vuelta desde la API; los subtipos quedan archivados
+para auditoría. Requiere el paquete "pyarrow" y ARCHIVO_DIR.
+
+Uso:
+    python -m comandos.archivar                      # usa ARCHIVO_RETENER_MESES
+    python -m comandos.archivar --retener-meses 18
+"""
+import argparse
+import os
+import shutil
+import sys
+from datetime import datetime
+import pytz
+from dotenv import load_dotenv
+from config.database import engine
+from comandos.migrar import conectar
+from comandos.particiones import (
+    TABLAS_PARTICIONADAS, ESQUEMA_ARCHIVO, particiones, mes_de_particion, mes_actual, sumar_meses
+)
+from services.archivo import archivo_historial, bucket, ARCHIVO_DIR, ARCHIVO_BUCKETS, ARCHIVO_RETENER_MESES
+from services.transacciones import TRANSACCION_COLUMNAS
+
+load_dotenv()
+
+ARCHIVO_LOTE = 50000
+
+PARTICIONES_ARCHIVO = """
+    SELECT tablename FROM pg_tables WHERE schemaname = %s AND tablename LIKE %s
+"""
+DESASOCIACION_PENDIENTE = "SELECT inhdetachpending FROM pg_inherits WHERE inhrelid = %s::regclass"
+
+
+def tipos_arrow():
+    import pyarrow as pa
+
+    # OID de Postgres -> tipo Arrow (las columnas de montos son NUMERIC(_, 2))
+    return {
+        16: pa.bool_(), 20: pa.int64(), 21: pa.int16(), 23: pa.int32(),
+        25: pa.string(), 1042: pa.string(), 1043: pa.string(),
+        1082: pa.date32(), 1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+        1700: pa.decimal128(18, 2),
+    }
+
+
+def ubicar(conn, tabla, mes):
+    """(nombre calificado, adjunta) de la partición del mes, o None si no existe."""
+    nombre = f"{tabla}_{mes:%Y_%m}"
+    if conn.execute("SELECT to_regclass(%s)", (f"public.{nombre}",)).fetchone()[0]:
+        return f'public."{nombre}"', True
+    if conn.execute("SELECT to_regclass(%s)", (f"{ESQUEMA_ARCHIVO}.{nombre}",)).fetchone()[0]:
+        return f'{ESQUEMA_ARCHIVO}."{nombre}"', False
+    return None
+
+
+def meses_candidatos(conn, limite, desde):
+    meses = {mes_de_particion("transaccion", nombre) for nombre, _, _ in particiones(conn, "transaccion")}
+    for (nombre,) in conn.execute(PARTICIONES_ARCHIVO, (ESQUEMA_ARCHIVO, "transaccion\\_%")).fetchall():
+        meses.add(mes_de_particion("transaccion", nombre))
+    return sorted(mes for mes in meses if mes is not None and mes < limite and (desde is None or mes >= desde))
+
+
+def volcar(conn, tabla, relacion, mes, buckets):
+    """Escribe la partición en un directorio temporal y lo renombra al final; devuelve las filas escritas."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columnas = TRANSACCION_COLUMNAS if tabla == "transaccion" else "*"
+    destino = archivo_historial.directorio / tabla / f"mes={mes:%Y-%m}"
+    temporal = destino.with_name(destino.name + ".tmp")
+    shutil.rmtree(temporal, ignore_errors=True)
+    temporal.mkdir(parents=True)
+    escritores = {}
+    filas = 0
+    with conn.transaction():
+        cursor = conn.cursor(name=f"archivar_{tabla}")
+        cursor.execute(f"SELECT {columnas} FROM {relacion} ORDER BY CUENTA_ID, TRANSACCION_FECHA, TRANSACCION_ID")
+        tipos = tipos_arrow()
+        esquema = pa.schema([(col.name, tipos.get(col.type_code, pa.string())) for col in cursor.description])
+        i_cuenta = esquema.names.index("cuenta_id")
+        while True:
+            lote = cursor.fetchmany(ARCHIVO_LOTE)
+            if not lote:
+                break
+            por_bucket = {}
+            for fila in lote:
+                por_bucket.setdefault(bucket(fila[i_cuenta], buckets), []).append(fila)
+            for numero, grupo in por_bucket.items():
+                if numero not in escritores:
+                    escritores[numero] = pq.ParquetWriter(
+                        temporal / f"bucket={numero:02d}.parquet", esquema, compression="zstd"
+                    )
+                valores = list(zip(*grupo))
+                escritores[numero].write_table(pa.table(
+                    [pa.array(valores[i], type=campo.type) for i, campo in enumerate(esquema)], schema=esquema
+                ))
+            filas += len(lote)
+        cursor.close()
+    for escritor in escritores.values():
+        escritor.close()
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporal, destino)
+    return filas
+
+
+def borrar(conn, tabla, relacion, adjunta):
+    if adjunta:
+        pendiente = conn.execute(DESASOCIACION_PENDIENTE, (relacion,)).fetchone()
+        if pendiente and pendiente[0]:
+            # Un DETACH ... CONCURRENTLY interrumpido sólo se puede terminar con FINALIZE
+            conn.execute(f"ALTER TABLE {tabla} DETACH PARTITION {relacion} FINALIZE")
+        else:
+            conn.execute(f"ALTER TABLE {tabla} DETACH PARTITION {relacion} CONCURRENTLY")
+    conn.execute(f"DROP TABLE {relacion}")
+
+
+def borrar_pendientes(conn, manifiesto):
+    """Borra las particiones de meses ya publicados en el manifiesto que siguen en la base.
+
+    Quedan así si el proceso murió entre publicar() y borrar(); como el mes ya
+    no es candidato (es anterior a "hasta"), sin esto no se borrarían nunca.
+    """
+    for mes_texto in sorted(manifiesto["meses"]):
+        mes = datetime.strptime(mes_texto, "%Y-%m").date()
+        for tabla in TABLAS_PARTICIONADAS:
+            ubicacion = ubicar(conn, tabla, mes)
+            if ubicacion is not None:
+                borrar(conn, tabla, *ubicacion)
+                print(f"Borrada {ubicacion[0]} (ya archivada en {mes_texto})")
+
+
+def archivar(conn, retener_meses):
+    manifiesto = archivo_historial.manifiesto() or {"buckets": ARCHIVO_BUCKETS, "hasta": None, "meses": {}}
+    desde = datetime.strptime(manifiesto["hasta"], "%Y-%m-%d").date() if manifiesto["hasta"] else None
+    limite = sumar_meses(mes_actual(), -retener_meses)
+    borrar_pendientes(conn, manifiesto)
+    archivados = 0
+    for mes in meses_candidatos(conn, limite, desde):
+        relaciones = {tabla: ubicar(conn, tabla, mes) for tabla in TABLAS_PARTICIONADAS}
+        conteos = {}
+        for tabla, ubicacion in relaciones.items():
+            if ubicacion is not None:
+                conteos[tabla] = volcar(conn, tabla, ubicacion[0], mes, manifiesto["buckets"])
+        manifiesto["meses"][f"{mes:%Y-%m}"] = {
+            "filas": conteos,
+            "archivado": datetime.now(pytz.UTC).isoformat(timespec="seconds"),
+        }
+        manifiesto["hasta"] = sumar_meses(mes, 1).isoformat()
+        archivo_historial.publicar(manifiesto)
+        for tabla, ubicacion in relaciones.items():
+            if ubicacion is not None:
+                borrar(conn, tabla, *ubicacion)
+        print(f"Archivado {mes:%Y-%m}: " + ", ".join(f"{t}={n}" for t, n in conteos.items()))
+        archivados += 1
+    return archivados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retener-meses", type=int, default=ARCHIVO_RETENER_MESES,
+                        help="Meses que se quedan en la base (el mes en curso cuenta)")
+    args = parser.parse_args()
+    if not ARCHIVO_DIR:
+        sys.exit("Definir ARCHIVO_DIR con el directorio del archivo")
+    if args.retener_meses < 1:
+        sys.exit("--retener-meses debe ser al menos 1: el mes en curso no se archiva")
+
+    raw, conn = conectar()
+    try:
+        archivados = archivar(conn, args.retener_meses)
+        print(f"{archivados} meses archivados" if archivados else "No hay meses para archivar")
+    finally:
+        conn.autocommit = False
+        raw.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
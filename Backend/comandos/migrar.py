@@ -0,0 +1,285 @@
+"""Aplica las migraciones de Backend/migrations y verifica los planes de las consultas calientes.
+
+Cada archivo NNNN_descripcion.sql se aplica una sola vez, en orden y en su
+propia transacción, y queda registrado en SCHEMA_MIGRACIONES con su checksum.
+Los archivos cuya primera línea es "-- migrar: sin-transaccion" (CREATE INDEX
+CONCURRENTLY, ATTACH PARTITION ...) se ejecutan sentencia por sentencia en
+autocommit. Un pg_advisory_lock evita que dos despliegues migren a la vez.
+Después de migrar crea las particiones mensuales que falten hasta
+PARTICIONES_MESES_FUTUROS meses adelante.
+
+--verificar-planes corre EXPLAIN sobre las consultas calientes con
+enable_seqscan = off y termina con código 1 si un plan tiene un Seq Scan o si
+la columna del filtro caliente de una tabla no está en el Index Cond de su
+scan (queda como Filter sobre la PK u otro índice): es que falta el índice.
+Lo corre el workflow de CI (.github/workflows/backend.yml) tras migrar.
+
+Uso:
+    python -m comandos.migrar                      # aplica las pendientes
+    python -m comandos.migrar --estado             # aplicadas / pendientes / modificadas
+    python -m comandos.migrar --verificar-planes
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+import psycopg
+from config.database import engine
+
+MIGRACIONES_DIR = Path(__file__).resolve().parent.parent / "migrations"
+MARCA_SIN_TRANSACCION = "-- migrar: sin-transaccion"
+LOCK_MIGRACIONES = 72017  # clave de pg_advisory_lock
+
+CREAR_REGISTRO = """
+    CREATE TABLE IF NOT EXISTS SCHEMA_MIGRACIONES (
+        MIGRACION_VERSION  VARCHAR(16)  PRIMARY KEY,
+        MIGRACION_ARCHIVO  VARCHAR(128) NOT NULL,
+        MIGRACION_CHECKSUM VARCHAR(64)  NOT NULL,
+        MIGRACION_APLICADA TIMESTAMPTZ  NOT NULL DEFAULT now()
+    )
+"""
+LEER_REGISTRO = "SELECT MIGRACION_VERSION, MIGRACION_CHECKSUM FROM SCHEMA_MIGRACIONES"
+REGISTRAR = """
+    INSERT INTO SCHEMA_MIGRACIONES (MIGRACION_VERSION, MIGRACION_ARCHIVO, MIGRACION_CHECKSUM)
+    VALUES (%(version)s, %(archivo)s, %(checksum)s)
+"""
+
+# Consultas calientes (las mismas formas que usan los endpoints) con valores de
+# muestra; el plan con enable_seqscan = off no depende de que existan. Cada una
+# lleva la columna del filtro caliente por tabla: en el plan, esa columna tiene
+# que estar en el Index Cond de cada scan de la tabla (o de sus particiones).
+MUESTRA = {"cuenta_id": "0000000000", "cliente_id": "0000000000", "cajero_id": "0000000000",
+           "ids": ["0000000000"], "celular": "0999999999", "clave": "1234", "mes": "2024-01-01"}
+CONSULTAS_CALIENTES = {
+    "historial de la cuenta": ("""
+        SELECT * FROM TRANSACCION WHERE CUENTA_ID = %(cuenta_id)s
+        ORDER BY TRANSACCION_FECHA DESC, TRANSACCION_ID DESC LIMIT 50
+    """, {"transaccion": "cuenta_id"}),
+    "cuentas del cliente": (
+        "SELECT * FROM CUENTA WHERE CLIENTE_ID = %(cliente_id)s ORDER BY CUENTA_ID",
+        {"cuenta": "cliente_id"},
+    ),
+    "tarjetas de la cuenta": ("""
+        SELECT t.* FROM TARJETA t JOIN CUENTA c ON t.CUENTA_ID = c.CUENTA_ID
+        WHERE t.CUENTA_ID = %(cuenta_id)s AND c.CLIENTE_ID = %(cliente_id)s
+    """, {"tarjeta": "cuenta_id"}),
+    "tarjetas de crédito de la cuenta": ("""
+        SELECT tc.* FROM TARJETA_DE_CREDITO tc JOIN CUENTA c ON tc.CUENTA_ID = c.CUENTA_ID
+        WHERE tc.CUENTA_ID = %(cuenta_id)s AND c.CLIENTE_ID = %(cliente_id)s
+    """, {"tarjeta_de_credito": "cuenta_id"}),
+    "tarjetas de débito de la cuenta": ("""
+        SELECT td.* FROM TARJETA_DE_DEBITO td JOIN CUENTA c ON td.CUENTA_ID = c.CUENTA_ID
+        WHERE td.CUENTA_ID = %(cuenta_id)s AND c.CLIENTE_ID = %(cliente_id)s
+    """, {"tarjeta_de_debito": "cuenta_id"}),
+    "tarjetas de las cuentas del cliente": (
+        "SELECT t.* FROM TARJETA t WHERE t.CUENTA_ID = ANY(%(ids)s)",
+        {"tarjeta": "cuenta_id"},
+    ),
+    "cajeros activos": (
+        "SELECT CAJERO_ID FROM CAJERO WHERE CAJERO_ESTADO = 'ACTIVO' ORDER BY CAJERO_ID",
+        {"cajero": "cajero_estado"},
+    ),
+    "cajero del movimiento": (
+        "SELECT 1 FROM CAJERO WHERE CAJERO_ID = %(cajero_id)s AND CAJERO_ESTADO = 'ACTIVO'",
+        {"cajero": "cajero_id"},
+    ),
+    "cobro de retiro sin tarjeta": ("""
+        SELECT * FROM RETIRO_SIN_TARJETA
+        WHERE RETIROST_CELULAR_BENEFICIARIO = %(celular)s AND RETIROST_CLAVE = %(clave)s
+    """, {"retiro_sin_tarjeta": "retirost_celular_beneficiario"}),
+    "recibos del cajero": (
+        "SELECT 1 FROM RECIBO WHERE CAJERO_ID = %(cajero_id)s LIMIT 1",
+        {"recibo": "cajero_id"},
+    ),
+    "resumen mensual": ("""
+        SELECT * FROM RESUMEN_CUENTA WHERE CUENTA_ID = %(cuenta_id)s AND RESUMEN_MES = %(mes)s
+    """, {"resumen_cuenta": "cuenta_id"}),
+}
+
+INDICES_INVALIDOS = """
+    SELECT indexrelid::regclass::text FROM pg_index WHERE NOT indisvalid
+"""
+
+
+class Migracion:
+    __slots__ = ("version", "archivo", "sql", "checksum", "sin_transaccion")
+
+    def __init__(self, ruta):
+        self.archivo = ruta.name
+        self.version = ruta.name.split("_", 1)[0]
+        self.sql = ruta.read_text(encoding="utf-8")
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+        self.sin_transaccion = self.sql.lstrip().startswith(MARCA_SIN_TRANSACCION)
+
+
+def migraciones():
+    return [Migracion(ruta) for ruta in sorted(MIGRACIONES_DIR.glob("[0-9]*.sql"))]
+
+
+def sentencias(sql):
+    """Parte un archivo en sentencias por ';' (sin comentarios de línea).
+
+    Alcanza para las migraciones sin transacción, que son DDL simple sin
+    literales con ';' ni cuerpos de funciones.
+    """
+    limpio = "\n".join(linea for linea in sql.splitlines() if not linea.strip().startswith("--"))
+    return [sentencia.strip() for sentencia in limpio.split(";") if sentencia.strip()]
+
+
+def conectar():
+    raw = engine.raw_connection()
+    conn = raw.driver_connection
+    conn.autocommit = True
+    return raw, conn
+
+
+def aplicadas(conn):
+    conn.execute(CREAR_REGISTRO)
+    return dict(conn.execute(LEER_REGISTRO).fetchall())
+
+
+def aplicar(conn, migracion):
+    registro = {"version": migracion.version, "archivo": migracion.archivo, "checksum": migracion.checksum}
+    if migracion.sin_transaccion:
+        for sentencia in sentencias(migracion.sql):
+            conn.execute(sentencia)
+        conn.execute(REGISTRAR, registro)
+        return
+    with conn.transaction():
+        # Sin parámetros psycopg envía el archivo completo (varias sentencias) de una vez
+        conn.execute(migracion.sql)
+        conn.execute(REGISTRAR, registro)
+
+
+def migrar(conn):
+    conn.execute("SELECT pg_advisory_lock(%s)", (LOCK_MIGRACIONES,))
+    try:
+        hechas = aplicadas(conn)
+        pendientes = 0
+        for migracion in migraciones():
+            checksum = hechas.get(migracion.version)
+            if checksum is not None:
+                if checksum != migracion.checksum:
+                    print(f"AVISO: {migracion.archivo} cambió después de aplicarse; no se vuelve a correr", file=sys.stderr)
+                continue
+            print(f"Aplicando {migracion.archivo}...")
+            aplicar(conn, migracion)
+            pendientes += 1
+        print(f"{pendientes} migraciones aplicadas" if pendientes else "El esquema está al día")
+    finally:
+        conn.execute("SELECT pg_advisory_unlock(%s)", (LOCK_MIGRACIONES,))
+
+
+def estado(conn):
+    hechas = aplicadas(conn)
+    for migracion in migraciones():
+        checksum = hechas.get(migracion.version)
+        if checksum is None:
+            marca = "pendiente"
+        elif checksum != migracion.checksum:
+            marca = "MODIFICADA"
+        else:
+            marca = "aplicada"
+        print(f"{marca:<10} {migracion.archivo}")
+
+
+def nodos(plan):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from nodos(hijo)
+
+
+def es_de_tabla(relacion, tabla):
+    """La relación es la tabla o una de sus particiones mensuales (<tabla>_AAAA_MM)."""
+    return re.fullmatch(rf"{tabla}(_\d{{4}}_\d{{2}})?", relacion) is not None
+
+
+def problemas_del_plan(plan, calientes):
+    """Scans que no usan un índice para el filtro caliente de su tabla.
+
+    Un Seq Scan siempre es un problema. Con enable_seqscan = off y un ORDER BY
+    por la PK, si falta el índice el planner recorre la PK y aplica el filtro
+    caliente como Filter: por eso la columna tiene que estar en el Index Cond
+    (o el Recheck Cond de un Bitmap Heap Scan) del nodo.
+    """
+    problemas = []
+    for nodo in nodos(plan):
+        relacion = nodo.get("Relation Name", "?")
+        if nodo["Node Type"] == "Seq Scan":
+            problemas.append(f"SEQ SCAN {relacion}")
+            continue
+        columna = next((c for tabla, c in calientes.items() if es_de_tabla(relacion, tabla)), None)
+        if columna is None:
+            continue
+        patron = re.compile(rf"\b{columna}\b")
+        condicion = nodo.get("Index Cond", "") + " " + nodo.get("Recheck Cond", "")
+        if patron.search(condicion):
+            continue
+        indice = nodo.get("Index Name") or ",".join(
+            hijo.get("Index Name", "?") for hijo in nodo.get("Plans", [])
+        )
+        if indice.endswith("_pkey"):
+            problemas.append(f"PKEY {relacion} ({indice}, {columna} fuera del Index Cond)")
+        elif patron.search(nodo.get("Filter", "")):
+            problemas.append(f"FILTRO {relacion} ({columna} en Filter, no en el Index Cond)")
+        else:
+            problemas.append(f"SIN INDICE {relacion} ({columna} no está en el Index Cond)")
+    return problemas
+
+
+def verificar_planes(conn):
+    """Devuelve la cantidad de problemas encontrados (0 = todo usa índices)."""
+    problemas = 0
+    cursor = psycopg.ClientCursor(conn)
+    for nombre, (consulta, calientes) in CONSULTAS_CALIENTES.items():
+        with conn.transaction(force_rollback=True):
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN (FORMAT JSON) " + consulta, MUESTRA)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        encontrados = problemas_del_plan(plan[0]["Plan"], calientes)
+        if encontrados:
+            problemas += 1
+            print(f"FALLA     {nombre}: {'; '.join(encontrados)}")
+        else:
+            print(f"ok        {nombre}")
+    for (indice,) in conn.execute(INDICES_INVALIDOS).fetchall():
+        problemas += 1
+        print(f"INVALIDO  {indice} (CREATE INDEX CONCURRENTLY interrumpido: borrarlo y volver a migrar)")
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    accion = parser.add_mutually_exclusive_group()
+    accion.add_argument("--estado", action="store_true", help="Listar migraciones aplicadas y pendientes")
+    accion.add_argument("--verificar-planes", action="store_true",
+                        help="Fallar si una consulta caliente no usa un índice para su filtro")
+    args = parser.parse_args()
+
+    raw, conn = conectar()
+    codigo = 0
+    try:
+        if args.estado:
+            estado(conn)
+        elif args.verificar_planes:
+            codigo = 1 if verificar_planes(conn) else 0
+        else:
+            migrar(conn)
+            # Import local: comandos.particiones importa conectar de este módulo
+            from comandos.particiones import crear_futuras, PARTICIONES_MESES_FUTUROS
+            creadas = crear_futuras(conn, PARTICIONES_MESES_FUTUROS)
+            if creadas:
+                print(f"{creadas} particiones futuras creadas")
+    finally:
+        conn.autocommit = False
+        raw.close()
+        engine.dispose()
+    sys.exit(codigo)
+
+
+if __name__ == "__main__":
+    main()
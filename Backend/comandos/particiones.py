@@ -0,0 +1,143 @@
+"""Mantenimiento de las particiones mensuales de TRANSACCION y sus subtipos.
+
+Crea por adelantado las particiones de los próximos meses (un INSERT con
+fecha sin partición falla; también lo hacen comandos.migrar y cada worker de
+la app, ver services.particiones) y,
+si se indica una retención, desasocia las particiones de meses más viejos y
+las mueve al esquema ARCHIVO: dejan de pesar en los índices y el plan de las
+consultas del historial, pero siguen en la base hasta archivarlas o borrarlas.
+
+Un mes desasociado y todavía no archivado desaparece del historial y de la
+exportación (que leen la tabla particionada y el archivo), así que sólo se
+desasocian meses anteriores a la frontera del manifiesto de ARCHIVO_DIR
+(los que comandos.archivar ya archivó), aunque la retención pida más. Sin
+ARCHIVO_DIR no se desasocia nada.
+
+RESUMEN_CUENTA no se toca, y comandos.reconstruir_resumen conserva las filas
+de los meses desasociados (sólo recalcula desde la partición adjunta más vieja).
+
+Uso:
+    python -m comandos.particiones                    # crea los meses futuros
+    python -m comandos.particiones --retener-meses 24 # además desasocia lo anterior
+    python -m comandos.particiones --estado
+"""
+import argparse
+import os
+import sys
+from datetime import date, datetime
+import pytz
+from dotenv import load_dotenv
+from config.database import engine
+from comandos.migrar import conectar
+from services.archivo import ARCHIVO_DIR, archivo_historial
+from services.particiones import TABLAS_PARTICIONADAS, PARTICIONES_MESES_FUTUROS
+
+load_dotenv()
+
+PARTICIONES_RETENER_MESES = int(os.getenv("PARTICIONES_RETENER_MESES", "0"))  # 0 = no desasociar
+ESQUEMA_ARCHIVO = "archivo"
+
+PARTICIONES = """
+    SELECT c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid)
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = %s::regclass
+    ORDER BY c.relname
+"""
+
+
+def sumar_meses(mes, n):
+    total = mes.year * 12 + mes.month - 1 + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def mes_actual():
+    ahora = datetime.now(pytz.UTC)
+    return date(ahora.year, ahora.month, 1)
+
+
+def mes_de_particion(tabla, nombre):
+    """Mes de una partición <tabla>_AAAA_MM, o None si el nombre no sigue el formato."""
+    sufijo = nombre[len(tabla) + 1:]
+    try:
+        return datetime.strptime(sufijo, "%Y_%m").date()
+    except ValueError:
+        return None
+
+
+def particiones(conn, tabla):
+    return conn.execute(PARTICIONES, (tabla,)).fetchall()
+
+
+def crear_futuras(conn, meses_futuros):
+    inicio = mes_actual()
+    creadas = 0
+    for tabla in TABLAS_PARTICIONADAS:
+        existentes = {nombre for nombre, _, _ in particiones(conn, tabla)}
+        for n in range(meses_futuros + 1):
+            nombre = conn.execute(
+                "SELECT CREAR_PARTICION_MENSUAL(%s, %s)", (tabla, sumar_meses(inicio, n))
+            ).fetchone()[0]
+            if nombre not in existentes:
+                print(f"Creada {nombre}")
+                creadas += 1
+    return creadas
+
+
+def desasociar_viejas(conn, retener_meses):
+    """Desasocia las particiones de meses anteriores a la ventana de retención y las pasa a ARCHIVO.
+
+    Nunca pasa de la frontera del archivo: un mes sin archivar se queda adjunto.
+    """
+    frontera = archivo_historial.limite()
+    if frontera is None:
+        print("No hay meses archivados en ARCHIVO_DIR: no se desasocia nada")
+        return 0
+    limite = min(sumar_meses(mes_actual(), -retener_meses), frontera.date())
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {ESQUEMA_ARCHIVO}")
+    desasociadas = 0
+    for tabla in TABLAS_PARTICIONADAS:
+        for nombre, _, _ in particiones(conn, tabla):
+            mes = mes_de_particion(tabla, nombre)
+            if mes is None or mes >= limite:
+                continue
+            # CONCURRENTLY sólo toma SHARE UPDATE EXCLUSIVE sobre la tabla padre
+            conn.execute(f'ALTER TABLE {tabla} DETACH PARTITION "{nombre}" CONCURRENTLY')
+            conn.execute(f'ALTER TABLE "{nombre}" SET SCHEMA {ESQUEMA_ARCHIVO}')
+            print(f"Desasociada {nombre} -> {ESQUEMA_ARCHIVO}.{nombre}")
+            desasociadas += 1
+    return desasociadas
+
+
+def estado(conn):
+    for tabla in TABLAS_PARTICIONADAS:
+        for nombre, filas, bytes_ in particiones(conn, tabla):
+            print(f"{nombre:<32} ~{max(filas, 0):>12} filas {bytes_ / 1048576:>10.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meses-futuros", type=int, default=PARTICIONES_MESES_FUTUROS)
+    parser.add_argument("--retener-meses", type=int, default=PARTICIONES_RETENER_MESES,
+                        help="Meses a mantener en la tabla particionada (0 = no desasociar)")
+    parser.add_argument("--estado", action="store_true", help="Listar particiones con tamaño estimado")
+    args = parser.parse_args()
+    if args.retener_meses > 0 and not ARCHIVO_DIR:
+        sys.exit("--retener-meses necesita ARCHIVO_DIR: sólo se desasocian meses ya archivados")
+
+    raw, conn = conectar()
+    try:
+        if args.estado:
+            estado(conn)
+            return
+        creadas = crear_futuras(conn, args.meses_futuros)
+        desasociadas = desasociar_viejas(conn, args.retener_meses) if args.retener_meses > 0 else 0
+        print(f"{creadas} particiones creadas, {desasociadas} desasociadas")
+    finally:
+        conn.autocommit = False
+        raw.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Reconstruye RESUMEN_CUENTA a partir del historial de TRANSACCION.
+
+Sirve para la carga inicial tras la migración 0003 y para corregir el
+resumen si se editó TRANSACCION a mano. Bloquea RESUMEN_CUENTA mientras
+corre, así que los movimientos esperan a que termine.
+
+Sólo recalcula los meses que siguen en la base: desde la frontera del
+archivo (manifiesto de comandos.archivar) o la partición adjunta más vieja,
+la que sea posterior. Las filas de meses archivados o desasociados no se
+tocan, porque sus movimientos ya no están en TRANSACCION.
+
+Uso:
+    python -m comandos.reconstruir_resumen              # todas las cuentas
+    python -m comandos.reconstruir_resumen --cuenta 1a2b3c4d5e
+"""
+import argparse
+import asyncio
+import time
+from config.database import AsyncSessionLocal, async_engine
+from services.resumen_cuentas import reconstruir_resumen
+
+
+async def main_async(args):
+    async with AsyncSessionLocal() as db:
+        inicio = time.perf_counter()
+        filas = await reconstruir_resumen(db, args.cuenta)
+        await db.commit()
+    await async_engine.dispose()
+    print(f"RESUMEN_CUENTA reconstruido: {filas} filas (cuenta, mes) en {time.perf_counter() - inicio:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cuenta", help="Reconstruir sólo esta cuenta")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
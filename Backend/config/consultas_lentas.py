@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+import pytz
+from dotenv import load_dotenv
+from config.logs import request_id_actual
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Umbral (ms) a partir del cual una sentencia se registra como lenta; 0 lo desactiva
+CONSULTA_LENTA_MS = float(os.getenv("CONSULTA_LENTA_MS", "200"))
+# Fracción de las sentencias lentas a las que se les captura el plan; 0 lo desactiva.
+# Las lecturas se capturan con EXPLAIN (ANALYZE, BUFFERS); las escrituras, con EXPLAIN sin ejecutarlas
+EXPLAIN_MUESTREO = float(os.getenv("EXPLAIN_MUESTREO", "0"))
+# Planes y sentencias lentas recientes que se guardan en memoria
+EXPLAIN_BUFFER = int(os.getenv("EXPLAIN_BUFFER", "50"))
+EXPLAIN_TIMEOUT_MS = int(os.getenv("EXPLAIN_TIMEOUT_MS", "5000"))
+
+SENTENCIAS_EXPLICABLES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+# Sentencias que escriben o bloquean filas (también CTEs con escrituras y SELECT ... FOR UPDATE)
+_ESCRITURA = re.compile(r"\b(INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+SQL_MAXIMO = 4000
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+
+# Dentro de la captura de un plan: sus propias sentencias no se registran
+_capturando = ContextVar("capturando_plan", default=False)
+
+
+def sin_literales(texto):
+    return _LITERAL_NUMERO.sub("?", _LITERAL_TEXTO.sub("?", texto))
+
+
+def normalizar_sql(statement):
+    """SQL en una línea y sin literales; los valores van como parámetros y no se registran."""
+    return _ESPACIOS.sub(" ", sin_literales(statement)).strip()[:SQL_MAXIMO]
+
+
+def plan_sin_literales(plan):
+    """Plan JSON sin literales en sus textos (Index Cond, Filter...); costos y tiempos se conservan."""
+    if isinstance(plan, dict):
+        return {clave: plan_sin_literales(valor) for clave, valor in plan.items()}
+    if isinstance(plan, list):
+        return [plan_sin_literales(valor) for valor in plan]
+    if isinstance(plan, str):
+        return sin_literales(plan)
+    return plan
+
+
+def huella_sql(sql):
+    return hashlib.sha1(sql.encode()).hexdigest()[:12]
+
+
+def forma_parametros(parameters):
+    """Nombres y tipos de los parámetros, nunca sus valores (pueden ser datos personales)."""
+    if isinstance(parameters, dict):
+        return {nombre: type(valor).__name__ for nombre, valor in parameters.items()}
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        return {"filas": len(parameters), "forma": forma_parametros(parameters[0])}
+    if isinstance(parameters, (list, tuple)):
+        return [type(valor).__name__ for valor in parameters]
+    return None
+
+
+class ConsultasLentas:
+    """Sentencias sobre el umbral y, por muestreo, sus planes de ejecución.
+
+    Cada sentencia lenta se registra en el log (SQL normalizado, forma de los
+    parámetros, duración y ruta) y en un buffer circular. Con EXPLAIN_MUESTREO
+    se captura el plan de una fracción en otra conexión del pool, dentro de
+    una transacción que siempre se revierte y con statement_timeout y
+    lock_timeout acotados. Las lecturas se vuelven a ejecutar con EXPLAIN
+    (ANALYZE, BUFFERS); las escrituras sólo se planifican con EXPLAIN, porque
+    ejecutarlas esperaría los bloqueos de fila de la transacción original, que
+    sigue abierta. Los literales del plan se reemplazan por ``?`` igual que en
+    el SQL. Hay a lo sumo una captura en curso por worker, así que el costo
+    extra queda limitado.
+    """
+
+    def __init__(self, umbral_ms, muestreo, capacidad):
+        self.umbral = umbral_ms / 1000
+        self.muestreo = muestreo
+        self.recientes = deque(maxlen=capacidad)
+        self.planes = deque(maxlen=capacidad)
+        self.total = 0
+        self._capturando = False
+
+    @property
+    def activo(self):
+        return self.umbral > 0
+
+    def registrar(self, statement, parameters, segundos, ruta, executemany):
+        if _capturando.get():
+            return
+        sql = normalizar_sql(statement)
+        entrada = {
+            "huella": huella_sql(sql),
+            "sql": sql,
+            "parametros": forma_parametros(parameters),
+            "duracion_ms": round(segundos * 1000, 1),
+            "ruta": ruta,
+            "request_id": request_id_actual(),
+            "fecha": datetime.now(pytz.UTC).isoformat(timespec="milliseconds"),
+        }
+        self.total += 1
+        self.recientes.append(entrada)
+        logger.warning(
+            "Consulta lenta %.1f ms en %s [%s]: %s parametros=%s",
+            entrada["duracion_ms"], ruta or "-", entrada["huella"], sql, entrada["parametros"],
+        )
+        if (
+            self.muestreo > 0 and not executemany and not self._capturando
+            and sql.split(" ", 1)[0].upper() in SENTENCIAS_EXPLICABLES
+            and random.random() < self.muestreo
+        ):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Motor síncrono (comandos): no hay loop donde capturar en segundo plano
+                return
+            self._capturando = True
+            loop.create_task(self._capturar(statement, parameters, entrada))
+
+    async def _capturar(self, statement, parameters, entrada):
+        from config.database import async_engine
+        from config.instrumentacion import sin_medicion
+
+        _capturando.set(True)
+        sin_medicion()
+        escritura = _ESCRITURA.search(entrada["sql"]) is not None
+        inicio = time.perf_counter()
+        try:
+            async with async_engine.connect() as conn:
+                async with conn.begin() as tx:
+                    await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                    await conn.exec_driver_sql(f"SET LOCAL lock_timeout = {EXPLAIN_TIMEOUT_MS // 5}")
+                    opciones = "FORMAT JSON" if escritura else "ANALYZE, BUFFERS, FORMAT JSON"
+                    result = await conn.exec_driver_sql(f"EXPLAIN ({opciones}) " + statement, parameters)
+                    plan = plan_sin_literales(result.scalar())
+                    await tx.rollback()
+            self.planes.append({
+                **entrada, "plan": plan, "analyze": not escritura,
+                "explain_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            })
+        except Exception as e:
+            logger.warning("No se pudo capturar el plan de [%s]: %s", entrada["huella"], e)
+        finally:
+            self._capturando = False
+
+    def snapshot(self):
+        return {
+            "umbral_ms": self.umbral * 1000,
+            "muestreo_explain": self.muestreo,
+            "total": self.total,
+            "recientes": list(reversed(self.recientes)),
+            "planes": list(reversed(self.planes)),
+        }
+
+
+consultas_lentas = ConsultasLentas(CONSULTA_LENTA_MS, EXPLAIN_MUESTREO, EXPLAIN_BUFFER)
@@ -1,18 +1,66 @@
-# config/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import os
 from dotenv import load_dotenv
+from config.metrics import pool_metrics, InstrumentedQueuePool, InstrumentedAsyncQueuePool
 
 load_dotenv()
 
 DATABASE_URL = f"postgresql+psycopg://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-engine = create_engine(DATABASE_URL)
+
+# Configuración del pool de conexiones (por despliegue, vía variables de entorno)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# psycopg prepara en el servidor un SQL a partir de su N-ésima ejecución en la conexión
+# ("none" lo desactiva, p. ej. detrás de PgBouncer en modo transacción) y guarda hasta DB_PREPARED_MAX
+DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "2")
+DB_PREPARED_MAX = int(os.getenv("DB_PREPARED_MAX", "256"))
+
+pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+connect_args = {
+    "prepare_threshold": None if DB_PREPARE_THRESHOLD.lower() == "none" else int(DB_PREPARE_THRESHOLD),
+}
+if DB_STATEMENT_TIMEOUT_MS > 0:
+    connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, connect_args=connect_args, **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono (psycopg async) para los endpoints async def de la API
+async_engine = create_async_engine(DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, connect_args=connect_args, **pool_options)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def _configurar_conexion(dbapi_connection, connection_record):
+    # En el motor async llega el adaptador de SQLAlchemy; la conexión de psycopg está en driver_connection
+    conexion = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+    conexion.prepared_max = DB_PREPARED_MAX
+
+
+event.listen(engine, "connect", _configurar_conexion)
+event.listen(async_engine.sync_engine, "connect", _configurar_conexion)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_status():
+    return pool_metrics.snapshot(async_engine.pool)
@@ -0,0 +1,161 @@
+import os
+import time
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from sqlalchemy import event
+from config.metrics import route_metrics, pool_metrics
+from config.consultas_lentas import consultas_lentas
+
+load_dotenv()
+
+# Agregar la cabecera Server-Timing (tiempo total y en la base) a cada respuesta
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+RUTA_DESCONOCIDA = "desconocida"
+
+
+class MedicionPeticion:
+    __slots__ = ("sentencias", "db_segundos", "scope")
+
+    def __init__(self, scope):
+        self.sentencias = 0
+        self.db_segundos = 0.0
+        self.scope = scope
+
+    @property
+    def ruta(self):
+        return getattr(self.scope.get("route"), "path_format", None) or RUTA_DESCONOCIDA
+
+
+# Medición de la petición en curso; la heredan las tareas y greenlets que crea el handler
+_medicion = ContextVar("medicion_peticion", default=None)
+
+
+def medicion_actual():
+    return _medicion.get()
+
+
+def sin_medicion():
+    """Excluye de la petición en curso lo que siga en este contexto (tareas en segundo plano)."""
+    _medicion.set(None)
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if consultas_lentas.activo or _medicion.get() is not None:
+        conn.info["inicio_sentencia"] = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop("inicio_sentencia", None)
+    if inicio is None:
+        return
+    segundos = time.perf_counter() - inicio
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.sentencias += 1
+        medicion.db_segundos += segundos
+    if consultas_lentas.activo and segundos >= consultas_lentas.umbral:
+        consultas_lentas.registrar(statement, parameters, segundos, medicion and medicion.ruta, executemany)
+
+
+def instrumentar_motor(engine):
+    """Cuenta sentencias y tiempo en la base de cada petición (sólo dentro de MetricasMiddleware)
+    y registra las sentencias lentas (config.consultas_lentas)."""
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+def server_timing(medicion, segundos):
+    return (
+        f'app;dur={segundos * 1000:.1f}, '
+        f'db;dur={medicion.db_segundos * 1000:.1f};desc="{medicion.sentencias} sentencias"'
+    )
+
+
+class MetricasMiddleware:
+    """Middleware ASGI: mide cada petición HTTP y la agrega en route_metrics por plantilla de ruta.
+
+    Es ASGI puro (sin BaseHTTPMiddleware) para no sumar una tarea por petición
+    ni bufferizar las respuestas en streaming. El tiempo de Server-Timing se
+    toma al empezar la respuesta; el de las métricas, al terminar el cuerpo.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        medicion = MedicionPeticion(scope)
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        estado = 500
+
+        async def send_medido(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                if SERVER_TIMING:
+                    cabecera = server_timing(medicion, time.perf_counter() - inicio)
+                    mensaje = {**mensaje, "headers": [*mensaje.get("headers", []), (b"server-timing", cabecera.encode())]}
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            _medicion.reset(token)
+            route_metrics.observe(
+                scope["method"], medicion.ruta, estado, time.perf_counter() - inicio,
+                medicion.sentencias, medicion.db_segundos
+            )
+
+
+def _etiquetas(**valores):
+    partes = []
+    for nombre, valor in valores.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nombre}="{valor}"')
+    return ",".join(partes)
+
+
+def _histograma(lineas, nombre, etiquetas, snapshot):
+    prefijo = etiquetas + "," if etiquetas else ""
+    for limite, n in snapshot["buckets"].items():
+        lineas.append(f'{nombre}_bucket{{{prefijo}le="{limite}"}} {n}')
+    sufijo = f"{{{etiquetas}}}" if etiquetas else ""
+    lineas.append(f"{nombre}_sum{sufijo} {snapshot['sum']}")
+    lineas.append(f"{nombre}_count{sufijo} {snapshot['count']}")
+
+
+def exposicion_prometheus(pool):
+    """Métricas de rutas y del pool de conexiones en el formato de texto de Prometheus."""
+    rutas = route_metrics.snapshot()
+    lineas = [
+        "# HELP http_requests_total Peticiones HTTP por ruta y código de estado.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (metodo, ruta), datos in rutas.items():
+        for codigo, n in sorted(datos["status"].items()):
+            lineas.append(f"http_requests_total{{{_etiquetas(method=metodo, route=ruta, status=codigo)}}} {n}")
+    histogramas = (
+        ("http_request_duration_seconds", "latency", "Latencia de las peticiones HTTP."),
+        ("http_request_db_seconds", "db_seconds", "Tiempo en la base por petición."),
+        ("http_request_db_statements", "statements", "Sentencias SQL por petición."),
+    )
+    for nombre, campo, ayuda in histogramas:
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} histogram")
+        for (metodo, ruta), datos in rutas.items():
+            _histograma(lineas, nombre, _etiquetas(method=metodo, route=ruta), datos[campo])
+
+    estado = pool_metrics.snapshot(pool)
+    for campo, tipo in (("size", "gauge"), ("checked_out", "gauge"), ("overflow", "gauge"),
+                        ("overflow_events", "counter"), ("timeouts", "counter")):
+        nombre = f"db_pool_{campo}" + ("_total" if tipo == "counter" else "")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        lineas.append(f"{nombre} {estado[campo]}")
+    lineas.append("# TYPE db_pool_wait_seconds histogram")
+    _histograma(lineas, "db_pool_wait_seconds", "", estado["wait_seconds"])
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,197 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+import pytz
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (un objeto por línea) o "texto" para desarrollo local
+LOG_FORMATO = os.getenv("LOG_FORMATO", "json").lower()
+# Registros en espera del escritor; si se llena, los nuevos se descartan en vez de bloquear
+LOG_COLA_MAXIMO = int(os.getenv("LOG_COLA_MAXIMO", "10000"))
+# Muestreo por logger (prefijo=fracción), p. ej. "uvicorn.access=0.1,config.consultas_lentas=0.5".
+# Sólo afecta a registros por debajo de ERROR.
+LOG_MUESTREO = os.getenv("LOG_MUESTREO", "")
+
+_request_id = ContextVar("request_id", default=None)
+
+_ATRIBUTOS_RECORD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+_CAMPOS_SENSIBLES = re.compile(r"pass|contras|token|secret|pin|cvv|clave|authorization", re.IGNORECASE)
+_REDACCIONES = (
+    (re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]+"), "<jwt>"),
+    (re.compile(r"(?i)\b(password|contrase(?:ñ|n)a|token|pin|cvv|clave)(\s*[=:]\s*)\S+"), r"\1\2<redactado>"),
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "<correo>"),
+    (re.compile(r"\b\d{13,19}\b"), "<tarjeta>"),
+    (re.compile(r"\b\d{10}\b"), "<identificacion>"),
+)
+
+
+def request_id_actual():
+    return _request_id.get()
+
+
+def redactar(texto):
+    """Quita de un texto tokens, contraseñas, correos, números de tarjeta y cédulas/celulares."""
+    for patron, reemplazo in _REDACCIONES:
+        texto = patron.sub(reemplazo, texto)
+    return texto
+
+
+def leer_muestreo(texto):
+    fracciones = {}
+    for parte in filter(None, (p.strip() for p in texto.split(","))):
+        nombre, _, fraccion = parte.partition("=")
+        fracciones[nombre.strip()] = float(fraccion)
+    return fracciones
+
+
+class ContextoFilter(logging.Filter):
+    """Agrega el request_id al registro y aplica el muestreo por logger.
+
+    Corre en el hilo que loguea (la ContextVar sólo se ve ahí), antes de
+    encolar, así que los registros descartados no llegan a formatearse.
+    """
+
+    def __init__(self, muestreo):
+        super().__init__()
+        self.muestreo = sorted(muestreo.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def fraccion(self, nombre):
+        for prefijo, fraccion in self.muestreo:
+            if nombre == prefijo or nombre.startswith(prefijo + "."):
+                return fraccion
+        return 1.0
+
+    def filter(self, record):
+        if self.muestreo and record.levelno < logging.ERROR and random.random() >= self.fraccion(record.name):
+            return False
+        record.request_id = _request_id.get()
+        return True
+
+
+class ColaHandler(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloquea y deja el formateo (JSON, redacción) al hilo escritor."""
+
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record):
+        # El mensaje se arma acá (los args pueden cambiar después); la traza pasa como texto
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, pytz.UTC).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": redactar(record.getMessage()),
+        }
+        if getattr(record, "request_id", None):
+            datos["request_id"] = record.request_id
+        for clave, valor in record.__dict__.items():
+            if clave not in _ATRIBUTOS_RECORD:
+                datos[clave] = "<redactado>" if _CAMPOS_SENSIBLES.search(clave) else valor
+        if record.exc_text:
+            datos["excepcion"] = redactar(record.exc_text)
+        return json.dumps(datos, default=str, ensure_ascii=False)
+
+
+class TextoFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        record.request_id = getattr(record, "request_id", None) or "-"
+        return redactar(super().format(record))
+
+
+_listener = None
+cola_handler = None
+
+
+def configurar_logs():
+    """Reemplaza logging.basicConfig: el hilo de la petición sólo encola; un
+    QueueListener formatea y escribe en stdout. También redirige los loggers
+    de uvicorn a este pipeline. Es idempotente."""
+    global _listener, cola_handler
+    if _listener is not None:
+        return
+    cola = queue.Queue(maxsize=LOG_COLA_MAXIMO)
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(JsonFormatter() if LOG_FORMATO == "json" else TextoFormatter())
+    cola_handler = ColaHandler(cola)
+    cola_handler.addFilter(ContextoFilter(leer_muestreo(LOG_MUESTREO)))
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(cola_handler)
+    raiz.setLevel(LOG_LEVEL)
+    for nombre in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger = logging.getLogger(nombre)
+        logger.handlers.clear()
+        logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+_REQUEST_ID_VALIDO = re.compile(r"^[\w.-]{1,64}$")
+
+
+class RequestIdMiddleware:
+    """Middleware ASGI: toma X-Request-ID (o genera uno), lo deja en el
+    contexto para los logs y lo devuelve en la respuesta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for nombre, valor in scope["headers"]:
+            if nombre == b"x-request-id":
+                request_id = valor.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_VALIDO.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_con_id(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje = {**mensaje, "headers": [*mensaje.get("headers", []), (b"x-request-id", request_id.encode())]}
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_id)
+        finally:
+            _request_id.reset(token)
@@ -0,0 +1,139 @@
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Buckets (segundos) para la espera de conexiones del pool
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Buckets (segundos) para la latencia de las peticiones y su tiempo en la base
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+# Buckets para el número de sentencias SQL por petición
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos, seguro entre hilos."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        acumulado = 0
+        buckets = {}
+        for limite, n in zip(self.buckets, counts):
+            acumulado += n
+            buckets[str(limite)] = acumulado
+        buckets["+Inf"] = count
+        return {"buckets": buckets, "sum": total, "count": count}
+
+
+class PoolMetrics:
+    """Contadores del pool de conexiones: espera de checkout, overflow y timeouts."""
+
+    def __init__(self):
+        self.wait_seconds = Histogram(POOL_WAIT_BUCKETS)
+        self.overflow_events = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def _incr(self, campo):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def snapshot(self, pool):
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class _MetricasRuta:
+    def __init__(self):
+        self.latency = Histogram(REQUEST_BUCKETS)
+        self.db_seconds = Histogram(REQUEST_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.status = {}
+
+
+class RouteMetrics:
+    """Por (método, plantilla de ruta): latencia, tiempo en la base, sentencias SQL y códigos de estado."""
+
+    def __init__(self):
+        self._rutas = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method, route, status, seconds, statements, db_seconds):
+        clave = (method, route)
+        metricas = self._rutas.get(clave)
+        if metricas is None:
+            with self._lock:
+                metricas = self._rutas.setdefault(clave, _MetricasRuta())
+        metricas.latency.observe(seconds)
+        metricas.db_seconds.observe(db_seconds)
+        metricas.statements.observe(statements)
+        with self._lock:
+            metricas.status[status] = metricas.status.get(status, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            rutas = list(self._rutas.items())
+            estados = {clave: dict(metricas.status) for clave, metricas in rutas}
+        return {
+            clave: {
+                "status": estados[clave],
+                "latency": metricas.latency.snapshot(),
+                "db_seconds": metricas.db_seconds.snapshot(),
+                "statements": metricas.statements.snapshot(),
+            }
+            for clave, metricas in rutas
+        }
+
+
+route_metrics = RouteMetrics()
+
+
+class _InstrumentedPoolMixin:
+    def _do_get(self):
+        overflow_antes = self._overflow
+        inicio = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics._incr("timeouts")
+            raise
+        finally:
+            pool_metrics.wait_seconds.observe(time.perf_counter() - inicio)
+        if self._overflow > overflow_antes and self._overflow > 0:
+            pool_metrics._incr("overflow_events")
+        return conn
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dotenv import load_dotenv
+from config.instrumentacion import MetricasMiddleware, RUTA_DESCONOCIDA
+
+load_dotenv()
+
+# Duración máxima de una captura de /debug/profile
+PERFIL_MAXIMO_SEGUNDOS = float(os.getenv("PERFIL_MAXIMO_SEGUNDOS", "60"))
+
+_CODIGO_MIDDLEWARE = MetricasMiddleware.__call__.__code__
+# Funciones donde un hilo del pool está esperando trabajo (no consume CPU)
+_ESPERAS = {("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker")}
+
+
+class PerfiladorOcupado(Exception):
+    pass
+
+
+def nombre_frame(frame):
+    codigo = frame.f_code
+    return f"{os.path.basename(codigo.co_filename)}:{codigo.co_qualname}"
+
+
+def pila_hilo(frame):
+    """Frames del hilo, del más externo al que se está ejecutando."""
+    pila = []
+    while frame is not None:
+        pila.append(frame)
+        frame = frame.f_back
+    pila.reverse()
+    return pila
+
+
+def pila_tarea(tarea):
+    """Frames de una tarea suspendida siguiendo la cadena de awaits."""
+    pila = []
+    corrutina = tarea.get_coro()
+    while corrutina is not None:
+        frame = getattr(corrutina, "cr_frame", None) or getattr(corrutina, "gi_frame", None)
+        if frame is None:
+            break
+        pila.append(frame)
+        corrutina = getattr(corrutina, "cr_await", None) or getattr(corrutina, "gi_yieldfrom", None)
+    return pila
+
+
+def ruta_de(pila):
+    """Plantilla de ruta de la petición a la que pertenece la pila (vía el frame de MetricasMiddleware)."""
+    for frame in pila:
+        if frame.f_code is _CODIGO_MIDDLEWARE:
+            medicion = frame.f_locals.get("medicion")
+            return medicion.ruta if medicion is not None else RUTA_DESCONOCIDA
+    return None
+
+
+def inactivo(pila):
+    hoja = pila[-1].f_code
+    return (os.path.basename(hoja.co_filename), hoja.co_name) in _ESPERAS
+
+
+class Perfilador:
+    """Perfilador por muestreo: sys._current_frames() a ``hz`` veces por segundo desde un hilo aparte.
+
+    Cada muestra del hilo del event loop se etiqueta con la ruta de la
+    petición que se está ejecutando (o ``(loop)`` si está en el selector,
+    esperando E/S); las de otros hilos, con ``hilo:<nombre>`` (p. ej. los de
+    bcrypt), omitiendo los que esperan trabajo. Si se pasa ``loop`` también se
+    muestrean las peticiones suspendidas en un await (``espera:<ruta>``), que
+    muestran dónde se va el tiempo de pared, por ejemplo esperando a la base.
+    La salida es el formato "collapsed" de flamegraph.pl / speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def perfilar(self, segundos, hz, hilo_loop, loop=None, excluir=None):
+        if not self._lock.acquire(blocking=False):
+            raise PerfiladorOcupado()
+        try:
+            return self._muestrear(segundos, 1 / hz, hilo_loop, loop, excluir)
+        finally:
+            self._lock.release()
+
+    def _muestrear(self, segundos, intervalo, hilo_loop, loop, excluir):
+        propio = threading.get_ident()
+        pilas = Counter()
+        muestras = 0
+        fin = time.perf_counter() + segundos
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                pila = pila_hilo(frame)
+                if ident == hilo_loop:
+                    etiqueta = ruta_de(pila) or "(loop)"
+                elif inactivo(pila):
+                    continue
+                else:
+                    etiqueta = f"hilo:{nombres.get(ident, ident)}"
+                pilas[";".join([etiqueta, *map(nombre_frame, pila)])] += 1
+            if loop is not None:
+                for tarea in asyncio.all_tasks(loop):
+                    if tarea is excluir:
+                        continue
+                    pila = pila_tarea(tarea)
+                    # La tarea en ejecución ya salió en la pila del hilo del loop
+                    if not pila or getattr(tarea.get_coro(), "cr_running", False):
+                        continue
+                    ruta = ruta_de(pila)
+                    if ruta is not None:
+                        pilas[";".join([f"espera:{ruta}", *map(nombre_frame, pila)])] += 1
+            muestras += 1
+            time.sleep(max(intervalo - (time.perf_counter() - inicio), 0))
+        texto = "".join(f"{pila} {n}\n" for pila, n in sorted(pilas.items()))
+        return texto, muestras
+
+
+perfilador = Perfilador()
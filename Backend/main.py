@@ -1,6 +1,6 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Response, Header, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
@@ -9,34 +9,85 @@ import os
 import pytz
 from dotenv import load_dotenv
 from uuid import uuid4
-from config.database import get_db
+from config.database import get_async_db, pool_status, engine, async_engine
+from config.instrumentacion import MetricasMiddleware, instrumentar_motor, exposicion_prometheus
+from config.consultas_lentas import consultas_lentas
+from config.logs import configurar_logs, RequestIdMiddleware
+from config.perfilador import perfilador, PerfiladorOcupado, PERFIL_MAXIMO_SEGUNDOS
+from services.auth_cache import principal_cache, AUTH_STATELESS
+from services.password_hashing import password_hasher, PasswordPoolSaturated
+from services.idempotencia import idempotency_store, huella, ConflictoIdempotencia
+from services.saldos import debitar, dia_limite, LEER_LIMITES, CuentaNoDisponible, LimiteExcedido, SaldoInsuficiente
+from services.movimientos import (
+    registrar_deposito, registrar_retiro, parametros_deposito, parametros_retiro, nuevo_transaccion_id,
+    CajeroNoDisponible, TarjetaNoDisponible
+)
+from services.cache_cajeros import cache_cajeros, coincide_etag
+from services.geo_cajeros import indice_cajeros
+from services.resumen import (
+    resumen_cliente, CLIENTE_CON_CUENTAS,
+    RESUMEN_TRANSACCIONES_DEFECTO, RESUMEN_TRANSACCIONES_MAXIMO
+)
+from services.resumen_cuentas import ACUMULAR_RESUMEN, LEER_RESUMEN
+from services.particiones import mantener_particiones, exposicion_particiones
+from services.lotes import leer_lote, aplicar_lote, LoteInvalido, LoteDemasiadoGrande
+from services.escrituras import escribir_returning
+from services.sentencias import (
+    sentencia_actualizar, EXISTE_CLIENTE, CLIENTE_POR_ID, ACTUALIZAR_CONTRASENA, INSERTAR_CLIENTE, ELIMINAR_CLIENTE,
+    INSERTAR_CUENTA, CUENTA_POR_ID, CUENTAS_POR_CLIENTE, CLIENTE_DE_CUENTA, ELIMINAR_CUENTA,
+    CUENTA_DEL_CLIENTE, EXISTE_CUENTA_DEL_CLIENTE,
+    INSERTAR_CAJERO, CAJERO_POR_ID, ELIMINAR_CAJERO,
+    INSERTAR_TARJETA, TARJETAS_POR_CUENTA, TARJETA_DEL_CLIENTE, ELIMINAR_TARJETA,
+    INSERTAR_TARJETA_CREDITO, TARJETAS_CREDITO_POR_CUENTA, TARJETA_CREDITO_DEL_CLIENTE,
+    FILA_TARJETA_CREDITO_DEL_CLIENTE, ELIMINAR_TARJETA_CREDITO,
+    INSERTAR_TARJETA_DEBITO, TARJETAS_DEBITO_POR_CUENTA, TARJETA_DEBITO_DEL_CLIENTE, ELIMINAR_TARJETA_DEBITO,
+    INSERTAR_TRANSACCION, INSERTAR_RETIRO, INSERTAR_RETIRO_SIN_TARJETA
+)
+from services.transacciones import (
+    pagina_transacciones, codificar_cursor, CursorInvalido,
+    consulta_exportacion_transacciones, exportar_transacciones, alcanza_archivo, lotes_archivados, acepta_gzip,
+    TRANSACCIONES_LIMITE_DEFECTO, TRANSACCIONES_LIMITE_MAXIMO
+)
 from schemas.transaccion import (
     ClienteCreate, ClienteUpdate, ClienteResponse,
     CuentaCreate, CuentaUpdate, CuentaResponse,
-    CajeroCreate, CajeroUpdate, CajeroResponse,
+    CajeroCreate, CajeroUpdate, CajeroResponse, CajeroCercanoResponse,
     TarjetaCreate, TarjetaUpdate, TarjetaResponse,
     TarjetaCreditoCreate, TarjetaCreditoUpdate, TarjetaCreditoResponse,
     TarjetaDebitoCreate, TarjetaDebitoUpdate, TarjetaDebitoResponse,
-    DepositoRequest, RetiroRequest, ReciboResponse, TransaccionResponse,
-    RetiroSinTarjetaRequest, RetiroSinTarjetaResponse
+    DepositoRequest, RetiroRequest, ReciboResponse, TransaccionResponse, LoteResponse,
+    RetiroSinTarjetaRequest, RetiroSinTarjetaResponse, ClienteResumenResponse, ResumenCuentaResponse,
+    LimitesCuentaResponse
 )
-from sqlalchemy.sql import text
-from passlib.context import CryptContext
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 import logging
 from decimal import Decimal
 import random
 import string
+import secrets
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging (JSON, escritura en segundo plano; ver config.logs)
+configurar_logs()
 logger = logging.getLogger(__name__)
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Particiones mensuales de TRANSACCION: se crean las que falten al arrancar y periódicamente
+@asynccontextmanager
+async def lifespan(app):
+    tarea = asyncio.create_task(mantener_particiones())
+    try:
+        yield
+    finally:
+        tarea.cancel()
+
 # Configuración de la aplicación FastAPI
-app = FastAPI(title="Banco Pichincha API")
+app = FastAPI(title="Banco Pichincha API", lifespan=lifespan)
 
 # Configuración de CORS
 app.add_middleware(
@@ -45,14 +96,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "Server-Timing", "X-Request-ID"],
 )
 
+# Métricas por ruta: latencia, sentencias SQL y tiempo en la base de cada petición
+app.add_middleware(MetricasMiddleware)
+# X-Request-ID para correlacionar los logs de cada petición
+app.add_middleware(RequestIdMiddleware)
+instrumentar_motor(async_engine)
+instrumentar_motor(engine)
+
 # Configuración de JWT y hashing
 SECRET_KEY = os.getenv("JWT_SECRET")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Token de los endpoints de administración (cabecera X-Admin-Token); sin él quedan deshabilitados
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Token de /metrics y /metrics/* (Authorization: Bearer, como lo envía Prometheus); sin él quedan deshabilitados
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# El pool de hashing de contraseñas está saturado: pedir al cliente que reintente
+@app.exception_handler(PasswordPoolSaturated)
+async def password_pool_saturated_handler(request, exc):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Servicio ocupado, intente nuevamente"},
+        headers={"Retry-After": "1"},
+    )
 
 # Modelos
 class Token(BaseModel):
@@ -64,7 +136,7 @@ class ChangePasswordRequest(BaseModel):
     new_password: str = Field(..., min_length=6, description="Nueva contraseña")
 
 # Autenticación
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar el token",
@@ -75,27 +147,95 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         cliente_id: str = payload.get("sub")
         if cliente_id is None:
             raise credentials_exception
-        query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        result = db.execute(query, {"cliente_id": cliente_id})
+        if AUTH_STATELESS or principal_cache.get(token) == cliente_id:
+            return cliente_id
+        query = EXISTE_CLIENTE
+        result = await db.execute(query, {"cliente_id": cliente_id})
         cliente = result.fetchone()
         if not cliente:
             raise credentials_exception
+        principal_cache.set(token, cliente_id, payload.get("exp"))
         return cliente_id
     except JWTError:
         raise credentials_exception
 
+# Endpoints de administración: requieren X-Admin-Token igual a ADMIN_TOKEN
+async def verificar_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="No autorizado")
+
+# Endpoints de métricas: requieren Authorization: Bearer METRICS_TOKEN
+async def verificar_metricas(authorization: Optional[str] = Header(None)):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    esquema, _, token = (authorization or "").partition(" ")
+    if esquema.lower() != "bearer" or not secrets.compare_digest(token.strip(), METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="No autorizado")
+
 # Endpoint raíz
 @app.get("/")
 async def root():
     return {"message": "Bienvenido a la API de Banco Pichincha"}
 
+# Métricas por ruta y del pool en formato Prometheus
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(verificar_metricas)])
+async def metricas_prometheus():
+    return PlainTextResponse(
+        exposicion_prometheus(async_engine.pool) + exposicion_particiones(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+# Métricas del pool de conexiones
+@app.get("/metrics/pool", dependencies=[Depends(verificar_metricas)])
+async def metricas_pool():
+    return pool_status()
+
+# Métricas de la caché de autenticación
+@app.get("/metrics/auth-cache", dependencies=[Depends(verificar_metricas)])
+async def metricas_auth_cache():
+    return principal_cache.stats()
+
+# Métricas de la caché del catálogo de cajeros
+@app.get("/metrics/cajeros-cache", dependencies=[Depends(verificar_metricas)])
+async def metricas_cajeros_cache():
+    return cache_cajeros.stats()
+
+# Métricas del pool de hashing de contraseñas
+@app.get("/metrics/password-pool", dependencies=[Depends(verificar_metricas)])
+async def metricas_password_pool():
+    return password_hasher.stats()
+
+# Sentencias lentas recientes y planes EXPLAIN capturados por muestreo
+@app.get("/admin/consultas-lentas", dependencies=[Depends(verificar_admin)])
+async def admin_consultas_lentas():
+    return consultas_lentas.snapshot()
+
+# Perfil por muestreo del worker, en formato "collapsed" (flamegraph.pl, speedscope)
+@app.get("/debug/profile", response_class=PlainTextResponse, dependencies=[Depends(verificar_admin)])
+async def debug_profile(
+    seconds: float = Query(10, gt=0, le=PERFIL_MAXIMO_SEGUNDOS),
+    hz: int = Query(100, ge=1, le=1000),
+    tareas: bool = Query(False, description="Incluir las peticiones suspendidas en un await (tiempo de pared)")
+):
+    loop = asyncio.get_running_loop()
+    try:
+        texto, muestras = await asyncio.to_thread(
+            perfilador.perfilar, seconds, hz, threading.get_ident(),
+            loop if tareas else None, asyncio.current_task()
+        )
+    except PerfiladorOcupado:
+        raise HTTPException(status_code=409, detail="Ya hay un perfil en curso")
+    return PlainTextResponse(texto, headers={"X-Profile-Samples": str(muestras)})
+
 # Endpoint de login
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-    result = db.execute(query, {"cliente_id": form_data.username})
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    query = CLIENTE_POR_ID
+    result = await db.execute(query, {"cliente_id": form_data.username})
     cliente = result.fetchone()
-    if not cliente or not pwd_context.verify(form_data.password, cliente.cliente_contrasena):
+    if not cliente or not await password_hasher.verify(form_data.password, cliente.cliente_contrasena):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Cédula o contraseña incorrectos",
@@ -111,47 +251,41 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 
 # Endpoint para cambiar contraseña
 @app.post("/clientes/change-password/", response_model=dict)
-async def change_password(request: ChangePasswordRequest, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def change_password(request: ChangePasswordRequest, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        result = db.execute(query, {"cliente_id": cliente_id})
+        query = CLIENTE_POR_ID
+        result = await db.execute(query, {"cliente_id": cliente_id})
         cliente = result.fetchone()
         if not cliente:
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
         
-        if not pwd_context.verify(request.current_password, cliente.cliente_contrasena):
+        if not await password_hasher.verify(request.current_password, cliente.cliente_contrasena):
             raise HTTPException(status_code=401, detail="Contraseña actual incorrecta")
         
-        hashed_password = pwd_context.hash(request.new_password)
-        query = text("UPDATE CLIENTE SET cliente_contrasena = :password WHERE CLIENTE_ID = :cliente_id")
-        db.execute(query, {"password": hashed_password, "cliente_id": cliente_id})
-        db.commit()
+        hashed_password = await password_hasher.hash(request.new_password)
+        query = ACTUALIZAR_CONTRASENA
+        await db.execute(query, {"password": hashed_password, "cliente_id": cliente_id})
+        await db.commit()
+        principal_cache.invalidate_cliente(cliente_id)
         return {"message": "Contraseña cambiada correctamente"}
+    except PasswordPoolSaturated:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al cambiar contraseña: {str(e)}")
 
 # CRUD para Cliente
 @app.post("/clientes/", response_model=ClienteResponse)
-async def crear_cliente(cliente: ClienteCreate, db: Session = Depends(get_db)):
+async def crear_cliente(cliente: ClienteCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        result = db.execute(query, {"cliente_id": cliente.cliente_id})
+        query = EXISTE_CLIENTE
+        result = await db.execute(query, {"cliente_id": cliente.cliente_id})
         if result.fetchone():
             raise HTTPException(status_code=400, detail="La cédula ya está registrada")
         
-        hashed_password = pwd_context.hash(cliente.cliente_contrasena)
+        hashed_password = await password_hasher.hash(cliente.cliente_contrasena)
         
-        query = text("""
-            INSERT INTO CLIENTE (
-                CLIENTE_ID, CLIENTE_NOMBRES, CLIENTE_APELLIDOS, CLIENTE_CORREO,
-                CLIENTE_CELULAR, CLIENTE_DIRECCION, CLIENTE_PROVINCIA,
-                CLIENTE_CIUDAD, CLIENTE_FCHNACIMIENTO, CLIENTE_CONTRASENA
-            ) VALUES (
-                :cliente_id, :nombres, :apellidos, :correo, :celular,
-                :direccion, :provincia, :ciudad, :fchnacimiento, :contrasena
-            ) RETURNING CLIENTE_ID
-        """)
+        query = INSERTAR_CLIENTE
         values = {
             "cliente_id": cliente.cliente_id,
             "nombres": cliente.cliente_nombres,
@@ -164,151 +298,110 @@ async def crear_cliente(cliente: ClienteCreate, db: Session = Depends(get_db)):
             "fchnacimiento": cliente.cliente_fchnacimiento,
             "contrasena": hashed_password
         }
-        result = db.execute(query, values)
-        cliente_id = result.fetchone().cliente_id
-        db.commit()
-        
-        query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        result = db.execute(query, {"cliente_id": cliente_id})
-        cliente_db = result.fetchone()
-        columns = result.keys()
-        return ClienteResponse(
-            cliente_id=cliente_db.cliente_id,
-            cliente_nombres=cliente_db.cliente_nombres,
-            cliente_apellidos=cliente_db.cliente_apellidos,
-            cliente_correo=cliente_db.cliente_correo,
-            cliente_celular=cliente_db.cliente_celular,
-            cliente_direccion=cliente_db.cliente_direccion,
-            cliente_provincia=cliente_db.cliente_provincia,
-            cliente_ciudad=cliente_db.cliente_ciudad,
-            cliente_fchnacimiento=cliente_db.cliente_fchnacimiento,
-            cuentas=[]
-        )
+        cliente_db = await escribir_returning(db, query, values, ClienteResponse, excluir=("cliente_contrasena",), cuentas=[])
+        await db.commit()
+        return cliente_db
+    except (HTTPException, PasswordPoolSaturated):
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear cliente: {str(e)}")
 
 @app.get("/clientes/", response_model=List[ClienteResponse])
-async def leer_todos_clientes(db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
-    query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-    result = db.execute(query, {"cliente_id": cliente_id})
+async def leer_todos_clientes(db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    result = await db.execute(CLIENTE_CON_CUENTAS, {"cliente_id": cliente_id})
     clientes = result.fetchall()
     if not clientes:
         raise HTTPException(status_code=404, detail="No se encontraron datos para este cliente")
     columns = result.keys()
-    responses = []
-    for cliente in clientes:
-        cuentas = db.execute(
-            text("SELECT cuenta_id FROM CUENTA WHERE cliente_id = :cliente_id"),
-            {"cliente_id": cliente.cliente_id}
-        ).fetchall()
-        cuentas_ids = [cuenta.cuenta_id for cuenta in cuentas]
-        responses.append(ClienteResponse(
-            **{col: getattr(cliente, col) for col in columns},
-            cuentas=cuentas_ids
-        ))
-    return responses
+    return [ClienteResponse(**{col: getattr(cliente, col) for col in columns}) for cliente in clientes]
 
 @app.get("/clientes/{cliente_id}", response_model=ClienteResponse)
-async def leer_cliente(cliente_id: str, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def leer_cliente(cliente_id: str, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
     if cliente_id != current_user:
         raise HTTPException(status_code=403, detail="No autorizado para ver los datos de otro cliente")
-    query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-    result = db.execute(query, {"cliente_id": cliente_id})
+    result = await db.execute(CLIENTE_CON_CUENTAS, {"cliente_id": cliente_id})
     cliente = result.fetchone()
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     columns = result.keys()
-    cuentas = db.execute(
-        text("SELECT cuenta_id FROM CUENTA WHERE cliente_id = :cliente_id"),
-        {"cliente_id": cliente_id}
-    ).fetchall()
-    cuentas_ids = [cuenta.cuenta_id for cuenta in cuentas]
-    return ClienteResponse(
-        **{col: getattr(cliente, col) for col in columns},
-        cuentas=cuentas_ids
+    return ClienteResponse(**{col: getattr(cliente, col) for col in columns})
+
+@app.get(
+    "/clientes/{cliente_id}/resumen",
+    response_model=ClienteResumenResponse,
+    description=(
+        "Cliente, todas sus cuentas con sus tarjetas (generales, de crédito y de débito) y las "
+        "últimas `transacciones` transacciones de cada cuenta, en un número fijo de consultas."
     )
+)
+async def leer_resumen_cliente(
+    cliente_id: str,
+    transacciones: int = Query(RESUMEN_TRANSACCIONES_DEFECTO, ge=0, le=RESUMEN_TRANSACCIONES_MAXIMO),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user)
+):
+    if cliente_id != current_user:
+        raise HTTPException(status_code=403, detail="No autorizado para ver los datos de otro cliente")
+    resumen = await resumen_cliente(db, cliente_id, transacciones)
+    if not resumen:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return resumen
 
 @app.put("/clientes/{cliente_id}", response_model=ClienteResponse)
-async def actualizar_cliente(cliente_id: str, cliente: ClienteUpdate, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def actualizar_cliente(cliente_id: str, cliente: ClienteUpdate, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
     try:
         if cliente_id != current_user:
             raise HTTPException(status_code=403, detail="No autorizado para actualizar otro cliente")
         
-        query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        result = db.execute(query, {"cliente_id": cliente_id})
-        if not result.fetchone():
-            raise HTTPException(status_code=404, detail="Cliente no encontrado")
-        
         update_data = cliente.dict(exclude_unset=True)
         if not update_data:
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
         
-        set_clause = ", ".join(f"{key.upper()} = :{key}" for key in update_data.keys())
-        query = text(f"UPDATE CLIENTE SET {set_clause} WHERE CLIENTE_ID = :cliente_id")
+        query = sentencia_actualizar("cliente", tuple(update_data))
         values = {**update_data, "cliente_id": cliente_id}
-        db.execute(query, values)
-        db.commit()
-        
-        query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        result = db.execute(query, {"cliente_id": cliente_id})
-        cliente_db = result.fetchone()
-        columns = result.keys()
-        cuentas = db.execute(
-            text("SELECT cuenta_id FROM CUENTA WHERE cliente_id = :cliente_id"),
-            {"cliente_id": cliente_id}
-        ).fetchall()
-        cuentas_ids = [cuenta.cuenta_id for cuenta in cuentas]
-        return ClienteResponse(
-            **{col: getattr(cliente_db, col) for col in columns},
-            cuentas=cuentas_ids
-        )
+        cliente_db = await escribir_returning(db, query, values, ClienteResponse, excluir=("cliente_contrasena",))
+        if not cliente_db:
+            raise HTTPException(status_code=404, detail="Cliente no encontrado")
+        await db.commit()
+        return cliente_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar cliente: {str(e)}")
 
 @app.delete("/clientes/{cliente_id}")
-async def eliminar_cliente(cliente_id: str, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def eliminar_cliente(cliente_id: str, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
     try:
         if cliente_id != current_user:
             raise HTTPException(status_code=403, detail="No autorizado para eliminar otro cliente")
         
-        query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        result = db.execute(query, {"cliente_id": cliente_id})
+        query = CLIENTE_POR_ID
+        result = await db.execute(query, {"cliente_id": cliente_id})
         if not result.fetchone():
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
         
-        query = text("DELETE FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        db.execute(query, {"cliente_id": cliente_id})
-        db.commit()
+        query = ELIMINAR_CLIENTE
+        await db.execute(query, {"cliente_id": cliente_id})
+        await db.commit()
+        principal_cache.invalidate_cliente(cliente_id)
         return {"message": "Cliente eliminado correctamente"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al eliminar cliente: {str(e)}")
 
 # CRUD para Cuenta
 @app.post("/cuentas/", response_model=CuentaResponse)
-async def crear_cuenta(cuenta: CuentaCreate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def crear_cuenta(cuenta: CuentaCreate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
         if cuenta.cliente_id != cliente_id:
             raise HTTPException(status_code=403, detail="No autorizado para crear cuenta para otro cliente")
         
-        query = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
-        result = db.execute(query, {"cliente_id": cuenta.cliente_id})
-        if not result.fetchone():
-            raise HTTPException(status_code=404, detail="Cliente no encontrado")
-        
         cuenta_id = str(uuid4())[:10]
-        query = text("""
-            INSERT INTO CUENTA (
-                CUENTA_ID, CLIENTE_ID, CUENTA_NOMBRE, CUENTA_SALDO,
-                CUENTA_APERTURA, CUENTA_ESTADO, CUENTA_LIMITE_TRANS_WEB,
-                CUENTA_LIMITE_TRANS_MOVIL
-            ) VALUES (
-                :cuenta_id, :cliente_id, :nombre, :saldo, :apertura,
-                :estado, :limite_web, :limite_movil
-            ) RETURNING CUENTA_ID
-        """)
+        query = INSERTAR_CUENTA
         values = {
             "cuenta_id": cuenta_id,
             "cliente_id": cuenta.cliente_id,
@@ -319,35 +412,81 @@ async def crear_cuenta(cuenta: CuentaCreate, db: Session = Depends(get_db), clie
             "limite_web": cuenta.cuenta_limite_trans_web,
             "limite_movil": cuenta.cuenta_limite_trans_movil
         }
-        result = db.execute(query, values)
-        cuenta_id = result.fetchone().cuenta_id
-        db.commit()
-        
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-        result = db.execute(query, {"cuenta_id": cuenta_id})
-        cuenta_db = result.fetchone()
-        columns = result.keys()
-        return CuentaResponse(**{col: getattr(cuenta_db, col) for col in columns})
+        cuenta_db = await escribir_returning(db, query, values, CuentaResponse)
+        await db.commit()
+        return cuenta_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear cuenta: {str(e)}")
 
 @app.get("/cuentas/{cuenta_id}", response_model=CuentaResponse)
-async def leer_cuenta(cuenta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
-    query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-    result = db.execute(query, {"cuenta_id": cuenta_id})
+async def leer_cuenta(cuenta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    query = CUENTA_POR_ID
+    result = await db.execute(query, {"cuenta_id": cuenta_id})
     cuenta = result.fetchone()
     if not cuenta or cuenta.cliente_id != cliente_id:
         raise HTTPException(status_code=403, detail="Cuenta no encontrada o no autorizada")
     columns = result.keys()
     return CuentaResponse(**{col: getattr(cuenta, col) for col in columns})
 
+@app.get(
+    "/cuentas/{cuenta_id}/resumen",
+    response_model=ResumenCuentaResponse,
+    description=(
+        "Totales depositados y retirados, costos pagados y cantidad de movimientos del mes "
+        "(`mes` = AAAA-MM, por defecto el mes en curso, UTC) y el último movimiento de la cuenta. "
+        "Se lee del resumen materializado, sin recorrer el historial."
+    )
+)
+async def leer_resumen_cuenta(
+    cuenta_id: str,
+    mes: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$", description="Mes AAAA-MM"),
+    db: AsyncSession = Depends(get_async_db),
+    cliente_id: str = Depends(get_current_user)
+):
+    if mes:
+        inicio_mes = datetime.strptime(mes, "%Y-%m").date()
+    else:
+        inicio_mes = datetime.now(pytz.UTC).date().replace(day=1)
+    result = await db.execute(LEER_RESUMEN, {"cuenta_id": cuenta_id, "cliente_id": cliente_id, "mes": inicio_mes})
+    resumen = result.fetchone()
+    if not resumen:
+        raise HTTPException(status_code=403, detail="Cuenta no encontrada o no autorizada")
+    return ResumenCuentaResponse(mes=inicio_mes.strftime("%Y-%m"), **resumen._mapping)
+
+@app.get(
+    "/cuentas/{cuenta_id}/limites",
+    response_model=LimitesCuentaResponse,
+    description="Límite diario, monto usado hoy y disponible restante de la cuenta por canal (web y móvil)."
+)
+async def leer_limites_cuenta(cuenta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    dia = dia_limite()
+    result = await db.execute(LEER_LIMITES, {"cuenta_id": cuenta_id, "cliente_id": cliente_id, "dia": dia})
+    cuenta = result.fetchone()
+    if not cuenta:
+        raise HTTPException(status_code=403, detail="Cuenta no encontrada o no autorizada")
+    return {
+        "cuenta_id": cuenta.cuenta_id,
+        "dia": dia,
+        **{
+            canal: {
+                "limite": getattr(cuenta, canal),
+                "usado": getattr(cuenta, f"uso_{canal}"),
+                "disponible": max(getattr(cuenta, canal) - getattr(cuenta, f"uso_{canal}"), Decimal("0"))
+            }
+            for canal in ("web", "movil")
+        }
+    }
+
 @app.get("/clientes/{cliente_id}/cuentas", response_model=List[CuentaResponse])
-async def leer_cuentas_por_cliente(cliente_id: str, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def leer_cuentas_por_cliente(cliente_id: str, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
     if cliente_id != current_user:
         raise HTTPException(status_code=403, detail="No autorizado para ver cuentas de otro cliente")
-    query = text("SELECT * FROM CUENTA WHERE CLIENTE_ID = :cliente_id")
-    result = db.execute(query, {"cliente_id": cliente_id})
+    query = CUENTAS_POR_CLIENTE
+    result = await db.execute(query, {"cliente_id": cliente_id})
     cuentas = result.fetchall()
     if not cuentas:
         return []
@@ -355,10 +494,10 @@ async def leer_cuentas_por_cliente(cliente_id: str, db: Session = Depends(get_db
     return [CuentaResponse(**{col: getattr(cuenta, col) for col in columns}) for cuenta in cuentas]
 
 @app.put("/cuentas/{cuenta_id}", response_model=CuentaResponse)
-async def actualizar_cuenta(cuenta_id: str, cuenta: CuentaUpdate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def actualizar_cuenta(cuenta_id: str, cuenta: CuentaUpdate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-        result = db.execute(query, {"cuenta_id": cuenta_id})
+        query = CLIENTE_DE_CUENTA
+        result = await db.execute(query, {"cuenta_id": cuenta_id})
         cuenta_db = result.fetchone()
         if not cuenta_db:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
@@ -372,140 +511,162 @@ async def actualizar_cuenta(cuenta_id: str, cuenta: CuentaUpdate, db: Session =
         if 'cliente_id' in update_data:
             raise HTTPException(status_code=400, detail="No se puede modificar el CLIENTE_ID")
         
-        set_clause = ", ".join(f"{key.upper()} = :{key}" for key in update_data.keys())
-        query = text(f"UPDATE CUENTA SET {set_clause} WHERE CUENTA_ID = :cuenta_id")
+        query = sentencia_actualizar("cuenta", tuple(update_data))
         values = {**update_data, "cuenta_id": cuenta_id}
-        db.execute(query, values)
-        db.commit()
-        
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-        result = db.execute(query, {"cuenta_id": cuenta_id})
-        cuenta_db = result.fetchone()
-        columns = result.keys()
-        return CuentaResponse(**{col: getattr(cuenta_db, col) for col in columns})
+        cuenta_db = await escribir_returning(db, query, values, CuentaResponse)
+        await db.commit()
+        return cuenta_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar cuenta: {str(e)}")
 
 @app.delete("/cuentas/{cuenta_id}")
-async def eliminar_cuenta(cuenta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def eliminar_cuenta(cuenta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-        result = db.execute(query, {"cuenta_id": cuenta_id})
+        query = CUENTA_POR_ID
+        result = await db.execute(query, {"cuenta_id": cuenta_id})
         cuenta = result.fetchone()
         if not cuenta:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
         if cuenta.cliente_id != cliente_id:
             raise HTTPException(status_code=403, detail="No autorizado para eliminar esta cuenta")
         
-        query = text("DELETE FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-        db.execute(query, {"cuenta_id": cuenta_id})
-        db.commit()
+        query = ELIMINAR_CUENTA
+        await db.execute(query, {"cuenta_id": cuenta_id})
+        await db.commit()
         return {"message": "Cuenta eliminada correctamente"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al eliminar cuenta: {str(e)}")
 
 # CRUD para Cajero
+async def cajero_modificado(cajero_id, cajero_db=None):
+    """Tras el commit: aplica el cambio al índice geográfico e invalida la caché del catálogo."""
+    version = indice_cajeros.version
+    if cajero_db:
+        indice_cajeros.aplicar(cajero_db)
+    else:
+        indice_cajeros.eliminar(cajero_id)
+    indice_cajeros.confirmar(version, await cache_cajeros.invalidar())
+
 @app.post("/cajeros/", response_model=CajeroResponse)
-async def crear_cajero(cajero: CajeroCreate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def crear_cajero(cajero: CajeroCreate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
         cajero_id = str(uuid4())[:10]
-        query = text("""
-            INSERT INTO CAJERO (
-                CAJERO_ID, CAJERO_UBICACION, CAJERO_TIPO, CAJERO_ESTADO
-            ) VALUES (
-                :cajero_id, :ubicacion, :tipo, :estado
-            ) RETURNING CAJERO_ID
-        """)
+        query = INSERTAR_CAJERO
         values = {
             "cajero_id": cajero_id,
             "ubicacion": cajero.cajero_ubicacion,
             "tipo": cajero.cajero_tipo,
-            "estado": cajero.cajero_estado
+            "estado": cajero.cajero_estado,
+            "latitud": cajero.cajero_latitud,
+            "longitud": cajero.cajero_longitud
         }
-        result = db.execute(query, values)
-        cajero_id = result.fetchone().cajero_id
-        db.commit()
-        
-        query = text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id")
-        result = db.execute(query, {"cajero_id": cajero_id})
-        cajero_db = result.fetchone()
-        columns = result.keys()
-        return CajeroResponse(**{col: getattr(cajero_db, col) for col in columns})
+        cajero_db = await escribir_returning(db, query, values, CajeroResponse)
+        await db.commit()
+        await cajero_modificado(cajero_db.cajero_id, cajero_db)
+        return cajero_db
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear cajero: {str(e)}")
 
+def respuesta_catalogo(cuerpo, valor_etag, if_none_match):
+    headers = {"ETag": valor_etag, "Cache-Control": "no-cache"}
+    if coincide_etag(if_none_match, valor_etag):
+        cache_cajeros.no_modificados += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=cuerpo, media_type="application/json", headers=headers)
+
 @app.get("/cajeros/", response_model=List[CajeroResponse])
-async def leer_todos_cajeros(db: Session = Depends(get_db)):
-    query = text("SELECT * FROM CAJERO")
-    result = db.execute(query)
-    cajeros = result.fetchall()
-    if not cajeros:
-        return []
-    columns = result.keys()
-    return [CajeroResponse(**{col: getattr(cajero, col) for col in columns}) for cajero in cajeros]
+async def leer_todos_cajeros(if_none_match: Optional[str] = Header(None)):
+    catalogo = await cache_cajeros.obtener()
+    return respuesta_catalogo(catalogo.cuerpo, catalogo.etag, if_none_match)
+
+@app.get(
+    "/cajeros/cercanos",
+    response_model=List[CajeroCercanoResponse],
+    description="Cajeros activos más cercanos al punto (lat, lon) dentro de `radio` metros, del más cercano al más lejano."
+)
+async def leer_cajeros_cercanos(
+    lat: float = Query(..., ge=-90, le=90, description="Latitud en grados decimales"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitud en grados decimales"),
+    radio: float = Query(5000, gt=0, le=50000, description="Radio de búsqueda en metros"),
+    limit: int = Query(10, ge=1, le=50, description="Máximo de cajeros a devolver")
+):
+    version = await cache_cajeros.version()
+    if version is None or indice_cajeros.version != version:
+        catalogo = await cache_cajeros.obtener()
+        indice_cajeros.reconstruir(catalogo.filas, catalogo.version)
+    return [
+        {
+            "cajero_id": cajero_id,
+            "cajero_ubicacion": ubicacion,
+            "cajero_latitud": cajero_lat,
+            "cajero_longitud": cajero_lon,
+            "distancia_m": round(distancia)
+        }
+        for distancia, cajero_id, cajero_lat, cajero_lon, ubicacion in indice_cajeros.cercanos(lat, lon, radio, limit)
+    ]
 
 @app.get("/cajeros/{cajero_id}", response_model=CajeroResponse)
-async def leer_cajero(cajero_id: str, db: Session = Depends(get_db)):
-    query = text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id")
-    result = db.execute(query, {"cajero_id": cajero_id})
-    cajero = result.fetchone()
-    if not cajero:
+async def leer_cajero(cajero_id: str, if_none_match: Optional[str] = Header(None)):
+    catalogo = await cache_cajeros.obtener()
+    item = catalogo.items.get(cajero_id)
+    if not item:
         raise HTTPException(status_code=404, detail="Cajero no encontrado")
-    columns = result.keys()
-    return CajeroResponse(**{col: getattr(cajero, col) for col in columns})
+    return respuesta_catalogo(*item, if_none_match)
 
 @app.put("/cajeros/{cajero_id}", response_model=CajeroResponse)
-async def actualizar_cajero(cajero_id: str, cajero: CajeroUpdate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def actualizar_cajero(cajero_id: str, cajero: CajeroUpdate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id")
-        result = db.execute(query, {"cajero_id": cajero_id})
-        if not result.fetchone():
-            raise HTTPException(status_code=404, detail="Cajero no encontrado")
-        
         update_data = cajero.dict(exclude_unset=True)
         if not update_data:
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
         
-        set_clause = ", ".join(f"{key.upper()} = :{key}" for key in update_data.keys())
-        query = text(f"UPDATE CAJERO SET {set_clause} WHERE CAJERO_ID = :cajero_id")
+        query = sentencia_actualizar("cajero", tuple(update_data))
         values = {**update_data, "cajero_id": cajero_id}
-        db.execute(query, values)
-        db.commit()
-        
-        query = text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id")
-        result = db.execute(query, {"cajero_id": cajero_id})
-        cajero_db = result.fetchone()
-        columns = result.keys()
-        return CajeroResponse(**{col: getattr(cajero_db, col) for col in columns})
+        cajero_db = await escribir_returning(db, query, values, CajeroResponse)
+        if not cajero_db:
+            raise HTTPException(status_code=404, detail="Cajero no encontrado")
+        await db.commit()
+        await cajero_modificado(cajero_id, cajero_db)
+        return cajero_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar cajero: {str(e)}")
 
 @app.delete("/cajeros/{cajero_id}")
-async def eliminar_cajero(cajero_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def eliminar_cajero(cajero_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id")
-        result = db.execute(query, {"cajero_id": cajero_id})
+        query = CAJERO_POR_ID
+        result = await db.execute(query, {"cajero_id": cajero_id})
         if not result.fetchone():
             raise HTTPException(status_code=404, detail="Cajero no encontrado")
         
-        query = text("DELETE FROM CAJERO WHERE CAJERO_ID = :cajero_id")
-        db.execute(query, {"cajero_id": cajero_id})
-        db.commit()
+        query = ELIMINAR_CAJERO
+        await db.execute(query, {"cajero_id": cajero_id})
+        await db.commit()
+        await cajero_modificado(cajero_id)
         return {"message": "Cajero eliminado correctamente"}
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al eliminar cajero: {str(e)}")
 
 # CRUD para Tarjeta
 @app.post("/tarjetas/", response_model=TarjetaResponse)
-async def crear_tarjeta(tarjeta: TarjetaCreate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def crear_tarjeta(tarjeta: TarjetaCreate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-        result = db.execute(query, {"cuenta_id": tarjeta.cuenta_id})
+        query = CLIENTE_DE_CUENTA
+        result = await db.execute(query, {"cuenta_id": tarjeta.cuenta_id})
         cuenta = result.fetchone()
         if not cuenta:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
@@ -513,16 +674,7 @@ async def crear_tarjeta(tarjeta: TarjetaCreate, db: Session = Depends(get_db), c
             raise HTTPException(status_code=403, detail="No autorizado para crear tarjeta para esta cuenta")
         
         tarjeta_id = str(uuid4())[:16]
-        query = text("""
-            INSERT INTO TARJETA (
-                TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
-                TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO,
-                TARJETA_CVV, TARJETA_ESTILO
-            ) VALUES (
-                :tarjeta_id, :cuenta_id, :nombre, :pin_seguridad, :fecha_caducidad,
-                :fecha_emision, :estado, :cvv, :estilo
-            ) RETURNING TARJETA_ID
-        """)
+        query = INSERTAR_TARJETA
         values = {
             "tarjeta_id": tarjeta_id,
             "cuenta_id": tarjeta.cuenta_id,
@@ -534,27 +686,20 @@ async def crear_tarjeta(tarjeta: TarjetaCreate, db: Session = Depends(get_db), c
             "cvv": tarjeta.tarjeta_cvv,
             "estilo": tarjeta.tarjeta_estilo
         }
-        result = db.execute(query, values)
-        tarjeta_id = result.fetchone().tarjeta_id
-        db.commit()
-        
-        query = text("SELECT * FROM TARJETA WHERE TARJETA_ID = :tarjeta_id")
-        result = db.execute(query, {"tarjeta_id": tarjeta_id})
-        tarjeta_db = result.fetchone()
-        columns = result.keys()
-        return TarjetaResponse(**{col: getattr(tarjeta_db, col) for col in columns})
+        tarjeta_db = await escribir_returning(db, query, values, TarjetaResponse)
+        await db.commit()
+        return tarjeta_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear tarjeta: {str(e)}")
 
 @app.get("/cuentas/{cuenta_id}/tarjetas", response_model=List[TarjetaResponse])
-async def leer_tarjetas_por_cuenta(cuenta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
-    query = text("""
-        SELECT t.* FROM TARJETA t
-        JOIN CUENTA c ON t.CUENTA_ID = c.CUENTA_ID
-        WHERE t.CUENTA_ID = :cuenta_id AND c.CLIENTE_ID = :cliente_id
-    """)
-    result = db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
+async def leer_tarjetas_por_cuenta(cuenta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    query = TARJETAS_POR_CUENTA
+    result = await db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
     tarjetas = result.fetchall()
     if not tarjetas:
         return []
@@ -562,13 +707,9 @@ async def leer_tarjetas_por_cuenta(cuenta_id: str, db: Session = Depends(get_db)
     return [TarjetaResponse(**{col: getattr(tarjeta, col) for col in columns}) for tarjeta in tarjetas]
 
 @app.get("/tarjetas/{tarjeta_id}", response_model=TarjetaResponse)
-async def leer_tarjeta(tarjeta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
-    query = text("""
-        SELECT t.* FROM TARJETA t
-        JOIN CUENTA c ON t.CUENTA_ID = c.CUENTA_ID
-        WHERE t.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-    """)
-    result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
+async def leer_tarjeta(tarjeta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    query = TARJETA_DEL_CLIENTE
+    result = await db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
     tarjeta = result.fetchone()
     if not tarjeta:
         raise HTTPException(status_code=403, detail="Tarjeta no encontrada o no autorizada")
@@ -576,64 +717,50 @@ async def leer_tarjeta(tarjeta_id: str, db: Session = Depends(get_db), cliente_i
     return TarjetaResponse(**{col: getattr(tarjeta, col) for col in columns})
 
 @app.put("/tarjetas/{tarjeta_id}", response_model=TarjetaResponse)
-async def actualizar_tarjeta(tarjeta_id: str, tarjeta: TarjetaUpdate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def actualizar_tarjeta(tarjeta_id: str, tarjeta: TarjetaUpdate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("""
-            SELECT t.* FROM TARJETA t
-            JOIN CUENTA c ON t.CUENTA_ID = c.CUENTA_ID
-            WHERE t.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-        """)
-        result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
-        tarjeta_db = result.fetchone()
-        if not tarjeta_db:
-            raise HTTPException(status_code=404, detail="Tarjeta no encontrada o no autorizada")
-        
         update_data = tarjeta.dict(exclude_unset=True)
         if not update_data:
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
         
-        set_clause = ", ".join(f"{key.upper()} = :{key}" for key in update_data.keys())
-        query = text(f"UPDATE TARJETA SET {set_clause} WHERE TARJETA_ID = :tarjeta_id")
-        values = {**update_data, "tarjeta_id": tarjeta_id}
-        db.execute(query, values)
-        db.commit()
-        
-        query = text("SELECT * FROM TARJETA WHERE TARJETA_ID = :tarjeta_id")
-        result = db.execute(query, {"tarjeta_id": tarjeta_id})
-        tarjeta_db = result.fetchone()
-        columns = result.keys()
-        return TarjetaResponse(**{col: getattr(tarjeta_db, col) for col in columns})
+        # La propiedad de la tarjeta se valida en la misma sentencia (JOIN con CUENTA)
+        query = sentencia_actualizar("tarjeta", tuple(update_data))
+        values = {**update_data, "tarjeta_id": tarjeta_id, "cliente_id": cliente_id}
+        tarjeta_db = await escribir_returning(db, query, values, TarjetaResponse)
+        if not tarjeta_db:
+            raise HTTPException(status_code=404, detail="Tarjeta no encontrada o no autorizada")
+        await db.commit()
+        return tarjeta_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar tarjeta: {str(e)}")
 
 @app.delete("/tarjetas/{tarjeta_id}")
-async def eliminar_tarjeta(tarjeta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def eliminar_tarjeta(tarjeta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("""
-            SELECT t.* FROM TARJETA t
-            JOIN CUENTA c ON t.CUENTA_ID = c.CUENTA_ID
-            WHERE t.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-        """)
-        result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
+        query = TARJETA_DEL_CLIENTE
+        result = await db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
         tarjeta = result.fetchone()
         if not tarjeta:
             raise HTTPException(status_code=404, detail="Tarjeta no encontrada o no autorizada")
         
-        query = text("DELETE FROM TARJETA WHERE TARJETA_ID = :tarjeta_id")
-        db.execute(query, {"tarjeta_id": tarjeta_id})
-        db.commit()
+        query = ELIMINAR_TARJETA
+        await db.execute(query, {"tarjeta_id": tarjeta_id})
+        await db.commit()
         return {"message": "Tarjeta eliminada correctamente"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al eliminar tarjeta: {str(e)}")
 
 # CRUD para Tarjeta de Crédito
 @app.post("/tarjetas-credito/", response_model=TarjetaCreditoResponse)
-async def crear_tarjeta_credito(tarjeta: TarjetaCreditoCreate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def crear_tarjeta_credito(tarjeta: TarjetaCreditoCreate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-        result = db.execute(query, {"cuenta_id": tarjeta.cuenta_id})
+        query = CLIENTE_DE_CUENTA
+        result = await db.execute(query, {"cuenta_id": tarjeta.cuenta_id})
         cuenta = result.fetchone()
         if not cuenta:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
@@ -641,17 +768,7 @@ async def crear_tarjeta_credito(tarjeta: TarjetaCreditoCreate, db: Session = Dep
             raise HTTPException(status_code=403, detail="No autorizado para crear tarjeta de crédito para esta cuenta")
         
         tarjeta_id = str(uuid4())[:16]
-        query = text("""
-            INSERT INTO TARJETA_DE_CREDITO (
-                TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
-                TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO,
-                TARJETA_CVV, TARJETA_ESTILO, TARJETACREDITO_CUPO,
-                TARJETA_CREDITO_PAGO_MINIMO, TARJETA_CREDITO_PAGO_TOTAL
-            ) VALUES (
-                :tarjeta_id, :cuenta_id, :nombre, :pin_seguridad, :fecha_caducidad,
-                :fecha_emision, :estado, :cvv, :estilo, :cupo, :pago_minimo, :pago_total
-            ) RETURNING TARJETA_ID
-        """)
+        query = INSERTAR_TARJETA_CREDITO
         values = {
             "tarjeta_id": tarjeta_id,
             "cuenta_id": tarjeta.cuenta_id,
@@ -666,56 +783,20 @@ async def crear_tarjeta_credito(tarjeta: TarjetaCreditoCreate, db: Session = Dep
             "pago_minimo": tarjeta.tarjetacredito_pago_minimo,
             "pago_total": tarjeta.tarjeta_credito_pago_total
         }
-        result = db.execute(query, values)
-        tarjeta_id = result.fetchone().tarjeta_id
-        db.commit()
-        
-        query = text("""
-            SELECT 
-                TARJETA_ID AS tarjeta_id,
-                CUENTA_ID AS cuenta_id,
-                TARJETA_NOMBRE AS tarjeta_nombre,
-                TARJETA_PIN_SEGURIDAD AS tarjeta_pin_seguridad,
-                TARJETA_FECHA_CADUCIDAD AS tarjeta_fecha_caducidad,
-                TARJETA_FECHA_EMISION AS tarjeta_fecha_emision,
-                TARJETA_ESTADO AS tarjeta_estado,
-                TARJETA_CVV AS tarjeta_cvv,
-                TARJETA_ESTILO AS tarjeta_estilo,
-                TARJETACREDITO_CUPO AS tarjetacredito_cupo,
-                TARJETA_CREDITO_PAGO_MINIMO AS tarjetacredito_pago_minimo,
-                TARJETA_CREDITO_PAGO_TOTAL AS tarjeta_credito_pago_total
-            FROM TARJETA_DE_CREDITO 
-            WHERE TARJETA_ID = :tarjeta_id
-        """)
-        result = db.execute(query, {"tarjeta_id": tarjeta_id})
-        tarjeta_db = result.fetchone()
-        columns = result.keys()
-        return TarjetaCreditoResponse(**{col: getattr(tarjeta_db, col) for col in columns})
+        tarjeta_db = await escribir_returning(db, query, values, TarjetaCreditoResponse)
+        await db.commit()
+        return tarjeta_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear tarjeta de crédito: {str(e)}")
 
 @app.get("/cuentas/{cuenta_id}/tarjetas-credito", response_model=List[TarjetaCreditoResponse])
-async def leer_tarjetas_credito_por_cuenta(cuenta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
-    query = text("""
-        SELECT 
-            tc.TARJETA_ID AS tarjeta_id,
-            tc.CUENTA_ID AS cuenta_id,
-            tc.TARJETA_NOMBRE AS tarjeta_nombre,
-            tc.TARJETA_PIN_SEGURIDAD AS tarjeta_pin_seguridad,
-            tc.TARJETA_FECHA_CADUCIDAD AS tarjeta_fecha_caducidad,
-            tc.TARJETA_FECHA_EMISION AS tarjeta_fecha_emision,
-            tc.TARJETA_ESTADO AS tarjeta_estado,
-            tc.TARJETA_CVV AS tarjeta_cvv,
-            tc.TARJETA_ESTILO AS tarjeta_estilo,
-            tc.TARJETACREDITO_CUPO AS tarjetacredito_cupo,
-            tc.TARJETA_CREDITO_PAGO_MINIMO AS tarjetacredito_pago_minimo,
-            tc.TARJETA_CREDITO_PAGO_TOTAL AS tarjeta_credito_pago_total
-        FROM TARJETA_DE_CREDITO tc
-        JOIN CUENTA c ON tc.CUENTA_ID = c.CUENTA_ID
-        WHERE tc.CUENTA_ID = :cuenta_id AND c.CLIENTE_ID = :cliente_id
-    """)
-    result = db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
+async def leer_tarjetas_credito_por_cuenta(cuenta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    query = TARJETAS_CREDITO_POR_CUENTA
+    result = await db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
     tarjetas = result.fetchall()
     if not tarjetas:
         return []
@@ -723,26 +804,9 @@ async def leer_tarjetas_credito_por_cuenta(cuenta_id: str, db: Session = Depends
     return [TarjetaCreditoResponse(**{col: getattr(tarjeta, col) for col in columns}) for tarjeta in tarjetas]
 
 @app.get("/tarjetas-credito/{tarjeta_id}", response_model=TarjetaCreditoResponse)
-async def leer_tarjeta_credito(tarjeta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
-    query = text("""
-        SELECT 
-            tc.TARJETA_ID AS tarjeta_id,
-            tc.CUENTA_ID AS cuenta_id,
-            tc.TARJETA_NOMBRE AS tarjeta_nombre,
-            tc.TARJETA_PIN_SEGURIDAD AS tarjeta_pin_seguridad,
-            tc.TARJETA_FECHA_CADUCIDAD AS tarjeta_fecha_caducidad,
-            tc.TARJETA_FECHA_EMISION AS tarjeta_fecha_emision,
-            tc.TARJETA_ESTADO AS tarjeta_estado,
-            tc.TARJETA_CVV AS tarjeta_cvv,
-            tc.TARJETA_ESTILO AS tarjeta_estilo,
-            tc.TARJETACREDITO_CUPO AS tarjetacredito_cupo,
-            tc.TARJETA_CREDITO_PAGO_MINIMO AS tarjetacredito_pago_minimo,
-            tc.TARJETA_CREDITO_PAGO_TOTAL AS tarjeta_credito_pago_total
-        FROM TARJETA_DE_CREDITO tc
-        JOIN CUENTA c ON tc.CUENTA_ID = c.CUENTA_ID
-        WHERE tc.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-    """)
-    result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
+async def leer_tarjeta_credito(tarjeta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    query = TARJETA_CREDITO_DEL_CLIENTE
+    result = await db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
     tarjeta = result.fetchone()
     if not tarjeta:
         raise HTTPException(status_code=403, detail="Tarjeta de crédito no encontrada o no autorizada")
@@ -750,107 +814,50 @@ async def leer_tarjeta_credito(tarjeta_id: str, db: Session = Depends(get_db), c
     return TarjetaCreditoResponse(**{col: getattr(tarjeta, col) for col in columns})
 
 @app.put("/tarjetas-credito/{tarjeta_id}", response_model=TarjetaCreditoResponse)
-async def actualizar_tarjeta_credito(tarjeta_id: str, tarjeta: TarjetaCreditoUpdate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def actualizar_tarjeta_credito(tarjeta_id: str, tarjeta: TarjetaCreditoUpdate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("""
-            SELECT 
-                tc.TARJETA_ID AS tarjeta_id,
-                tc.CUENTA_ID AS cuenta_id,
-                tc.TARJETA_NOMBRE AS tarjeta_nombre,
-                tc.TARJETA_PIN_SEGURIDAD AS tarjeta_pin_seguridad,
-                tc.TARJETA_FECHA_CADUCIDAD AS tarjeta_fecha_caducidad,
-                tc.TARJETA_FECHA_EMISION AS tarjeta_fecha_emision,
-                tc.TARJETA_ESTADO AS tarjeta_estado,
-                tc.TARJETA_CVV AS tarjeta_cvv,
-                tc.TARJETA_ESTILO AS tarjeta_estilo,
-                tc.TARJETACREDITO_CUPO AS tarjetacredito_cupo,
-                tc.TARJETA_CREDITO_PAGO_MINIMO AS tarjetacredito_pago_minimo,
-                tc.TARJETA_CREDITO_PAGO_TOTAL AS tarjeta_credito_pago_total
-            FROM TARJETA_DE_CREDITO tc
-            JOIN CUENTA c ON tc.CUENTA_ID = c.CUENTA_ID
-            WHERE tc.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-        """)
-        result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
-        tarjeta_db = result.fetchone()
-        if not tarjeta_db:
-            raise HTTPException(status_code=404, detail="Tarjeta de crédito no encontrada o no autorizada")
-        
         update_data = tarjeta.dict(exclude_unset=True)
         if not update_data:
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
         
-        column_mapping = {
-            "tarjeta_id": "TARJETA_ID",
-            "cuenta_id": "CUENTA_ID",
-            "tarjeta_nombre": "TARJETA_NOMBRE",
-            "tarjeta_pin_seguridad": "TARJETA_PIN_SEGURIDAD",
-            "tarjeta_fecha_caducidad": "TARJETA_FECHA_CADUCIDAD",
-            "tarjeta_fecha_emision": "TARJETA_FECHA_EMISION",
-            "tarjeta_estado": "TARJETA_ESTADO",
-            "tarjeta_cvv": "TARJETA_CVV",
-            "tarjeta_estilo": "TARJETA_ESTILO",
-            "tarjetacredito_cupo": "TARJETACREDITO_CUPO",
-            "tarjetacredito_pago_minimo": "TARJETA_CREDITO_PAGO_MINIMO",
-            "tarjeta_credito_pago_total": "TARJETA_CREDITO_PAGO_TOTAL"
-        }
-        set_clause = ", ".join(f"{column_mapping[key]} = :{key}" for key in update_data.keys())
-        query = text(f"UPDATE TARJETA_DE_CREDITO SET {set_clause} WHERE TARJETA_ID = :tarjeta_id")
-        values = {**update_data, "tarjeta_id": tarjeta_id}
-        db.execute(query, values)
-        db.commit()
-        
-        query = text("""
-            SELECT 
-                TARJETA_ID AS tarjeta_id,
-                CUENTA_ID AS cuenta_id,
-                TARJETA_NOMBRE AS tarjeta_nombre,
-                TARJETA_PIN_SEGURIDAD AS tarjeta_pin_seguridad,
-                TARJETA_FECHA_CADUCIDAD AS tarjeta_fecha_caducidad,
-                TARJETA_FECHA_EMISION AS tarjeta_fecha_emision,
-                TARJETA_ESTADO AS tarjeta_estado,
-                TARJETA_CVV AS tarjeta_cvv,
-                TARJETA_ESTILO AS tarjeta_estilo,
-                TARJETACREDITO_CUPO AS tarjetacredito_cupo,
-                TARJETA_CREDITO_PAGO_MINIMO AS tarjetacredito_pago_minimo,
-                TARJETA_CREDITO_PAGO_TOTAL AS tarjeta_credito_pago_total
-            FROM TARJETA_DE_CREDITO 
-            WHERE TARJETA_ID = :tarjeta_id
-        """)
-        result = db.execute(query, {"tarjeta_id": tarjeta_id})
-        tarjeta_db = result.fetchone()
-        columns = result.keys()
-        return TarjetaCreditoResponse(**{col: getattr(tarjeta_db, col) for col in columns})
+        # La propiedad de la tarjeta se valida en la misma sentencia (JOIN con CUENTA)
+        query = sentencia_actualizar("tarjeta_credito", tuple(update_data))
+        values = {**update_data, "tarjeta_id": tarjeta_id, "cliente_id": cliente_id}
+        tarjeta_db = await escribir_returning(db, query, values, TarjetaCreditoResponse)
+        if not tarjeta_db:
+            raise HTTPException(status_code=404, detail="Tarjeta de crédito no encontrada o no autorizada")
+        await db.commit()
+        return tarjeta_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar tarjeta de crédito: {str(e)}")
 
 @app.delete("/tarjetas-credito/{tarjeta_id}")
-async def eliminar_tarjeta_credito(tarjeta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def eliminar_tarjeta_credito(tarjeta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("""
-            SELECT tc.* FROM TARJETA_DE_CREDITO tc
-            JOIN CUENTA c ON tc.CUENTA_ID = c.CUENTA_ID
-            WHERE tc.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-        """)
-        result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
+        query = FILA_TARJETA_CREDITO_DEL_CLIENTE
+        result = await db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
         tarjeta = result.fetchone()
         if not tarjeta:
             raise HTTPException(status_code=404, detail="Tarjeta de crédito no encontrada o no autorizada")
         
-        query = text("DELETE FROM TARJETA_DE_CREDITO WHERE TARJETA_ID = :tarjeta_id")
-        db.execute(query, {"tarjeta_id": tarjeta_id})
-        db.commit()
+        query = ELIMINAR_TARJETA_CREDITO
+        await db.execute(query, {"tarjeta_id": tarjeta_id})
+        await db.commit()
         return {"message": "Tarjeta de crédito eliminada correctamente"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al eliminar tarjeta de crédito: {str(e)}")
 
 # CRUD para Tarjeta de Débito
 @app.post("/tarjetas-debito/", response_model=TarjetaDebitoResponse)
-async def crear_tarjeta_debito(tarjeta: TarjetaDebitoCreate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def crear_tarjeta_debito(tarjeta: TarjetaDebitoCreate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
-        result = db.execute(query, {"cuenta_id": tarjeta.cuenta_id})
+        query = CLIENTE_DE_CUENTA
+        result = await db.execute(query, {"cuenta_id": tarjeta.cuenta_id})
         cuenta = result.fetchone()
         if not cuenta:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
@@ -858,16 +865,7 @@ async def crear_tarjeta_debito(tarjeta: TarjetaDebitoCreate, db: Session = Depen
             raise HTTPException(status_code=403, detail="No autorizado para crear tarjeta de débito para esta cuenta")
         
         tarjeta_id = str(uuid4())[:16]
-        query = text("""
-            INSERT INTO TARJETA_DE_DEBITO (
-                TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
-                TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO,
-                TARJETA_CVV, TARJETA_ESTILO
-            ) VALUES (
-                :tarjeta_id, :cuenta_id, :nombre, :pin_seguridad, :fecha_caducidad,
-                :fecha_emision, :estado, :cvv, :estilo
-            ) RETURNING TARJETA_ID
-        """)
+        query = INSERTAR_TARJETA_DEBITO
         values = {
             "tarjeta_id": tarjeta_id,
             "cuenta_id": tarjeta.cuenta_id,
@@ -879,27 +877,20 @@ async def crear_tarjeta_debito(tarjeta: TarjetaDebitoCreate, db: Session = Depen
             "cvv": tarjeta.tarjeta_cvv,
             "estilo": tarjeta.tarjeta_estilo
         }
-        result = db.execute(query, values)
-        tarjeta_id = result.fetchone().tarjeta_id
-        db.commit()
-        
-        query = text("SELECT * FROM TARJETA_DE_DEBITO WHERE TARJETA_ID = :tarjeta_id")
-        result = db.execute(query, {"tarjeta_id": tarjeta_id})
-        tarjeta_db = result.fetchone()
-        columns = result.keys()
-        return TarjetaDebitoResponse(**{col: getattr(tarjeta_db, col) for col in columns})
+        tarjeta_db = await escribir_returning(db, query, values, TarjetaDebitoResponse)
+        await db.commit()
+        return tarjeta_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear tarjeta de débito: {str(e)}")
 
 @app.get("/cuentas/{cuenta_id}/tarjetas-debito", response_model=List[TarjetaDebitoResponse], description="Obtiene todas las tarjetas de débito asociadas a una cuenta específica.")
-async def leer_tarjetas_debito_por_cuenta(cuenta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
-    query = text("""
-        SELECT td.* FROM TARJETA_DE_DEBITO td
-        JOIN CUENTA c ON td.CUENTA_ID = c.CUENTA_ID
-        WHERE td.CUENTA_ID = :cuenta_id AND c.CLIENTE_ID = :cliente_id
-    """)
-    result = db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
+async def leer_tarjetas_debito_por_cuenta(cuenta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    query = TARJETAS_DEBITO_POR_CUENTA
+    result = await db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
     tarjetas = result.fetchall()
     if not tarjetas:
         return []
@@ -907,13 +898,9 @@ async def leer_tarjetas_debito_por_cuenta(cuenta_id: str, db: Session = Depends(
     return [TarjetaDebitoResponse(**{col: getattr(tarjeta, col) for col in columns}) for tarjeta in tarjetas]
 
 @app.get("/tarjetas-debito/{tarjeta_id}", response_model=TarjetaDebitoResponse)
-async def leer_tarjeta_debito(tarjeta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
-    query = text("""
-        SELECT td.* FROM TARJETA_DE_DEBITO td
-        JOIN CUENTA c ON td.CUENTA_ID = c.CUENTA_ID
-        WHERE td.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-    """)
-    result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
+async def leer_tarjeta_debito(tarjeta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    query = TARJETA_DEBITO_DEL_CLIENTE
+    result = await db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
     tarjeta = result.fetchone()
     if not tarjeta:
         raise HTTPException(status_code=403, detail="Tarjeta de débito no encontrada o no autorizada")
@@ -921,321 +908,270 @@ async def leer_tarjeta_debito(tarjeta_id: str, db: Session = Depends(get_db), cl
     return TarjetaDebitoResponse(**{col: getattr(tarjeta, col) for col in columns})
 
 @app.put("/tarjetas-debito/{tarjeta_id}", response_model=TarjetaDebitoResponse)
-async def actualizar_tarjeta_debito(tarjeta_id: str, tarjeta: TarjetaDebitoUpdate, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def actualizar_tarjeta_debito(tarjeta_id: str, tarjeta: TarjetaDebitoUpdate, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("""
-            SELECT td.* FROM TARJETA_DE_DEBITO td
-            JOIN CUENTA c ON td.CUENTA_ID = c.CUENTA_ID
-            WHERE td.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-        """)
-        result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
-        tarjeta_db = result.fetchone()
-        if not tarjeta_db:
-            raise HTTPException(status_code=404, detail="Tarjeta de débito no encontrada o no autorizada")
-        
         update_data = tarjeta.dict(exclude_unset=True)
         if not update_data:
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
         
-        set_clause = ", ".join(f"{key.upper()} = :{key}" for key in update_data.keys())
-        query = text(f"UPDATE TARJETA_DE_DEBITO SET {set_clause} WHERE TARJETA_ID = :tarjeta_id")
-        values = {**update_data, "tarjeta_id": tarjeta_id}
-        db.execute(query, values)
-        db.commit()
-        
-        query = text("SELECT * FROM TARJETA_DE_DEBITO WHERE TARJETA_ID = :tarjeta_id")
-        result = db.execute(query, {"tarjeta_id": tarjeta_id})
-        tarjeta_db = result.fetchone()
-        columns = result.keys()
-        return TarjetaDebitoResponse(**{col: getattr(tarjeta_db, col) for col in columns})
+        # La propiedad de la tarjeta se valida en la misma sentencia (JOIN con CUENTA)
+        query = sentencia_actualizar("tarjeta_debito", tuple(update_data))
+        values = {**update_data, "tarjeta_id": tarjeta_id, "cliente_id": cliente_id}
+        tarjeta_db = await escribir_returning(db, query, values, TarjetaDebitoResponse)
+        if not tarjeta_db:
+            raise HTTPException(status_code=404, detail="Tarjeta de débito no encontrada o no autorizada")
+        await db.commit()
+        return tarjeta_db
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar tarjeta de débito: {str(e)}")
 
 @app.delete("/tarjetas-debito/{tarjeta_id}")
-async def eliminar_tarjeta_debito(tarjeta_id: str, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def eliminar_tarjeta_debito(tarjeta_id: str, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
     try:
-        query = text("""
-            SELECT td.* FROM TARJETA_DE_DEBITO td
-            JOIN CUENTA c ON td.CUENTA_ID = c.CUENTA_ID
-            WHERE td.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
-        """)
-        result = db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
+        query = TARJETA_DEBITO_DEL_CLIENTE
+        result = await db.execute(query, {"tarjeta_id": tarjeta_id, "cliente_id": cliente_id})
         tarjeta = result.fetchone()
         if not tarjeta:
             raise HTTPException(status_code=404, detail="Tarjeta de débito no encontrada o no autorizada")
         
-        query = text("DELETE FROM TARJETA_DE_DEBITO WHERE TARJETA_ID = :tarjeta_id")
-        db.execute(query, {"tarjeta_id": tarjeta_id})
-        db.commit()
+        query = ELIMINAR_TARJETA_DEBITO
+        await db.execute(query, {"tarjeta_id": tarjeta_id})
+        await db.commit()
         return {"message": "Tarjeta de débito eliminada correctamente"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al eliminar tarjeta de débito: {str(e)}")
 
+async def ejecutar_idempotente(operacion, modelo, ruta, cliente_id, idempotency_key, response):
+    if not idempotency_key:
+        return await operacion()
+    try:
+        resultado, reproducido = await idempotency_store.ejecutar(
+            (cliente_id, ruta, idempotency_key), huella(modelo), operacion
+        )
+    except ConflictoIdempotencia:
+        raise HTTPException(status_code=422, detail="La Idempotency-Key ya se usó con una petición distinta")
+    if reproducido:
+        response.headers["Idempotent-Replayed"] = "true"
+    return resultado
+
 # Endpoint para depósito
 @app.post("/transacciones/deposito", response_model=dict)
-async def deposito(deposito: DepositoRequest, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def deposito(
+    deposito: DepositoRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
+    db: AsyncSession = Depends(get_async_db),
+    cliente_id: str = Depends(get_current_user)
+):
+    return await ejecutar_idempotente(
+        lambda: procesar_deposito(deposito, db, cliente_id),
+        deposito, "deposito", cliente_id, idempotency_key, response
+    )
+
+async def procesar_deposito(deposito: DepositoRequest, db: AsyncSession, cliente_id: str):
     try:
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id AND CUENTA_ESTADO = :estado")
-        result = db.execute(query, {"cuenta_id": deposito.cuenta_id, "estado": "ACTIVA"})
-        cuenta = result.fetchone()
-        if not cuenta or cuenta.cliente_id != cliente_id:
-            raise HTTPException(status_code=403, detail="Acceso no autorizado a esta cuenta")
-        
-        if deposito.monto > cuenta.cuenta_limite_trans_web:
-            raise HTTPException(status_code=400, detail="El monto excede el límite de transacciones web")
+        params = parametros_deposito(deposito)
         
-        if deposito.cajero_id:
-            query = text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id AND CAJERO_ESTADO = :estado")
-            result = db.execute(query, {"cajero_id": deposito.cajero_id, "estado": "ACTIVO"})
-            if not result.fetchone():
-                raise HTTPException(status_code=404, detail="Cajero no encontrado o inactivo")
-        
-        transaccion_id = str(uuid4())[:8].upper()
-        transaccion_costo = Decimal("0.50")
-        transaccion_fecha = datetime.now(pytz.UTC)
-        
-        query = text("""
-            INSERT INTO TRANSACCION (
-                TRANSACCION_ID, CUENTA_ID, TRANSACCION_TIPO, TRANSACCION_MONTO,
-                TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO
-            ) VALUES (
-                :transaccion_id, :cuenta_id, :tipo, :monto, :costo, :fecha, :recibo
-            ) RETURNING TRANSACCION_ID
-        """)
-        result = db.execute(query, {
-            "transaccion_id": transaccion_id,
-            "cuenta_id": deposito.cuenta_id,
-            "tipo": "DEPOSITO",
-            "monto": deposito.monto,
-            "costo": transaccion_costo,
-            "fecha": transaccion_fecha,
-            "recibo": 1 if deposito.generar_recibo else None
-        })
-        transaccion_id = result.fetchone().transaccion_id
-        
-        query = text("""
-            INSERT INTO DEPOSITO (
-                TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO
-            ) VALUES (
-                :transaccion_id, :cuenta_id, :costo, :fecha, :recibo
-            )
-        """)
-        db.execute(query, {
-            "transaccion_id": transaccion_id,
-            "cuenta_id": deposito.cuenta_id,
-            "costo": transaccion_costo,
-            "fecha": transaccion_fecha,
-            "recibo": 1 if deposito.generar_recibo else None
-        })
-        
-        query = text("UPDATE CUENTA SET CUENTA_SALDO = CUENTA_SALDO + :monto WHERE CUENTA_ID = :cuenta_id")
-        db.execute(query, {"monto": deposito.monto, "cuenta_id": deposito.cuenta_id})
+        # Acreditación, TRANSACCION, DEPOSITO y RECIBO en una sola sentencia
+        try:
+            fila = await registrar_deposito(db, cliente_id, params)
+        except CuentaNoDisponible:
+            raise HTTPException(status_code=403, detail="Acceso no autorizado a esta cuenta")
+        except LimiteExcedido:
+            raise HTTPException(status_code=400, detail="El monto excede el límite diario de transacciones web")
+        except CajeroNoDisponible:
+            raise HTTPException(status_code=404, detail="Cajero no encontrado o inactivo")
         
         recibo = None
-        if deposito.generar_recibo and deposito.cajero_id:
-            recibo_costo = Decimal("0.25")
-            query = text("INSERT INTO RECIBO (TRANSACCION_ID, CAJERO_ID, RECIBO_COSTO) VALUES (:transaccion_id, :cajero_id, :costo)")
-            db.execute(query, {"transaccion_id": transaccion_id, "cajero_id": deposito.cajero_id, "costo": recibo_costo})
+        if params["con_recibo"]:
             recibo = ReciboResponse(
-                transaccion_id=transaccion_id,
+                transaccion_id=fila.transaccion_id,
                 cajero_id=deposito.cajero_id,
-                recibo_costo=recibo_costo,
-                transaccion_fecha=transaccion_fecha
+                recibo_costo=params["recibo_costo"],
+                transaccion_fecha=params["fecha"]
             )
         
-        db.commit()
-        return {"transaccion_id": transaccion_id, "recibo": recibo.dict() if recibo else None}
+        await db.commit()
+        return {"transaccion_id": fila.transaccion_id, "recibo": recibo.dict() if recibo else None}
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error en depósito: {str(e)}")
 
 # Endpoint para retiro
 @app.post("/transacciones/retiro", response_model=dict)
-async def retiro(retiro: RetiroRequest, db: Session = Depends(get_db), cliente_id: str = Depends(get_current_user)):
+async def retiro(
+    retiro: RetiroRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
+    db: AsyncSession = Depends(get_async_db),
+    cliente_id: str = Depends(get_current_user)
+):
+    return await ejecutar_idempotente(
+        lambda: procesar_retiro(retiro, db, cliente_id),
+        retiro, "retiro", cliente_id, idempotency_key, response
+    )
+
+async def procesar_retiro(retiro: RetiroRequest, db: AsyncSession, cliente_id: str):
     try:
-        query = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id AND CUENTA_ESTADO = :estado")
-        result = db.execute(query, {"cuenta_id": retiro.cuenta_id, "estado": "ACTIVA"})
-        cuenta = result.fetchone()
-        if not cuenta or cuenta.cliente_id != cliente_id:
+        params = parametros_retiro(retiro)
+        
+        # Débito, TRANSACCION, RETIRO, subtipo y RECIBO en una sola sentencia
+        try:
+            fila = await registrar_retiro(db, cliente_id, params)
+        except CuentaNoDisponible:
             raise HTTPException(status_code=403, detail="Acceso no autorizado a esta cuenta")
-        if cuenta.cuenta_saldo < retiro.monto:
+        except SaldoInsuficiente:
             raise HTTPException(status_code=400, detail="Saldo insuficiente")
-        
-        query = text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id AND CAJERO_ESTADO = :estado")
-        result = db.execute(query, {"cajero_id": retiro.cajero_id, "estado": "ACTIVO"})
-        if not result.fetchone():
+        except LimiteExcedido:
+            raise HTTPException(status_code=400, detail="El monto excede el límite diario de transacciones móviles")
+        except CajeroNoDisponible:
             raise HTTPException(status_code=404, detail="Cajero no encontrado o inactivo")
-        
-        if retiro.monto > cuenta.cuenta_limite_trans_movil and retiro.usar_tarjeta:
-            raise HTTPException(status_code=400, detail="El monto excede el límite de transacciones móviles")
-        
-        transaccion_id = str(uuid4())[:8].upper()
-        transaccion_costo = Decimal("1.00") if retiro.usar_tarjeta else Decimal("0.75")
-        transaccion_fecha = datetime.now(pytz.UTC)
-        
-        query = text("""
-            INSERT INTO TRANSACCION (
-                TRANSACCION_ID, CUENTA_ID, TRANSACCION_TIPO, TRANSACCION_MONTO,
-                TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO
-            ) VALUES (
-                :transaccion_id, :cuenta_id, :tipo, :monto, :costo, :fecha, :recibo
-            ) RETURNING TRANSACCION_ID
-        """)
-        result = db.execute(query, {
-            "transaccion_id": transaccion_id,
-            "cuenta_id": retiro.cuenta_id,
-            "tipo": "RETIRO",
-            "monto": retiro.monto,
-            "costo": transaccion_costo,
-            "fecha": transaccion_fecha,
-            "recibo": 1 if retiro.generar_recibo else None
-        })
-        transaccion_id = result.fetchone().transaccion_id
-        
-        query = text("""
-            INSERT INTO RETIRO (
-                TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
-                TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX
-            ) VALUES (
-                :transaccion_id, :cuenta_id, :costo, :fecha, :recibo, :monto, :monto_max
-            )
-        """)
-        db.execute(query, {
-            "transaccion_id": transaccion_id,
-            "cuenta_id": retiro.cuenta_id,
-            "costo": transaccion_costo,
-            "fecha": transaccion_fecha,
-            "recibo": 1 if retiro.generar_recibo else None,
-            "monto": retiro.monto,
-            "monto_max": Decimal("1000")
-        })
-        
-        if retiro.usar_tarjeta and retiro.tarjeta_id:
-            query = text("SELECT * FROM TARJETA WHERE TARJETA_ID = :tarjeta_id AND CUENTA_ID = :cuenta_id AND TARJETA_ESTADO = :estado")
-            result = db.execute(query, {"tarjeta_id": retiro.tarjeta_id, "cuenta_id": retiro.cuenta_id, "estado": "ACTIVA"})
-            tarjeta = result.fetchone()
-            if not tarjeta:
-                raise HTTPException(status_code=404, detail="Tarjeta no encontrada o inactiva")
-            query = text("""
-                INSERT INTO RETIRO_CON_TARJETA (
-                    TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
-                    TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX, RETIROCT_TARJETA,
-                    RETIROCT_AID, RETIROCT_P22, RETIROCT_P38, RETIROCT_COSTO_INTERBANCARIO
-                ) VALUES (
-                    :transaccion_id, :cuenta_id, :costo, :fecha, :recibo, :monto,
-                    :monto_max, :tarjeta, :aid, :p22, :p38, :costo_inter
-                )
-            """)
-            db.execute(query, {
-                "transaccion_id": transaccion_id,
-                "cuenta_id": retiro.cuenta_id,
-                "costo": transaccion_costo,
-                "fecha": transaccion_fecha,
-                "recibo": 1 if retiro.generar_recibo else None,
-                "monto": retiro.monto,
-                "monto_max": Decimal("1000"),
-                "tarjeta": retiro.tarjeta_id,
-                "aid": "A0000000041010",
-                "p22": "123",
-                "p38": "123456",
-                "costo_inter": Decimal("0.10")
-            })
-        else:
-            query = text("""
-                INSERT INTO RETIRO_SIN_TARJETA (
-                    TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
-                    TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX,
-                    RETIROST_CELULAR_BENEFICIARIO, RETIROST_CLAVE,
-                    RETIROST_DURACION, RETIROST_MAXIMO_RETIROS
-                ) VALUES (
-                    :transaccion_id, :cuenta_id, :costo, :fecha, :recibo, :monto,
-                    :monto_max, :celular_beneficiario, :clave, :duracion, :maximo_retiros
-                )
-            """)
-            db.execute(query, {
-                "transaccion_id": transaccion_id,
-                "cuenta_id": retiro.cuenta_id,
-                "costo": transaccion_costo,
-                "fecha": transaccion_fecha,
-                "recibo": 1 if retiro.generar_recibo else None,
-                "monto": retiro.monto,
-                "monto_max": Decimal("1000"),
-                "celular_beneficiario": "0999999999",
-                "clave": "1234",
-                "duracion": 24,
-                "maximo_retiros": 1
-            })
-        
-        query = text("UPDATE CUENTA SET CUENTA_SALDO = CUENTA_SALDO - :monto WHERE CUENTA_ID = :cuenta_id")
-        db.execute(query, {"monto": retiro.monto, "cuenta_id": retiro.cuenta_id})
+        except TarjetaNoDisponible:
+            raise HTTPException(status_code=404, detail="Tarjeta no encontrada o inactiva")
         
         recibo = None
-        if retiro.generar_recibo and retiro.cajero_id:
-            recibo_costo = Decimal("0.25")
-            query = text("INSERT INTO RECIBO (TRANSACCION_ID, CAJERO_ID, RECIBO_COSTO) VALUES (:transaccion_id, :cajero_id, :costo)")
-            db.execute(query, {"transaccion_id": transaccion_id, "cajero_id": retiro.cajero_id, "costo": recibo_costo})
+        if params["con_recibo"]:
             recibo = ReciboResponse(
-                transaccion_id=transaccion_id,
+                transaccion_id=fila.transaccion_id,
                 cajero_id=retiro.cajero_id,
-                recibo_costo=recibo_costo,
-                transaccion_fecha=transaccion_fecha
+                recibo_costo=params["recibo_costo"],
+                transaccion_fecha=params["fecha"]
             )
         
-        db.commit()
-        return {"transaccion_id": transaccion_id, "recibo": recibo.dict() if recibo else None}
+        await db.commit()
+        return {"transaccion_id": fila.transaccion_id, "recibo": recibo.dict() if recibo else None}
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error en retiro: {str(e)}")
 
+# Endpoint para ingesta por lotes (cierres de cajeros y agencias)
+@app.post(
+    "/transacciones/lote",
+    response_model=LoteResponse,
+    description=(
+        "Registra un lote de depósitos y retiros. El cuerpo es un arreglo JSON o NDJSON "
+        "(Content-Type: application/x-ndjson) con ítems DepositoRequest/RetiroRequest y un campo "
+        "`tipo` ('deposito' o 'retiro'). Cada ítem se valida por separado; la respuesta indica "
+        "por ítem si se aplicó o el motivo del rechazo."
+    )
+)
+async def ingesta_lote(request: Request, db: AsyncSession = Depends(get_async_db), cliente_id: str = Depends(get_current_user)):
+    try:
+        items = await leer_lote(request)
+    except LoteDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except LoteInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        resultado = await aplicar_lote(db, cliente_id, items)
+        await db.commit()
+        return resultado
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error en lote: {str(e)}")
+
 # Endpoint para obtener transacciones por cuenta
 @app.get(
     "/cuentas/{cuenta_id}/transacciones",
     response_model=List[TransaccionResponse],
-    description="Obtiene todas las transacciones asociadas a una cuenta específica."
+    description=(
+        "Obtiene las transacciones de una cuenta, de la más reciente a la más antigua, "
+        "paginadas por cursor. Si hay más resultados, la cabecera X-Next-Cursor trae "
+        "el cursor de la página siguiente."
+    )
 )
 async def leer_transacciones_por_cuenta(
     cuenta_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en X-Next-Cursor"),
+    limit: int = Query(TRANSACCIONES_LIMITE_DEFECTO, ge=1, le=TRANSACCIONES_LIMITE_MAXIMO),
+    desde: Optional[datetime] = Query(None, description="Fecha inicial (inclusive)"),
+    hasta: Optional[datetime] = Query(None, description="Fecha final (exclusiva)"),
+    tipo: Optional[str] = Query(None, max_length=32, description="Tipo de transacción"),
+    monto_min: Optional[Decimal] = Query(None, ge=0),
+    monto_max: Optional[Decimal] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
     cliente_id: str = Depends(get_current_user)
 ):
     try:
         # Verificar que la cuenta pertenece al cliente
-        query = text("""
-            SELECT CUENTA_ID AS cuenta_id, CLIENTE_ID AS cliente_id 
-            FROM CUENTA 
-            WHERE CUENTA_ID = :cuenta_id AND CLIENTE_ID = :cliente_id
-        """)
-        result = db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
+        query = CUENTA_DEL_CLIENTE
+        result = await db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
         cuenta = result.fetchone()
         if not cuenta:
             raise HTTPException(status_code=403, detail="Cuenta no encontrada o no autorizada")
 
-        # Obtener transacciones
-        query = text("""
-    SELECT 
-        TRANSACCION_ID AS transaccion_id,
-        CUENTA_ID AS cuenta_id,
-        TIPO AS transaccion_tipo,
-        transaccion_monto AS transaccion_monto,
-        TRANSACCION_COSTO AS transaccion_costo,
-        TRANSACCION_FECHA AS transaccion_fecha,
-        TRANSACCION_DESCRIPCION AS transaccion_descripcion,
-        TRANSACCION_RECIBO AS transaccion_recibo
-    FROM TRANSACCION 
-    WHERE CUENTA_ID = :cuenta_id
-""")
-        result = db.execute(query, {"cuenta_id": cuenta_id})
-        transacciones = result.fetchall()
+        # Obtener una página de transacciones (base y, si llega tan atrás, archivo)
+        try:
+            transacciones = await pagina_transacciones(
+                db, cuenta_id, limit, cursor,
+                desde=desde, hasta=hasta, tipo=tipo, monto_min=monto_min, monto_max=monto_max
+            )
+        except CursorInvalido as e:
+            raise HTTPException(status_code=400, detail=str(e))
         if not transacciones:
             return []
-        
-        columns = result.keys()
-        return [TransaccionResponse(**{col: getattr(transaccion, col) for col in columns}) for transaccion in transacciones]
+
+        if len(transacciones) > limit:
+            transacciones = transacciones[:limit]
+            ultima = transacciones[-1]
+            response.headers["X-Next-Cursor"] = codificar_cursor(ultima["transaccion_fecha"], ultima["transaccion_id"])
+
+        return [TransaccionResponse(**transaccion) for transaccion in transacciones]
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in leer_transacciones_por_cuenta: {str(e)}")
+        logger.exception("Error in leer_transacciones_por_cuenta: %s", e)
         raise HTTPException(status_code=500, detail=f"Error al obtener transacciones: {str(e)}")
+
+# Endpoint para exportar el extracto completo de una cuenta
+@app.get(
+    "/cuentas/{cuenta_id}/transacciones/export",
+    description=(
+        "Exporta todas las transacciones de una cuenta en NDJSON o CSV, fila a fila. "
+        "Se comprime con gzip al vuelo si el cliente envía Accept-Encoding: gzip."
+    )
+)
+async def exportar_transacciones_por_cuenta(
+    cuenta_id: str,
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    desde: Optional[datetime] = Query(None, description="Fecha inicial (inclusive)"),
+    hasta: Optional[datetime] = Query(None, description="Fecha final (exclusiva)"),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    cliente_id: str = Depends(get_current_user)
+):
+    query = EXISTE_CUENTA_DEL_CLIENTE
+    result = await db.execute(query, {"cuenta_id": cuenta_id, "cliente_id": cliente_id})
+    if not result.fetchone():
+        raise HTTPException(status_code=403, detail="Cuenta no encontrada o no autorizada")
+
+    query, params = consulta_exportacion_transacciones(cuenta_id, desde=desde, hasta=hasta)
+    archivados = lotes_archivados(cuenta_id, desde=desde, hasta=hasta) if alcanza_archivo(params, desde) else None
+    comprimir = acepta_gzip(accept_encoding)
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    headers = {
+        "Content-Disposition": f'attachment; filename="extracto_{cuenta_id}.{formato}"',
+        "Vary": "Accept-Encoding",
+    }
+    if comprimir:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        exportar_transacciones(query, params, formato, comprimir, archivados),
+        media_type=media_type,
+        headers=headers,
+    )
     
 @app.post(
     "/cuentas/{cuenta_id}/retiro-sin-tarjeta",
@@ -1245,69 +1181,31 @@ async def leer_transacciones_por_cuenta(
 async def retiro_sin_tarjeta(
     cuenta_id: str,
     retiro: RetiroSinTarjetaRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     cliente_id: str = Depends(get_current_user)
 ):
     try:
-        # Verificar que la cuenta existe y pertenece al cliente
-        query_cuenta = text("""
-            SELECT CUENTA_ID AS cuenta_id, cuenta_saldo AS cuenta_saldo, CUENTA_LIMITE_TRANS_MOVIL AS cuenta_limite_trans_movil 
-            FROM CUENTA 
-            WHERE CUENTA_ID = :cuenta_id AND CLIENTE_ID = :cliente_id AND CUENTA_ESTADO = :estado
-        """)
-        result_cuenta = db.execute(query_cuenta, {"cuenta_id": cuenta_id, "cliente_id": cliente_id, "estado": "ACTIVA"}).fetchone()
-        logger.info(f"Query result for cuenta_id {cuenta_id}: {result_cuenta}")
-        if not result_cuenta:
-            raise HTTPException(status_code=404, detail="Cuenta no encontrada, no pertenece al cliente o no está activa")
-
-        saldo_actual = result_cuenta.cuenta_saldo
-        limite_movil = result_cuenta.cuenta_limite_trans_movil
         monto = Decimal(str(retiro.monto))
-        if saldo_actual < monto:
+
+        # Débito atómico: verifica propiedad, estado, límite móvil y saldo en el mismo UPDATE
+        try:
+            await debitar(db, cuenta_id, cliente_id, monto, canal="movil")
+        except CuentaNoDisponible:
+            raise HTTPException(status_code=404, detail="Cuenta no encontrada, no pertenece al cliente o no está activa")
+        except SaldoInsuficiente:
             raise HTTPException(status_code=400, detail="Saldo insuficiente para el retiro")
-        if monto > limite_movil:
-            raise HTTPException(status_code=400, detail="El monto excede el límite de transacciones móviles")
+        except LimiteExcedido:
+            raise HTTPException(status_code=400, detail="El monto excede el límite diario de transacciones móviles")
 
         # Generar ID de transacción y código de verificación
-        transaccion_id = str(uuid4())[:8]
+        transaccion_id = nuevo_transaccion_id()
         codigo_verificacion = ''.join(random.choices(string.digits, k=4))
 
-        # Actualizar el saldo de la cuenta
-        nuevo_saldo = saldo_actual - monto
-        query_actualizar_saldo = text("""
-            UPDATE CUENTA 
-            SET cuenta_saldo = :nuevo_saldo 
-            WHERE CUENTA_ID = :cuenta_id
-        """)
-        db.execute(query_actualizar_saldo, {"nuevo_saldo": nuevo_saldo, "cuenta_id": cuenta_id})
-
         # Registrar la transacción en TRANSACCION
         transaccion_costo = Decimal("0.75")
         transaccion_fecha = datetime.now(pytz.UTC)
-        query_insertar_transaccion = text("""
-            INSERT INTO TRANSACCION (
-                TRANSACCION_ID, 
-                CUENTA_ID, 
-                TIPO, 
-                TRANSACCION_MONTO, 
-                TRANSACCION_COSTO, 
-                TRANSACCION_FECHA, 
-                TRANSACCION_DESCRIPCION,
-                TRANSACCION_RECIBO
-            )
-            VALUES (
-                :transaccion_id, 
-                :cuenta_id, 
-                :transaccion_tipo, 
-                :transaccion_monto, 
-                :transaccion_costo, 
-                :transaccion_fecha, 
-                :transaccion_descripcion,
-                :transaccion_recibo
-            )
-            RETURNING *
-        """)
-        result_transaccion = db.execute(query_insertar_transaccion, {
+        query_insertar_transaccion = INSERTAR_TRANSACCION
+        result_transaccion = (await db.execute(query_insertar_transaccion, {
             "transaccion_id": transaccion_id,
             "cuenta_id": cuenta_id,
             "transaccion_tipo": "RETIRO_SIN_TARJETA",
@@ -1316,29 +1214,11 @@ async def retiro_sin_tarjeta(
             "transaccion_fecha": transaccion_fecha,
             "transaccion_descripcion": retiro.descripcion or "Retiro sin tarjeta",
             "transaccion_recibo": None
-        }).fetchone()
+        })).fetchone()
 
         # Registrar en RETIRO
-        query_insertar_retiro = text("""
-            INSERT INTO RETIRO (
-                TRANSACCION_ID, 
-                CUENTA_ID, 
-                TRANSACCION_COSTO, 
-                TRANSACCION_FECHA, 
-                TRANSACCION_RECIBO,
-                RETIRO_MONTO,
-                RETIRO_MONTO_MAX
-            ) VALUES (
-                :transaccion_id, 
-                :cuenta_id, 
-                :transaccion_costo, 
-                :transaccion_fecha, 
-                :transaccion_recibo,
-                :retiro_monto,
-                :retiro_monto_max
-            )
-        """)
-        db.execute(query_insertar_retiro, {
+        query_insertar_retiro = INSERTAR_RETIRO
+        await db.execute(query_insertar_retiro, {
             "transaccion_id": transaccion_id,
             "cuenta_id": cuenta_id,
             "transaccion_costo": transaccion_costo,
@@ -1349,34 +1229,8 @@ async def retiro_sin_tarjeta(
         })
 
         # Registrar en RETIRO_SIN_TARJETA
-        query_retiro_sin_tarjeta = text("""
-            INSERT INTO RETIRO_SIN_TARJETA (
-                TRANSACCION_ID, 
-                CUENTA_ID, 
-                TRANSACCION_COSTO, 
-                TRANSACCION_FECHA, 
-                TRANSACCION_RECIBO,
-                RETIRO_MONTO,
-                RETIRO_MONTO_MAX,
-                RETIROST_CELULAR_BENEFICIARIO,
-                RETIROST_CLAVE,
-                RETIROST_DURACION,
-                RETIROST_MAXIMO_RETIROS
-            ) VALUES (
-                :transaccion_id, 
-                :cuenta_id, 
-                :transaccion_costo, 
-                :transaccion_fecha, 
-                :transaccion_recibo,
-                :retiro_monto,
-                :retiro_monto_max,
-                :celular_beneficiario,
-                :retirost_clave,
-                :duracion,
-                :maximo_retiros
-            )
-        """)
-        db.execute(query_retiro_sin_tarjeta, {
+        query_retiro_sin_tarjeta = INSERTAR_RETIRO_SIN_TARJETA
+        await db.execute(query_retiro_sin_tarjeta, {
             "transaccion_id": transaccion_id,
             "cuenta_id": cuenta_id,
             "transaccion_costo": transaccion_costo,
@@ -1390,12 +1244,27 @@ async def retiro_sin_tarjeta(
             "maximo_retiros": 1
         })
 
-        db.commit()
+        # Acumular en el resumen mensual de la cuenta
+        await db.execute(ACUMULAR_RESUMEN, {
+            "cuenta_id": cuenta_id,
+            "depositado": 0,
+            "retirado": monto,
+            "costos": transaccion_costo,
+            "depositos": 0,
+            "retiros": 1,
+            "fecha": transaccion_fecha,
+            "transaccion_id": transaccion_id
+        })
+
+        await db.commit()
         return RetiroSinTarjetaResponse(
             transaccion_id=transaccion_id,
             codigo_verificacion=codigo_verificacion
         )
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
-        logger.error(f"Error in retiro_sin_tarjeta: {str(e)}")
+        await db.rollback()
+        logger.exception("Error in retiro_sin_tarjeta: %s", e)
         raise HTTPException(status_code=500, detail=f"Error al realizar el retiro: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,141 @@
+-- Esquema base del banco. Las migraciones siguientes lo extienden; todo es
+-- IF NOT EXISTS para poder aplicarlo sobre una base creada a mano antes de
+-- que existiera el runner (python -m comandos.migrar).
+
+CREATE TABLE IF NOT EXISTS CLIENTE (
+    CLIENTE_ID            VARCHAR(10)  PRIMARY KEY,
+    CLIENTE_NOMBRES       VARCHAR(32)  NOT NULL,
+    CLIENTE_APELLIDOS     VARCHAR(32)  NOT NULL,
+    CLIENTE_CORREO        VARCHAR(64)  NOT NULL,
+    CLIENTE_CELULAR       VARCHAR(10)  NOT NULL,
+    CLIENTE_DIRECCION     VARCHAR(128) NOT NULL,
+    CLIENTE_PROVINCIA     VARCHAR(32)  NOT NULL,
+    CLIENTE_CIUDAD        VARCHAR(32)  NOT NULL,
+    CLIENTE_FCHNACIMIENTO DATE         NOT NULL,
+    CLIENTE_CONTRASENA    VARCHAR(128) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS CUENTA (
+    CUENTA_ID                 VARCHAR(10)   PRIMARY KEY,
+    CLIENTE_ID                VARCHAR(10)   NOT NULL REFERENCES CLIENTE (CLIENTE_ID),
+    CUENTA_NOMBRE             VARCHAR(64)   NOT NULL,
+    CUENTA_SALDO              NUMERIC(14,2) NOT NULL DEFAULT 0 CHECK (CUENTA_SALDO >= 0),
+    CUENTA_APERTURA           DATE          NOT NULL,
+    CUENTA_ESTADO             VARCHAR(32)   NOT NULL,
+    CUENTA_LIMITE_TRANS_WEB   NUMERIC(14,2) NOT NULL DEFAULT 0,
+    CUENTA_LIMITE_TRANS_MOVIL NUMERIC(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS CAJERO (
+    CAJERO_ID        VARCHAR(10)  PRIMARY KEY,
+    CAJERO_UBICACION VARCHAR(128) NOT NULL,
+    CAJERO_TIPO      VARCHAR(16)  NOT NULL,
+    CAJERO_ESTADO    VARCHAR(16)  NOT NULL
+);
+
+-- TARJETA, TARJETA_DE_CREDITO y TARJETA_DE_DEBITO son tablas independientes
+-- (cada una genera su propio TARJETA_ID) con las mismas columnas comunes.
+CREATE TABLE IF NOT EXISTS TARJETA (
+    TARJETA_ID              VARCHAR(16) PRIMARY KEY,
+    CUENTA_ID               VARCHAR(10) NOT NULL REFERENCES CUENTA (CUENTA_ID),
+    TARJETA_NOMBRE          VARCHAR(32) NOT NULL,
+    TARJETA_PIN_SEGURIDAD   VARCHAR(6)  NOT NULL,
+    TARJETA_FECHA_CADUCIDAD DATE        NOT NULL,
+    TARJETA_FECHA_EMISION   DATE        NOT NULL,
+    TARJETA_ESTADO          VARCHAR(16) NOT NULL,
+    TARJETA_CVV             VARCHAR(3)  NOT NULL,
+    TARJETA_ESTILO          VARCHAR(64) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS TARJETA_DE_CREDITO (
+    TARJETA_ID                  VARCHAR(16)   PRIMARY KEY,
+    CUENTA_ID                   VARCHAR(10)   NOT NULL REFERENCES CUENTA (CUENTA_ID),
+    TARJETA_NOMBRE              VARCHAR(32)   NOT NULL,
+    TARJETA_PIN_SEGURIDAD       VARCHAR(6)    NOT NULL,
+    TARJETA_FECHA_CADUCIDAD     DATE          NOT NULL,
+    TARJETA_FECHA_EMISION       DATE          NOT NULL,
+    TARJETA_ESTADO              VARCHAR(16)   NOT NULL,
+    TARJETA_CVV                 VARCHAR(3)    NOT NULL,
+    TARJETA_ESTILO              VARCHAR(64)   NOT NULL,
+    TARJETACREDITO_CUPO         NUMERIC(8,2)  NOT NULL,
+    TARJETA_CREDITO_PAGO_MINIMO NUMERIC(8,2)  NOT NULL,
+    TARJETA_CREDITO_PAGO_TOTAL  NUMERIC(8,2)  NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS TARJETA_DE_DEBITO (
+    TARJETA_ID              VARCHAR(16) PRIMARY KEY,
+    CUENTA_ID               VARCHAR(10) NOT NULL REFERENCES CUENTA (CUENTA_ID),
+    TARJETA_NOMBRE          VARCHAR(32) NOT NULL,
+    TARJETA_PIN_SEGURIDAD   VARCHAR(6)  NOT NULL,
+    TARJETA_FECHA_CADUCIDAD DATE        NOT NULL,
+    TARJETA_FECHA_EMISION   DATE        NOT NULL,
+    TARJETA_ESTADO          VARCHAR(16) NOT NULL,
+    TARJETA_CVV             VARCHAR(3)  NOT NULL,
+    TARJETA_ESTILO          VARCHAR(64) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS TRANSACCION (
+    TRANSACCION_ID          VARCHAR(16)   PRIMARY KEY,
+    CUENTA_ID               VARCHAR(10)   NOT NULL REFERENCES CUENTA (CUENTA_ID),
+    TIPO                    VARCHAR(32)   NOT NULL,
+    TRANSACCION_MONTO       NUMERIC(14,2) NOT NULL,
+    TRANSACCION_COSTO       NUMERIC(14,2) NOT NULL DEFAULT 0,
+    TRANSACCION_FECHA       TIMESTAMPTZ   NOT NULL DEFAULT now(),
+    TRANSACCION_DESCRIPCION VARCHAR(100),
+    TRANSACCION_RECIBO      INTEGER
+);
+
+-- Subtipos de TRANSACCION: repiten las columnas comunes y comparten el
+-- TRANSACCION_ID del movimiento.
+CREATE TABLE IF NOT EXISTS DEPOSITO (
+    TRANSACCION_ID     VARCHAR(16)   PRIMARY KEY REFERENCES TRANSACCION (TRANSACCION_ID),
+    CUENTA_ID          VARCHAR(10)   NOT NULL,
+    TRANSACCION_COSTO  NUMERIC(14,2) NOT NULL DEFAULT 0,
+    TRANSACCION_FECHA  TIMESTAMPTZ   NOT NULL,
+    TRANSACCION_RECIBO INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS RETIRO (
+    TRANSACCION_ID     VARCHAR(16)   PRIMARY KEY REFERENCES TRANSACCION (TRANSACCION_ID),
+    CUENTA_ID          VARCHAR(10)   NOT NULL,
+    TRANSACCION_COSTO  NUMERIC(14,2) NOT NULL DEFAULT 0,
+    TRANSACCION_FECHA  TIMESTAMPTZ   NOT NULL,
+    TRANSACCION_RECIBO INTEGER,
+    RETIRO_MONTO       NUMERIC(14,2) NOT NULL,
+    RETIRO_MONTO_MAX   NUMERIC(14,2) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS RETIRO_CON_TARJETA (
+    TRANSACCION_ID               VARCHAR(16)   PRIMARY KEY REFERENCES RETIRO (TRANSACCION_ID),
+    CUENTA_ID                    VARCHAR(10)   NOT NULL,
+    TRANSACCION_COSTO            NUMERIC(14,2) NOT NULL DEFAULT 0,
+    TRANSACCION_FECHA            TIMESTAMPTZ   NOT NULL,
+    TRANSACCION_RECIBO           INTEGER,
+    RETIRO_MONTO                 NUMERIC(14,2) NOT NULL,
+    RETIRO_MONTO_MAX             NUMERIC(14,2) NOT NULL,
+    RETIROCT_TARJETA             VARCHAR(16)   NOT NULL,
+    RETIROCT_AID                 VARCHAR(32),
+    RETIROCT_P22                 VARCHAR(16),
+    RETIROCT_P38                 VARCHAR(16),
+    RETIROCT_COSTO_INTERBANCARIO NUMERIC(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS RETIRO_SIN_TARJETA (
+    TRANSACCION_ID                VARCHAR(16)   PRIMARY KEY REFERENCES RETIRO (TRANSACCION_ID),
+    CUENTA_ID                     VARCHAR(10)   NOT NULL,
+    TRANSACCION_COSTO             NUMERIC(14,2) NOT NULL DEFAULT 0,
+    TRANSACCION_FECHA             TIMESTAMPTZ   NOT NULL,
+    TRANSACCION_RECIBO            INTEGER,
+    RETIRO_MONTO                  NUMERIC(14,2) NOT NULL,
+    RETIRO_MONTO_MAX              NUMERIC(14,2) NOT NULL,
+    RETIROST_CELULAR_BENEFICIARIO VARCHAR(10)   NOT NULL,
+    RETIROST_CLAVE                VARCHAR(8)    NOT NULL,
+    RETIROST_DURACION             INTEGER       NOT NULL,
+    RETIROST_MAXIMO_RETIROS       INTEGER       NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS RECIBO (
+    TRANSACCION_ID VARCHAR(16)   PRIMARY KEY REFERENCES TRANSACCION (TRANSACCION_ID),
+    CAJERO_ID      VARCHAR(10)   REFERENCES CAJERO (CAJERO_ID),
+    RECIBO_COSTO   NUMERIC(14,2) NOT NULL DEFAULT 0
+);
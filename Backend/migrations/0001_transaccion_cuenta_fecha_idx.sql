@@ -0,0 +1,4 @@
+-- Índice para la paginación keyset del historial por cuenta
+-- (GET /cuentas/{cuenta_id}/transacciones ordena por fecha e id descendentes)
+CREATE INDEX IF NOT EXISTS IDX_TRANSACCION_CUENTA_FECHA
+    ON TRANSACCION (CUENTA_ID, TRANSACCION_FECHA DESC, TRANSACCION_ID DESC);
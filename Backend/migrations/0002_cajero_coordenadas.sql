@@ -0,0 +1,6 @@
+-- Coordenadas de los cajeros para GET /cajeros/cercanos
+-- (CAJERO_UBICACION sigue siendo la dirección en texto libre)
+ALTER TABLE CAJERO ADD COLUMN IF NOT EXISTS CAJERO_LATITUD NUMERIC(9, 6)
+    CHECK (CAJERO_LATITUD BETWEEN -90 AND 90);
+ALTER TABLE CAJERO ADD COLUMN IF NOT EXISTS CAJERO_LONGITUD NUMERIC(9, 6)
+    CHECK (CAJERO_LONGITUD BETWEEN -180 AND 180);
@@ -0,0 +1,16 @@
+-- Resumen mensual materializado por cuenta (GET /cuentas/{cuenta_id}/resumen).
+-- Lo mantienen deposito, retiro, retiro_sin_tarjeta y la ingesta por lotes en
+-- la misma transacción que el movimiento; se reconstruye con
+-- python -m comandos.reconstruir_resumen
+CREATE TABLE IF NOT EXISTS RESUMEN_CUENTA (
+    CUENTA_ID                  VARCHAR(10)   NOT NULL REFERENCES CUENTA (CUENTA_ID) ON DELETE CASCADE,
+    RESUMEN_MES                DATE          NOT NULL,
+    RESUMEN_DEPOSITADO         NUMERIC(14,2) NOT NULL DEFAULT 0,
+    RESUMEN_RETIRADO           NUMERIC(14,2) NOT NULL DEFAULT 0,
+    RESUMEN_COSTOS             NUMERIC(14,2) NOT NULL DEFAULT 0,
+    RESUMEN_DEPOSITOS          INTEGER       NOT NULL DEFAULT 0,
+    RESUMEN_RETIROS            INTEGER       NOT NULL DEFAULT 0,
+    RESUMEN_ULTIMO_MOVIMIENTO  TIMESTAMPTZ,
+    RESUMEN_ULTIMA_TRANSACCION VARCHAR(16),
+    PRIMARY KEY (CUENTA_ID, RESUMEN_MES)
+);
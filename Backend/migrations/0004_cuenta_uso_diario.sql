@@ -0,0 +1,7 @@
+-- Contadores de uso diario por canal para los límites CUENTA_LIMITE_TRANS_WEB /
+-- CUENTA_LIMITE_TRANS_MOVIL. Viven en la fila de CUENTA para que el control del
+-- límite y el incremento vayan en el mismo UPDATE que el saldo; un contador
+-- con CUENTA_USO_FECHA anterior al día en curso cuenta como 0.
+ALTER TABLE CUENTA ADD COLUMN IF NOT EXISTS CUENTA_USO_FECHA DATE;
+ALTER TABLE CUENTA ADD COLUMN IF NOT EXISTS CUENTA_USO_WEB NUMERIC(14,2) NOT NULL DEFAULT 0;
+ALTER TABLE CUENTA ADD COLUMN IF NOT EXISTS CUENTA_USO_MOVIL NUMERIC(14,2) NOT NULL DEFAULT 0;
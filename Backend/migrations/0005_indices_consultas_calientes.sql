@@ -0,0 +1,31 @@
+-- migrar: sin-transaccion
+-- Índices de los filtros de las consultas calientes. Se crean CONCURRENTLY
+-- para no bloquear escrituras en tablas ya pobladas, así que el runner aplica
+-- este archivo sentencia por sentencia fuera de una transacción (si una falla
+-- queda un índice INVALID: borrarlo y volver a correr el runner). TRANSACCION.CUENTA_ID ya lo cubre
+-- IDX_TRANSACCION_CUENTA_FECHA (0001) como prefijo.
+-- Verificación: python -m comandos.migrar --verificar-planes
+
+-- Cuentas del cliente (GET /clientes/{id}, /clientes/{id}/resumen, JOINs de propiedad)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_CUENTA_CLIENTE
+    ON CUENTA (CLIENTE_ID, CUENTA_ID);
+
+-- Tarjetas por cuenta
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_TARJETA_CUENTA
+    ON TARJETA (CUENTA_ID);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_TARJETA_DE_CREDITO_CUENTA
+    ON TARJETA_DE_CREDITO (CUENTA_ID);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_TARJETA_DE_DEBITO_CUENTA
+    ON TARJETA_DE_DEBITO (CUENTA_ID);
+
+-- Cajeros por estado (catálogo de activos, validación del cajero en movimientos)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_CAJERO_ESTADO
+    ON CAJERO (CAJERO_ESTADO, CAJERO_ID);
+
+-- Cobro de un retiro sin tarjeta: se busca por celular del beneficiario y clave
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_RETIRO_SIN_TARJETA_CELULAR_CLAVE
+    ON RETIRO_SIN_TARJETA (RETIROST_CELULAR_BENEFICIARIO, RETIROST_CLAVE);
+
+-- Recibos por cajero: borrar un cajero revisa la FK de RECIBO
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_RECIBO_CAJERO
+    ON RECIBO (CAJERO_ID);
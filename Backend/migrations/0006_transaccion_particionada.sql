@@ -0,0 +1,100 @@
+-- Particionamiento mensual por TRANSACCION_FECHA (meses UTC, igual que
+-- RESUMEN_CUENTA) de TRANSACCION y sus subtipos DEPOSITO, RETIRO,
+-- RETIRO_CON_TARJETA y RETIRO_SIN_TARJETA. Las particiones se llaman
+-- <tabla>_AAAA_MM y las crea CREAR_PARTICION_MENSUAL; los meses futuros y el
+-- retiro de los viejos los maneja python -m comandos.particiones.
+--
+-- Reescribe las cinco tablas en una sola transacción: en una base con
+-- historial grande correrla en una ventana de mantenimiento.
+--
+-- La PK pasa a ser (TRANSACCION_ID, TRANSACCION_FECHA), porque una tabla
+-- particionada sólo admite claves únicas que incluyan la clave de partición.
+-- Por lo mismo se quitan las FKs de los subtipos y de RECIBO hacia
+-- TRANSACCION / RETIRO: los movimientos insertan toda la cadena en una sola
+-- sentencia (services.movimientos), y así una partición vieja se puede
+-- desasociar sin tocar las demás tablas.
+
+CREATE OR REPLACE FUNCTION CREAR_PARTICION_MENSUAL(tabla TEXT, mes DATE) RETURNS TEXT AS $$
+DECLARE
+    inicio DATE := date_trunc('month', mes)::date;
+    nombre TEXT := lower(tabla) || '_' || to_char(inicio, 'YYYY_MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        nombre, lower(tabla),
+        inicio::timestamp AT TIME ZONE 'UTC',
+        (inicio + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+    );
+    RETURN nombre;
+END
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    restriccion RECORD;
+    tabla TEXT;
+    desde DATE;
+    hasta DATE;
+    mes DATE;
+BEGIN
+    FOR restriccion IN
+        SELECT conrelid::regclass AS tabla, conname
+        FROM pg_constraint
+        WHERE contype = 'f' AND confrelid IN ('transaccion'::regclass, 'retiro'::regclass)
+    LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', restriccion.tabla, restriccion.conname);
+    END LOOP;
+
+    -- Rango de meses a crear: desde el movimiento más viejo hasta 3 meses adelante
+    SELECT date_trunc('month', min(f) AT TIME ZONE 'UTC')::date INTO desde FROM (
+        SELECT min(TRANSACCION_FECHA) FROM TRANSACCION
+        UNION ALL SELECT min(TRANSACCION_FECHA) FROM DEPOSITO
+        UNION ALL SELECT min(TRANSACCION_FECHA) FROM RETIRO
+        UNION ALL SELECT min(TRANSACCION_FECHA) FROM RETIRO_CON_TARJETA
+        UNION ALL SELECT min(TRANSACCION_FECHA) FROM RETIRO_SIN_TARJETA
+    ) AS fechas(f);
+    SELECT date_trunc('month', max(f) AT TIME ZONE 'UTC')::date INTO hasta FROM (
+        SELECT max(TRANSACCION_FECHA) FROM TRANSACCION
+        UNION ALL SELECT max(TRANSACCION_FECHA) FROM DEPOSITO
+        UNION ALL SELECT max(TRANSACCION_FECHA) FROM RETIRO
+        UNION ALL SELECT max(TRANSACCION_FECHA) FROM RETIRO_CON_TARJETA
+        UNION ALL SELECT max(TRANSACCION_FECHA) FROM RETIRO_SIN_TARJETA
+        UNION ALL SELECT now()
+    ) AS fechas(f);
+    desde := coalesce(desde, date_trunc('month', now() AT TIME ZONE 'UTC')::date);
+    hasta := (hasta + interval '3 months')::date;
+
+    FOREACH tabla IN ARRAY ARRAY['transaccion', 'deposito', 'retiro', 'retiro_con_tarjeta', 'retiro_sin_tarjeta']
+    LOOP
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', tabla, tabla || '_sin_particionar');
+        -- Libera el nombre del índice de la PK vieja para la nueva
+        FOR restriccion IN
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = (tabla || '_sin_particionar')::regclass AND contype = 'p'
+        LOOP
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', tabla || '_sin_particionar', restriccion.conname);
+        END LOOP;
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (TRANSACCION_FECHA)',
+            tabla, tabla || '_sin_particionar'
+        );
+        EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (TRANSACCION_ID, TRANSACCION_FECHA)', tabla);
+        mes := desde;
+        WHILE mes <= hasta LOOP
+            PERFORM CREAR_PARTICION_MENSUAL(tabla, mes);
+            mes := (mes + interval '1 month')::date;
+        END LOOP;
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I', tabla, tabla || '_sin_particionar');
+        EXECUTE format('DROP TABLE %I', tabla || '_sin_particionar');
+    END LOOP;
+END
+$$;
+
+ALTER TABLE TRANSACCION ADD FOREIGN KEY (CUENTA_ID) REFERENCES CUENTA (CUENTA_ID);
+
+-- Índices de 0001 y 0005 que vivían en las tablas reemplazadas; en la tabla
+-- particionada cada partición tiene el suyo
+CREATE INDEX IF NOT EXISTS IDX_TRANSACCION_CUENTA_FECHA
+    ON TRANSACCION (CUENTA_ID, TRANSACCION_FECHA DESC, TRANSACCION_ID DESC);
+CREATE INDEX IF NOT EXISTS IDX_RETIRO_SIN_TARJETA_CELULAR_CLAVE
+    ON RETIRO_SIN_TARJETA (RETIROST_CELULAR_BENEFICIARIO, RETIROST_CLAVE);
@@ -0,0 +1,30 @@
+-- TRANSACCION_ID pasa a VARCHAR(32) para guardar un uuid4 completo en hex.
+--
+-- Desde 0006 la PK de las tablas particionadas es (TRANSACCION_ID,
+-- TRANSACCION_FECHA), así que la base ya no impide dos movimientos con el
+-- mismo TRANSACCION_ID en fechas distintas. Con los 8 caracteres de antes
+-- (32 bits) una colisión era esperable a partir de unas decenas de miles de
+-- movimientos y quedaba guardada como fila duplicada, rompiendo los JOIN de
+-- RECIBO y RESUMEN_CUENTA por TRANSACCION_ID y el cursor (fecha, id) del
+-- historial.
+--
+-- Alternativa descartada: una tabla sin particionar con sólo los
+-- TRANSACCION_ID (PK), insertada en la misma CTE del movimiento. Garantiza la
+-- unicidad, pero suma una escritura y un índice que crece sin límite por
+-- cada movimiento y no se puede podar al desasociar o archivar particiones.
+-- Con 122 bits aleatorios la probabilidad de colisión es despreciable
+-- (~1e-18 con mil millones de movimientos), así que se acepta que la
+-- unicidad sea probabilística y no la verifique la base.
+--
+-- Agrandar un VARCHAR no reescribe la tabla ni reconstruye índices; en las
+-- tablas particionadas el cambio se propaga a todas las particiones
+-- asociadas. Las particiones ya desasociadas al esquema archivo conservan
+-- VARCHAR(16): sólo se leen para archivarlas.
+
+ALTER TABLE TRANSACCION ALTER COLUMN TRANSACCION_ID TYPE VARCHAR(32);
+ALTER TABLE DEPOSITO ALTER COLUMN TRANSACCION_ID TYPE VARCHAR(32);
+ALTER TABLE RETIRO ALTER COLUMN TRANSACCION_ID TYPE VARCHAR(32);
+ALTER TABLE RETIRO_CON_TARJETA ALTER COLUMN TRANSACCION_ID TYPE VARCHAR(32);
+ALTER TABLE RETIRO_SIN_TARJETA ALTER COLUMN TRANSACCION_ID TYPE VARCHAR(32);
+ALTER TABLE RECIBO ALTER COLUMN TRANSACCION_ID TYPE VARCHAR(32);
+ALTER TABLE RESUMEN_CUENTA ALTER COLUMN RESUMEN_ULTIMA_TRANSACCION TYPE VARCHAR(32);
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime, date
 from decimal import Decimal
 import re
@@ -115,6 +115,8 @@ class CajeroBase(BaseModel):
     cajero_ubicacion: str = Field(..., min_length=1, max_length=128, description="Ubicación del cajero")
     cajero_tipo: str = Field(..., min_length=1, max_length=16, description="Tipo de cajero")
     cajero_estado: str = Field(..., min_length=1, max_length=16, description="Estado del cajero (ACTIVO/INACTIVO)")
+    cajero_latitud: Optional[float] = Field(None, ge=-90, le=90, description="Latitud en grados decimales")
+    cajero_longitud: Optional[float] = Field(None, ge=-180, le=180, description="Longitud en grados decimales")
 
     @validator('cajero_estado')
     def validate_estado(cls, v):
@@ -136,6 +138,13 @@ class CajeroResponse(CajeroBase):
     class Config:
         from_attributes = True
 
+class CajeroCercanoResponse(BaseModel):
+    cajero_id: str = Field(..., min_length=1, max_length=10)
+    cajero_ubicacion: str = Field(..., description="Ubicación del cajero")
+    cajero_latitud: float = Field(..., description="Latitud en grados decimales")
+    cajero_longitud: float = Field(..., description="Longitud en grados decimales")
+    distancia_m: int = Field(..., ge=0, description="Distancia en metros al punto consultado")
+
 # Esquemas para Tarjeta
 class TarjetaBase(BaseModel):
     cuenta_id: str = Field(..., min_length=1, max_length=10, description="ID de la cuenta asociada")
@@ -262,6 +271,25 @@ class RetiroRequest(BaseModel):
             raise ValueError('El tarjeta_id es obligatorio si usar_tarjeta es True')
         return v
 
+# Esquemas para ingesta por lotes
+class DepositoLoteItem(DepositoRequest):
+    tipo: Literal["deposito"] = Field(..., description="Tipo de movimiento")
+
+class RetiroLoteItem(RetiroRequest):
+    tipo: Literal["retiro"] = Field(..., description="Tipo de movimiento")
+
+class LoteItemResultado(BaseModel):
+    indice: int = Field(..., ge=0, description="Posición del ítem en el lote")
+    aplicado: bool = Field(..., description="Si el movimiento se registró")
+    transaccion_id: Optional[str] = Field(None, max_length=32, description="ID de la transacción registrada")
+    status_code: Optional[int] = Field(None, description="Código HTTP equivalente al rechazo")
+    detail: Optional[str] = Field(None, description="Motivo del rechazo")
+
+class LoteResponse(BaseModel):
+    aplicados: int = Field(..., ge=0, description="Movimientos registrados")
+    rechazados: int = Field(..., ge=0, description="Movimientos rechazados")
+    resultados: List[LoteItemResultado] = Field(..., description="Resultado por ítem, en el orden recibido")
+
 class RetiroSinTarjetaRequest(BaseModel):
     cuenta_id: str = Field(..., min_length=1, max_length=10, description="ID de la cuenta desde la que se realiza el retiro")
     monto: Decimal = Field(..., ge=0.01, le=999999.99, decimal_places=2, description="Monto a retirar")
@@ -275,11 +303,11 @@ class RetiroSinTarjetaRequest(BaseModel):
         return v
 
 class RetiroSinTarjetaResponse(BaseModel):
-    transaccion_id: str = Field(..., min_length=1, max_length=8, description="ID de la transacción")
+    transaccion_id: str = Field(..., min_length=1, max_length=32, description="ID de la transacción")
     codigo_verificacion: str = Field(..., min_length=4, max_length=4, description="Código de verificación de 4 dígitos")
 
 class ReciboResponse(BaseModel):
-    transaccion_id: str = Field(..., min_length=1, max_length=8, description="ID de la transacción")
+    transaccion_id: str = Field(..., min_length=1, max_length=32, description="ID de la transacción")
     cajero_id: str = Field(..., min_length=1, max_length=10, description="ID del cajero")
     recibo_costo: Decimal = Field(..., ge=0, le=999.99, decimal_places=2, description="Costo del recibo (máximo 999.99)")
     transaccion_fecha: datetime = Field(..., description="Fecha de la transacción")
@@ -289,7 +317,7 @@ class ReciboResponse(BaseModel):
         return v if v.tzinfo else v.replace(tzinfo=pytz.UTC)
 
 class TransaccionResponse(BaseModel):
-    transaccion_id: str = Field(..., min_length=1, max_length=16, description="ID único de la transacción")
+    transaccion_id: str = Field(..., min_length=1, max_length=32, description="ID único de la transacción")
     cuenta_id: str = Field(..., min_length=1, max_length=10, description="ID de la cuenta asociada")
     transaccion_tipo: str = Field(..., min_length=1, max_length=32, description="Tipo de transacción (DEPOSITO, RETIRO, RETIRO_SIN_TARJETA, etc.)")
     transaccion_monto: Optional[Decimal] = Field(None, ge=0, decimal_places=2, description="Monto de la transacción")
@@ -299,4 +327,37 @@ class TransaccionResponse(BaseModel):
     transaccion_recibo: Optional[int] = Field(None, description="ID del recibo asociado, si existe")
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Esquemas para el resumen del cliente (dashboard)
+class CuentaResumen(CuentaResponse):
+    tarjetas: List[TarjetaResponse] = []
+    tarjetas_credito: List[TarjetaCreditoResponse] = []
+    tarjetas_debito: List[TarjetaDebitoResponse] = []
+    transacciones: List[TransaccionResponse] = Field([], description="Últimas transacciones de la cuenta, de la más reciente a la más antigua")
+
+class ClienteResumenResponse(BaseModel):
+    cliente: ClienteResponse
+    cuentas: List[CuentaResumen] = []
+
+class ResumenCuentaResponse(BaseModel):
+    cuenta_id: str = Field(..., min_length=1, max_length=10)
+    mes: str = Field(..., description="Mes del resumen (AAAA-MM, UTC)")
+    total_depositado: Decimal = Field(..., ge=0, decimal_places=2)
+    total_retirado: Decimal = Field(..., ge=0, decimal_places=2)
+    costos_pagados: Decimal = Field(..., ge=0, decimal_places=2, description="Costos de transacción y de recibos")
+    depositos: int = Field(..., ge=0, description="Cantidad de depósitos del mes")
+    retiros: int = Field(..., ge=0, description="Cantidad de retiros del mes")
+    ultimo_movimiento: Optional[datetime] = Field(None, description="Fecha del último movimiento de la cuenta")
+    ultima_transaccion_id: Optional[str] = Field(None, max_length=32, description="ID del último movimiento")
+
+class LimiteCanal(BaseModel):
+    limite: Decimal = Field(..., ge=0, decimal_places=2, description="Límite diario del canal")
+    usado: Decimal = Field(..., ge=0, decimal_places=2, description="Monto usado en el día")
+    disponible: Decimal = Field(..., ge=0, decimal_places=2, description="Monto que aún se puede mover hoy")
+
+class LimitesCuentaResponse(BaseModel):
+    cuenta_id: str = Field(..., min_length=1, max_length=10)
+    dia: date = Field(..., description="Día al que corresponde el uso")
+    web: LimiteCanal
+    movil: LimiteCanal
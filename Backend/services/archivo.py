@@ -0,0 +1,152 @@
+import json
+import os
+import zlib
+from datetime import datetime, date
+from pathlib import Path
+import pytz
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Directorio del historial archivado en Parquet (requiere el paquete "pyarrow").
+# Sin él todo el historial se lee de la base.
+ARCHIVO_DIR = os.getenv("ARCHIVO_DIR")
+# Archivos por mes y tabla: las filas se reparten por hash de CUENTA_ID
+ARCHIVO_BUCKETS = int(os.getenv("ARCHIVO_BUCKETS", "16"))
+# Meses que comandos.archivar deja en la base (el mes en curso cuenta)
+ARCHIVO_RETENER_MESES = int(os.getenv("ARCHIVO_RETENER_MESES", "12"))
+MANIFIESTO = "manifiesto.json"
+
+
+def bucket(cuenta_id, buckets):
+    return zlib.crc32(cuenta_id.encode()) % buckets
+
+
+def inicio_mes(mes):
+    return datetime(mes.year, mes.month, 1, tzinfo=pytz.UTC)
+
+
+def utc(momento):
+    """Las fechas sin zona (parámetros de consulta) se interpretan en UTC."""
+    if momento is not None and momento.tzinfo is None:
+        return momento.replace(tzinfo=pytz.UTC)
+    return momento
+
+
+def mes_siguiente(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+class ArchivoHistorial:
+    """Meses cerrados de TRANSACCION (y subtipos) en archivos Parquet.
+
+    Estructura: ``<dir>/<tabla>/mes=AAAA-MM/bucket=NN.parquet``, con las filas
+    de cada archivo ordenadas por cuenta, fecha e id. Los meses archivados son
+    siempre un prefijo del historial: ``manifiesto.json`` guarda ``hasta`` (el
+    primer mes que sigue en la base) y el número de buckets. Lo que está antes
+    de ``hasta`` se lee sólo del archivo y lo demás sólo de la base, así que
+    las dos fuentes nunca se solapan; el manifiesto se vuelve a leer cuando
+    cambia su mtime, con lo que todos los workers ven la nueva frontera apenas
+    comandos.archivar la publica.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio) if directorio else None
+        self._mtime = None
+        self._manifiesto = None
+
+    def manifiesto(self):
+        if self.directorio is None:
+            return None
+        ruta = self.directorio / MANIFIESTO
+        try:
+            mtime = ruta.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self._manifiesto = None, None
+            return None
+        if mtime != self._mtime:
+            self._manifiesto = json.loads(ruta.read_text(encoding="utf-8"))
+            self._mtime = mtime
+        return self._manifiesto
+
+    def publicar(self, manifiesto):
+        """Reemplaza el manifiesto de forma atómica (escritura a temporal + rename)."""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        temporal = self.directorio / (MANIFIESTO + ".tmp")
+        temporal.write_text(json.dumps(manifiesto, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(temporal, self.directorio / MANIFIESTO)
+
+    def limite(self):
+        """Inicio (UTC) del primer mes que sigue en la base, o None si no hay nada archivado."""
+        manifiesto = self.manifiesto()
+        if not manifiesto or not manifiesto.get("hasta"):
+            return None
+        return inicio_mes(date.fromisoformat(manifiesto["hasta"]))
+
+    def ruta(self, tabla, mes, numero):
+        return self.directorio / tabla / f"mes={mes:%Y-%m}" / f"bucket={numero:02d}.parquet"
+
+    def meses(self, desde=None, hasta=None, antes=None, descendente=True):
+        """Meses archivados que pueden tener filas en el rango pedido."""
+        manifiesto = self.manifiesto()
+        if not manifiesto:
+            return []
+        cotas = [c for c in (utc(hasta), utc(antes[0]) if antes else None) if c is not None]
+        cota = min(cotas) if cotas else None
+        desde = utc(desde)
+        meses = [
+            mes for mes in sorted(date.fromisoformat(mes + "-01") for mes in manifiesto["meses"])
+            if (desde is None or desde < inicio_mes(mes_siguiente(mes)))
+            and (cota is None or inicio_mes(mes) <= cota)
+        ]
+        if descendente:
+            meses.reverse()
+        return meses
+
+    def leer_mes(self, cuenta_id, mes, campos, desde=None, hasta=None, antes=None,
+                 tipo=None, monto_min=None, monto_max=None):
+        """Filas de una cuenta en un mes archivado, en orden cronológico, como
+        tuplas en el orden de ``campos``. ``antes`` es el par (fecha, id) del
+        cursor de paginación.
+
+        El archivo se abre con memory map y el filtro por cuenta_id sólo lee
+        los row groups cuya estadística lo contiene (las filas están ordenadas
+        por cuenta).
+        """
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        ruta = self.ruta("transaccion", mes, bucket(cuenta_id, self.manifiesto()["buckets"]))
+        if not ruta.exists():
+            return []
+        tabla = pq.read_table(ruta, columns=campos, filters=pc.field("cuenta_id") == cuenta_id, memory_map=True)
+        posicion = {campo: i for i, campo in enumerate(campos)}
+        i_fecha, i_id = posicion["transaccion_fecha"], posicion["transaccion_id"]
+        i_tipo, i_monto = posicion["transaccion_tipo"], posicion["transaccion_monto"]
+        desde, hasta = utc(desde), utc(hasta)
+        antes = (utc(antes[0]), antes[1]) if antes else None
+        filas = []
+        for fila in zip(*[tabla.column(campo).to_pylist() for campo in campos]):
+            fecha = fila[i_fecha]
+            if (desde is not None and fecha < desde) or (hasta is not None and fecha >= hasta):
+                continue
+            if antes is not None and (fecha, fila[i_id]) >= antes:
+                continue
+            if tipo is not None and fila[i_tipo] != tipo:
+                continue
+            if (monto_min is not None and fila[i_monto] < monto_min) or (monto_max is not None and fila[i_monto] > monto_max):
+                continue
+            filas.append(fila)
+        return filas
+
+    def leer_cuenta(self, cuenta_id, campos, limit, antes=None, **filtros):
+        """Hasta ``limit`` filas archivadas de una cuenta, de la más nueva a la más vieja."""
+        filas = []
+        for mes in self.meses(filtros.get("desde"), filtros.get("hasta"), antes):
+            filas.extend(reversed(self.leer_mes(cuenta_id, mes, campos, antes=antes, **filtros)))
+            if len(filas) >= limit:
+                break
+        return filas[:limit]
+
+
+archivo_historial = ArchivoHistorial(ARCHIVO_DIR)
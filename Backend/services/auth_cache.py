@@ -0,0 +1,87 @@
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuración de la caché de principales verificados
+AUTH_CACHE_MAXSIZE = int(os.getenv("AUTH_CACHE_MAXSIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+# Modo sin estado: confía en los claims firmados hasta "exp" sin consultar CLIENTE
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes")
+
+
+class PrincipalCache:
+    """Caché LRU con TTL de tokens ya verificados contra la tabla CLIENTE.
+
+    La clave es el token; se mantiene además un índice por cliente_id para
+    poder invalidar todos los tokens de un cliente (eliminación, cambio de
+    contraseña).
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._por_cliente = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token):
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        cliente_id, expira = entry
+        if expira <= time.monotonic():
+            self._remove(token)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return cliente_id
+
+    def set(self, token, cliente_id, exp=None):
+        ttl = self.ttl
+        if exp is not None:
+            ttl = min(ttl, float(exp) - time.time())
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        if token in self._entries:
+            self._remove(token)
+        self._entries[token] = (cliente_id, time.monotonic() + ttl)
+        self._por_cliente.setdefault(cliente_id, set()).add(token)
+        while len(self._entries) > self.maxsize:
+            antiguo = next(iter(self._entries))
+            self._remove(antiguo)
+            self.evictions += 1
+
+    def invalidate_cliente(self, cliente_id):
+        for token in self._por_cliente.pop(cliente_id, set()):
+            self._entries.pop(token, None)
+
+    def _remove(self, token):
+        cliente_id, _ = self._entries.pop(token)
+        tokens = self._por_cliente.get(cliente_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._por_cliente[cliente_id]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "stateless": AUTH_STATELESS,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+principal_cache = PrincipalCache(AUTH_CACHE_MAXSIZE, AUTH_CACHE_TTL_SECONDS)
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import logging
+import os
+from sqlalchemy.sql import text
+from dotenv import load_dotenv
+from config.database import AsyncSessionLocal
+from schemas.transaccion import CajeroResponse
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# URL de Redis para compartir la versión del catálogo entre workers (opcional;
+# requiere el paquete "redis"). Sin ella la versión vive en el proceso.
+CAJEROS_CACHE_URL = os.getenv("CAJEROS_CACHE_URL")
+CAJEROS_CACHE_CLAVE = os.getenv("CAJEROS_CACHE_CLAVE", "cajeros:version")
+
+CATALOGO_CAJEROS = text("SELECT * FROM CAJERO ORDER BY CAJERO_ID")
+
+
+def etag(cuerpo):
+    return '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+
+
+def coincide_etag(if_none_match, valor):
+    """Evalúa un encabezado If-None-Match contra el ETag actual."""
+    if not if_none_match:
+        return False
+    candidatos = [parte.strip() for parte in if_none_match.split(",")]
+    return "*" in candidatos or valor in candidatos or f"W/{valor}" in candidatos
+
+
+class VersionLocal:
+    def __init__(self):
+        self._version = 0
+
+    async def actual(self):
+        return self._version
+
+    async def incrementar(self):
+        self._version += 1
+        return self._version
+
+
+class VersionRedis:
+    """Versión del catálogo en Redis: un INCR invalida la copia de todos los workers."""
+
+    def __init__(self, url, clave):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._clave = clave
+
+    async def actual(self):
+        valor = await self._redis.get(self._clave)
+        return int(valor) if valor is not None else 0
+
+    async def incrementar(self):
+        return await self._redis.incr(self._clave)
+
+
+class Catalogo:
+    __slots__ = ("version", "cuerpo", "etag", "filas", "items")
+
+    def __init__(self, version, filas):
+        self.version = version
+        self.filas = filas
+        self.items = {}
+        for fila in filas:
+            cuerpo = fila.model_dump_json().encode()
+            self.items[fila.cajero_id] = (cuerpo, etag(cuerpo))
+        self.cuerpo = b"[" + b",".join(cuerpo for cuerpo, _ in self.items.values()) + b"]"
+        self.etag = etag(self.cuerpo)
+
+
+class CacheCajeros:
+    """Copia serializada del catálogo de cajeros, leída a demanda.
+
+    Cada petición compara la versión guardada con la del backend (un entero
+    local o una clave de Redis) y sólo relee la tabla si cambió; las
+    escrituras llaman a ``invalidar`` después del commit. La versión se lee
+    antes de cargar las filas, así que una escritura concurrente con la carga
+    deja la copia marcada como vieja y la siguiente petición la recarga.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._catalogo = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.recargas = 0
+        self.no_modificados = 0
+
+    async def version(self):
+        try:
+            return await self.backend.actual()
+        except Exception as e:
+            logger.warning("No se pudo leer la versión del catálogo de cajeros: %s", e)
+            return None
+
+    async def obtener(self):
+        version = await self.version()
+        catalogo = self._catalogo
+        if catalogo is not None and version is not None and catalogo.version == version:
+            self.hits += 1
+            return catalogo
+        async with self._lock:
+            catalogo = self._catalogo
+            if catalogo is not None and version is not None and catalogo.version == version:
+                self.hits += 1
+                return catalogo
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(CATALOGO_CAJEROS)
+                columns = result.keys()
+                filas = [CajeroResponse(**{col: getattr(fila, col) for col in columns}) for fila in result.fetchall()]
+            catalogo = Catalogo(version, filas)
+            if version is not None:
+                self._catalogo = catalogo
+            self.recargas += 1
+            return catalogo
+
+    async def invalidar(self):
+        """Marca la copia como vieja y devuelve la nueva versión (None si el backend falló)."""
+        self._catalogo = None
+        try:
+            return await self.backend.incrementar()
+        except Exception as e:
+            logger.warning("No se pudo invalidar la versión compartida del catálogo de cajeros: %s", e)
+            return None
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "cargado": self._catalogo is not None,
+            "cajeros": len(self._catalogo.items) if self._catalogo else 0,
+            "hits": self.hits,
+            "recargas": self.recargas,
+            "no_modificados": self.no_modificados,
+        }
+
+
+cache_cajeros = CacheCajeros(
+    VersionRedis(CAJEROS_CACHE_URL, CAJEROS_CACHE_CLAVE) if CAJEROS_CACHE_URL else VersionLocal()
+)
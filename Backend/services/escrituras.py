@@ -0,0 +1,53 @@
+from sqlalchemy.sql import text
+
+# TARJETA_DE_CREDITO usa nombres de columna distintos a los del esquema Pydantic
+TARJETA_CREDITO_COLUMNAS = {
+    "tarjeta_id": "TARJETA_ID",
+    "cuenta_id": "CUENTA_ID",
+    "tarjeta_nombre": "TARJETA_NOMBRE",
+    "tarjeta_pin_seguridad": "TARJETA_PIN_SEGURIDAD",
+    "tarjeta_fecha_caducidad": "TARJETA_FECHA_CADUCIDAD",
+    "tarjeta_fecha_emision": "TARJETA_FECHA_EMISION",
+    "tarjeta_estado": "TARJETA_ESTADO",
+    "tarjeta_cvv": "TARJETA_CVV",
+    "tarjeta_estilo": "TARJETA_ESTILO",
+    "tarjetacredito_cupo": "TARJETACREDITO_CUPO",
+    "tarjetacredito_pago_minimo": "TARJETA_CREDITO_PAGO_MINIMO",
+    "tarjeta_credito_pago_total": "TARJETA_CREDITO_PAGO_TOTAL",
+}
+
+
+def tarjeta_credito_returning(alias=None):
+    prefijo = f"{alias}." if alias else ""
+    return ", ".join(f"{prefijo}{columna} AS {campo}" for campo, columna in TARJETA_CREDITO_COLUMNAS.items())
+
+
+TARJETA_CREDITO_RETURNING = tarjeta_credito_returning()
+
+# Lista de cuentas del cliente, calculada en el mismo RETURNING que la escritura
+CLIENTE_RETURNING = (
+    "CLIENTE.*, ARRAY(SELECT c.CUENTA_ID FROM CUENTA c "
+    "WHERE c.CLIENTE_ID = CLIENTE.CLIENTE_ID) AS cuentas"
+)
+
+
+def set_clause(update_data, column_mapping=None):
+    """``update_data`` puede ser el dict de la petición o sólo sus claves."""
+    return ", ".join(
+        f"{column_mapping[key] if column_mapping else key.upper()} = :{key}" for key in update_data
+    )
+
+
+async def escribir_returning(db, query, values, modelo, excluir=(), **extra):
+    """Ejecuta un INSERT/UPDATE ... RETURNING y construye la respuesta con esa fila.
+
+    Evita el SELECT posterior a la escritura (y su transacción extra). Devuelve
+    None si la sentencia no afectó ninguna fila. El commit queda a cargo del
+    endpoint.
+    """
+    result = await db.execute(text(query) if isinstance(query, str) else query, values)
+    fila = result.fetchone()
+    if fila is None:
+        return None
+    columns = [col for col in result.keys() if col not in excluir]
+    return modelo(**{col: getattr(fila, col) for col in columns}, **extra)
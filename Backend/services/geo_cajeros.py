@@ -0,0 +1,153 @@
+import heapq
+import math
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Tamaño de celda de la grilla en grados (0.02° ≈ 2.2 km de latitud)
+GEO_CELDA_GRADOS = float(os.getenv("GEO_CELDA_GRADOS", "0.02"))
+
+RADIO_TIERRA_M = 6371008.8
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distancia en metros sobre la esfera entre dos puntos en grados."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class IndiceCajeros:
+    """Grilla lat/lon en memoria con los cajeros ACTIVOS que tienen coordenadas.
+
+    Cada celda guarda sus cajeros en un dict, así que altas, cambios y bajas
+    son O(1) y los CRUD de cajeros la actualizan sin reconstruirla. La búsqueda
+    recorre anillos de celdas alrededor del punto y se detiene cuando la cota
+    inferior de distancia del siguiente anillo supera el radio o el k-ésimo
+    mejor candidato.
+
+    ``version`` es la versión del catálogo (ver services.cache_cajeros) que
+    refleja el índice; None obliga a reconstruirlo en la siguiente consulta.
+    """
+
+    def __init__(self, celda_grados):
+        self.celda = celda_grados
+        self.columnas = max(1, round(360 / celda_grados))
+        self.filas = max(1, math.ceil(180 / celda_grados))
+        self.version = None
+        self._celdas = {}
+        self._posiciones = {}
+
+    def _celda_de(self, lat, lon):
+        fila = min(self.filas - 1, int((lat + 90) // self.celda))
+        columna = int((lon + 180) // self.celda) % self.columnas
+        return fila, columna
+
+    def eliminar(self, cajero_id):
+        posicion = self._posiciones.pop(cajero_id, None)
+        if posicion is None:
+            return
+        celda = self._celdas[posicion]
+        del celda[cajero_id]
+        if not celda:
+            del self._celdas[posicion]
+
+    def aplicar(self, cajero):
+        """Alta o cambio de un cajero (CajeroResponse); sale del índice si no está activo o no tiene coordenadas."""
+        self.eliminar(cajero.cajero_id)
+        if cajero.cajero_estado != "ACTIVO" or cajero.cajero_latitud is None or cajero.cajero_longitud is None:
+            return
+        posicion = self._celda_de(cajero.cajero_latitud, cajero.cajero_longitud)
+        self._celdas.setdefault(posicion, {})[cajero.cajero_id] = (
+            cajero.cajero_latitud, cajero.cajero_longitud, cajero.cajero_ubicacion
+        )
+        self._posiciones[cajero.cajero_id] = posicion
+
+    def reconstruir(self, cajeros, version):
+        self._celdas = {}
+        self._posiciones = {}
+        for cajero in cajeros:
+            self.aplicar(cajero)
+        self.version = version
+
+    def confirmar(self, version_anterior, version_nueva):
+        """Tras un cambio incremental local: adopta la nueva versión del catálogo
+        sólo si nadie más la movió entre medio; si no, marca el índice para reconstruir."""
+        if self.version is not None and version_nueva is not None and version_nueva == version_anterior + 1:
+            self.version = version_nueva
+        else:
+            self.version = None
+
+    def __len__(self):
+        return len(self._posiciones)
+
+    def _cota(self, lat, delta):
+        """Distancia mínima a cualquier punto que difiera en al menos ``delta`` grados de latitud o longitud."""
+        meridiano = math.radians(delta) * RADIO_TIERRA_M
+        if delta >= 180:
+            return meridiano
+        lat_max = min(90.0, abs(lat) + delta)
+        paralelo = 2 * RADIO_TIERRA_M * math.asin(
+            min(1.0, math.cos(math.radians(lat_max)) * math.sin(math.radians(delta) / 2))
+        )
+        return min(meridiano, paralelo)
+
+    def _anillo(self, fila, columna, r):
+        if r == 0:
+            yield fila, columna
+            return
+        for df in range(-r, r + 1):
+            f = fila + df
+            if f < 0 or f >= self.filas:
+                continue
+            if abs(df) == r:
+                pasos = range(-r, r + 1)
+            else:
+                pasos = (-r, r)
+            for dc in pasos:
+                yield f, (columna + dc) % self.columnas
+
+    def _distancia_anillo(self, fila, columna, posicion):
+        dc = abs(posicion[1] - columna)
+        return max(abs(posicion[0] - fila), min(dc, self.columnas - dc))
+
+    def cercanos(self, lat, lon, radio, limit):
+        """Hasta ``limit`` cajeros a ``radio`` metros o menos, del más cercano al más lejano.
+
+        Devuelve tuplas ``(distancia_m, cajero_id, lat, lon, ubicacion)``.
+        """
+        fila, columna = self._celda_de(lat, lon)
+        mejores = []  # max-heap por distancia: (-distancia, cajero_id, lat, lon, ubicacion)
+
+        def evaluar(celda):
+            for cajero_id, (clat, clon, ubicacion) in celda.items():
+                d = haversine(lat, lon, clat, clon)
+                if d > radio:
+                    continue
+                if len(mejores) < limit:
+                    heapq.heappush(mejores, (-d, cajero_id, clat, clon, ubicacion))
+                elif d < -mejores[0][0]:
+                    heapq.heapreplace(mejores, (-d, cajero_id, clat, clon, ubicacion))
+
+        r = 0
+        while True:
+            if 8 * r > len(self._celdas) or 2 * r + 1 > self.columnas:
+                # Más celdas en el anillo que celdas ocupadas: se revisan las ocupadas restantes
+                for posicion, celda in self._celdas.items():
+                    if self._distancia_anillo(fila, columna, posicion) >= r:
+                        evaluar(celda)
+                break
+            for posicion in self._anillo(fila, columna, r):
+                celda = self._celdas.get(posicion)
+                if celda:
+                    evaluar(celda)
+            cota = self._cota(lat, r * self.celda)
+            if cota > radio or (len(mejores) == limit and cota > -mejores[0][0]):
+                break
+            r += 1
+
+        return sorted((-d, cajero_id, clat, clon, ubicacion) for d, cajero_id, clat, clon, ubicacion in mejores)
+
+
+indice_cajeros = IndiceCajeros(GEO_CELDA_GRADOS)
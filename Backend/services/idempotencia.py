@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "100000"))
+
+
+class ConflictoIdempotencia(Exception):
+    """La misma Idempotency-Key se reutilizó con un cuerpo distinto."""
+
+
+class _Entrada:
+    __slots__ = ("huella", "future", "expira")
+
+    def __init__(self, huella, future):
+        self.huella = huella
+        self.future = future
+        self.expira = None
+
+
+def huella(modelo):
+    return hashlib.sha256(modelo.model_dump_json().encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Almacén en proceso de respuestas por Idempotency-Key, con TTL.
+
+    La primera petición con una clave ejecuta la operación; los duplicados
+    concurrentes esperan su resultado en lugar de repetirla, y los posteriores
+    reciben la respuesta guardada hasta que expira. Si la operación falla no se
+    guarda nada, para que el cliente pueda reintentar.
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entradas = OrderedDict()
+        self.replays = 0
+
+    async def ejecutar(self, clave, huella_peticion, operacion):
+        """Devuelve ``(resultado, reproducido)``."""
+        entrada = self._entradas.get(clave)
+        if entrada is not None and entrada.expira is not None and entrada.expira <= time.monotonic():
+            del self._entradas[clave]
+            entrada = None
+        if entrada is not None:
+            if entrada.huella != huella_peticion:
+                raise ConflictoIdempotencia()
+            resultado = await asyncio.shield(entrada.future)
+            self.replays += 1
+            return resultado, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._entradas[clave] = _Entrada(huella_peticion, future)
+        try:
+            resultado = await operacion()
+        except BaseException as e:
+            self._entradas.pop(clave, None)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # evita el aviso de excepción no recuperada si nadie esperaba
+            raise
+        future.set_result(resultado)
+        self._entradas[clave].expira = time.monotonic() + self.ttl
+        self._purgar()
+        return resultado, False
+
+    def _purgar(self):
+        # El orden de inserción aproxima el de expiración: se recorre desde el inicio
+        ahora = time.monotonic()
+        exceso = len(self._entradas) - self.maxsize
+        borrar = []
+        for clave, entrada in self._entradas.items():
+            if entrada.expira is None:
+                continue
+            if entrada.expira <= ahora or exceso > len(borrar):
+                borrar.append(clave)
+            else:
+                break
+        for clave in borrar:
+            del self._entradas[clave]
+
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES)
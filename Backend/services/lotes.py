@@ -0,0 +1,297 @@
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Annotated, Union
+import pytz
+from pydantic import Field, TypeAdapter, ValidationError
+from sqlalchemy.sql import text
+from dotenv import load_dotenv
+from schemas.transaccion import DepositoLoteItem, RetiroLoteItem
+from services.movimientos import parametros_deposito, parametros_retiro, nuevo_transaccion_id
+from services.resumen_cuentas import ACUMULAR_RESUMEN
+from services.saldos import uso_hoy
+
+load_dotenv()
+
+LOTE_MAX_ITEMS = int(os.getenv("LOTE_MAX_ITEMS", "20000"))
+
+_ITEM = TypeAdapter(Annotated[Union[DepositoLoteItem, RetiroLoteItem], Field(discriminator="tipo")])
+
+# Marca de una línea NDJSON que no se pudo decodificar
+_LINEA_INVALIDA = object()
+
+CUENTAS_LOTE = text(f"""
+    SELECT CUENTA_ID AS cuenta_id, CUENTA_SALDO AS saldo,
+           CUENTA_LIMITE_TRANS_WEB AS web, CUENTA_LIMITE_TRANS_MOVIL AS movil,
+           {uso_hoy("web")} AS uso_web, {uso_hoy("movil")} AS uso_movil
+    FROM CUENTA
+    WHERE CUENTA_ID = ANY(:ids) AND CLIENTE_ID = :cliente_id AND CUENTA_ESTADO = 'ACTIVA'
+    ORDER BY CUENTA_ID
+    FOR UPDATE
+""")
+
+CAJEROS_ACTIVOS = text("""
+    SELECT CAJERO_ID AS cajero_id FROM CAJERO
+    WHERE CAJERO_ID = ANY(:ids) AND CAJERO_ESTADO = 'ACTIVO'
+""")
+
+TARJETAS_ACTIVAS = text("""
+    SELECT TARJETA_ID AS tarjeta_id, CUENTA_ID AS cuenta_id FROM TARJETA
+    WHERE TARJETA_ID = ANY(:ids) AND TARJETA_ESTADO = 'ACTIVA'
+""")
+
+# Un solo UPDATE con el neto de cada cuenta del lote y su uso diario por canal
+# (las filas están bloqueadas desde CUENTAS_LOTE, así que el uso se escribe absoluto)
+ACTUALIZAR_CUENTAS = text("""
+    UPDATE CUENTA SET
+        CUENTA_SALDO = CUENTA_SALDO + v.delta,
+        CUENTA_USO_WEB = v.uso_web,
+        CUENTA_USO_MOVIL = v.uso_movil,
+        CUENTA_USO_FECHA = CAST(:dia AS DATE)
+    FROM unnest(
+        CAST(:cuenta_ids AS VARCHAR[]), CAST(:deltas AS NUMERIC[]),
+        CAST(:usos_web AS NUMERIC[]), CAST(:usos_movil AS NUMERIC[])
+    ) AS v(cuenta_id, delta, uso_web, uso_movil)
+    WHERE CUENTA.CUENTA_ID = v.cuenta_id
+""")
+
+# Sentencias de inserción por tabla, en orden de dependencia; se ejecutan con executemany
+INSERCIONES = {
+    "TRANSACCION": text("""
+        INSERT INTO TRANSACCION (
+            TRANSACCION_ID, CUENTA_ID, TIPO, TRANSACCION_MONTO,
+            TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO
+        ) VALUES (:transaccion_id, :cuenta_id, :tipo, :monto, :costo, :fecha, :recibo)
+    """),
+    "DEPOSITO": text("""
+        INSERT INTO DEPOSITO (
+            TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO
+        ) VALUES (:transaccion_id, :cuenta_id, :costo, :fecha, :recibo)
+    """),
+    "RETIRO": text("""
+        INSERT INTO RETIRO (
+            TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
+            TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX
+        ) VALUES (:transaccion_id, :cuenta_id, :costo, :fecha, :recibo, :monto, :monto_max)
+    """),
+    "RETIRO_CON_TARJETA": text("""
+        INSERT INTO RETIRO_CON_TARJETA (
+            TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
+            TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX, RETIROCT_TARJETA,
+            RETIROCT_AID, RETIROCT_P22, RETIROCT_P38, RETIROCT_COSTO_INTERBANCARIO
+        ) VALUES (
+            :transaccion_id, :cuenta_id, :costo, :fecha, :recibo, :monto, :monto_max,
+            :tarjeta_id, :aid, :p22, :p38, :costo_inter
+        )
+    """),
+    "RETIRO_SIN_TARJETA": text("""
+        INSERT INTO RETIRO_SIN_TARJETA (
+            TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
+            TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX,
+            RETIROST_CELULAR_BENEFICIARIO, RETIROST_CLAVE,
+            RETIROST_DURACION, RETIROST_MAXIMO_RETIROS
+        ) VALUES (
+            :transaccion_id, :cuenta_id, :costo, :fecha, :recibo, :monto, :monto_max,
+            :celular_beneficiario, :clave, :duracion, :maximo_retiros
+        )
+    """),
+    "RECIBO": text("""
+        INSERT INTO RECIBO (TRANSACCION_ID, CAJERO_ID, RECIBO_COSTO)
+        VALUES (:transaccion_id, :cajero_id, :recibo_costo)
+    """),
+}
+
+
+class LoteInvalido(Exception):
+    """El cuerpo no es un arreglo JSON ni NDJSON."""
+
+
+class LoteDemasiadoGrande(LoteInvalido):
+    pass
+
+
+def _agregar_linea(items, linea):
+    linea = linea.strip()
+    if not linea:
+        return
+    if len(items) >= LOTE_MAX_ITEMS:
+        raise LoteDemasiadoGrande(f"El lote supera el máximo de {LOTE_MAX_ITEMS} ítems")
+    try:
+        items.append(json.loads(linea))
+    except ValueError:
+        items.append(_LINEA_INVALIDA)
+
+
+async def leer_lote(request):
+    """Lee los ítems del cuerpo: NDJSON (leído en streaming) o un arreglo JSON."""
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = []
+        pendiente = b""
+        async for bloque in request.stream():
+            *lineas, pendiente = (pendiente + bloque).split(b"\n")
+            for linea in lineas:
+                _agregar_linea(items, linea)
+        _agregar_linea(items, pendiente)
+        return items
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise LoteInvalido("El cuerpo no es JSON válido")
+    if not isinstance(items, list):
+        raise LoteInvalido("Se esperaba un arreglo JSON o NDJSON")
+    if len(items) > LOTE_MAX_ITEMS:
+        raise LoteDemasiadoGrande(f"El lote supera el máximo de {LOTE_MAX_ITEMS} ítems")
+    return items
+
+
+def _rechazo(indice, status_code, detail):
+    return {"indice": indice, "aplicado": False, "status_code": status_code, "detail": detail}
+
+
+def _validar(items, resultados):
+    """Valida cada ítem y devuelve ``(indice, tipo, params)`` de los válidos."""
+    fecha = datetime.now(pytz.UTC)
+    movimientos = []
+    for indice, item in enumerate(items):
+        if item is _LINEA_INVALIDA:
+            resultados[indice] = _rechazo(indice, 422, "Línea NDJSON inválida")
+            continue
+        try:
+            modelo = _ITEM.validate_python(item)
+        except ValidationError as e:
+            error = e.errors(include_url=False)[0]
+            campo = ".".join(str(parte) for parte in error["loc"])
+            resultados[indice] = _rechazo(indice, 422, f"{campo}: {error['msg']}" if campo else error["msg"])
+            continue
+        if modelo.tipo == "deposito":
+            params = parametros_deposito(modelo, fecha)
+        else:
+            params = parametros_retiro(modelo, fecha)
+        params["tipo"] = modelo.tipo.upper()
+        movimientos.append((indice, modelo.tipo, params))
+    return movimientos
+
+
+def _evaluar(tipo, params, cuenta, saldo, usos, cajeros, tarjetas):
+    """Mismas reglas y mensajes que /transacciones/deposito y /transacciones/retiro."""
+    monto = params["monto"]
+    if cuenta is None:
+        return 403, "Acceso no autorizado a esta cuenta"
+    if tipo == "deposito":
+        if usos["web"] + monto > cuenta.web:
+            return 400, "El monto excede el límite diario de transacciones web"
+        if params["cajero_id"] and params["cajero_id"] not in cajeros:
+            return 404, "Cajero no encontrado o inactivo"
+        return None
+    if saldo < monto:
+        return 400, "Saldo insuficiente"
+    if params["usar_tarjeta"] and usos["movil"] + monto > cuenta.movil:
+        return 400, "El monto excede el límite diario de transacciones móviles"
+    if params["cajero_id"] not in cajeros:
+        return 404, "Cajero no encontrado o inactivo"
+    if params["usar_tarjeta"] and (params["tarjeta_id"], params["cuenta_id"]) not in tarjetas:
+        return 404, "Tarjeta no encontrada o inactiva"
+    return None
+
+
+async def aplicar_lote(db, cliente_id, items):
+    """Valida y registra un lote de depósitos y retiros en la transacción de ``db``.
+
+    Las cuentas del cliente se bloquean una sola vez (FOR UPDATE, en orden de
+    CUENTA_ID); los ítems se evalúan agrupados por cuenta en el orden recibido,
+    llevando en memoria el saldo y el uso diario por canal. Después se inserta
+    cada tabla con executemany, se aplican saldo y uso por cuenta en un único
+    UPDATE y se acumula una fila por cuenta en RESUMEN_CUENTA. Los rechazos de
+    negocio se reportan por ítem y no afectan al resto. El llamador hace commit.
+    """
+    resultados = [None] * len(items)
+    movimientos = _validar(items, resultados)
+
+    if movimientos:
+        cuenta_ids = sorted({params["cuenta_id"] for _, _, params in movimientos})
+        cajero_ids = list({params["cajero_id"] for _, _, params in movimientos if params["cajero_id"]})
+        tarjeta_ids = list({params["tarjeta_id"] for _, _, params in movimientos if params.get("usar_tarjeta")})
+
+        dia = movimientos[0][2]["dia"]
+        cuentas = {
+            fila.cuenta_id: fila
+            for fila in (await db.execute(
+                CUENTAS_LOTE, {"ids": cuenta_ids, "cliente_id": cliente_id, "dia": dia}
+            )).fetchall()
+        }
+        cajeros = set()
+        if cajero_ids:
+            cajeros = {fila.cajero_id for fila in (await db.execute(CAJEROS_ACTIVOS, {"ids": cajero_ids})).fetchall()}
+        tarjetas = set()
+        if tarjeta_ids:
+            tarjetas = {
+                (fila.tarjeta_id, fila.cuenta_id)
+                for fila in (await db.execute(TARJETAS_ACTIVAS, {"ids": tarjeta_ids})).fetchall()
+            }
+
+        por_cuenta = defaultdict(list)
+        for movimiento in movimientos:
+            por_cuenta[movimiento[2]["cuenta_id"]].append(movimiento)
+
+        filas = defaultdict(list)
+        cambios = defaultdict(list)
+        resumenes = []
+        usados = set()
+        for cuenta_id in cuenta_ids:
+            cuenta = cuentas.get(cuenta_id)
+            saldo = cuenta.saldo if cuenta else Decimal("0")
+            usos = {"web": cuenta.uso_web, "movil": cuenta.uso_movil} if cuenta else {}
+            resumen = {
+                "cuenta_id": cuenta_id, "depositado": Decimal("0"), "retirado": Decimal("0"),
+                "costos": Decimal("0"), "depositos": 0, "retiros": 0, "fecha": None, "transaccion_id": None
+            }
+            for indice, tipo, params in por_cuenta[cuenta_id]:
+                rechazo = _evaluar(tipo, params, cuenta, saldo, usos, cajeros, tarjetas)
+                if rechazo:
+                    resultados[indice] = _rechazo(indice, *rechazo)
+                    continue
+                while params["transaccion_id"] in usados:
+                    params["transaccion_id"] = nuevo_transaccion_id()
+                usados.add(params["transaccion_id"])
+
+                if tipo == "deposito":
+                    saldo += params["monto"]
+                    usos["web"] += params["monto"]
+                else:
+                    saldo -= params["monto"]
+                    if params["usar_tarjeta"]:
+                        usos["movil"] += params["monto"]
+                filas["TRANSACCION"].append(params)
+                if tipo == "deposito":
+                    filas["DEPOSITO"].append(params)
+                else:
+                    filas["RETIRO"].append(params)
+                    filas["RETIRO_CON_TARJETA" if params["usar_tarjeta"] else "RETIRO_SIN_TARJETA"].append(params)
+                if params["con_recibo"]:
+                    filas["RECIBO"].append(params)
+                    resumen["costos"] += params["recibo_costo"]
+                resumen["depositado" if tipo == "deposito" else "retirado"] += params["monto"]
+                resumen["depositos" if tipo == "deposito" else "retiros"] += 1
+                resumen["costos"] += params["costo"]
+                resumen["fecha"] = params["fecha"]
+                resumen["transaccion_id"] = params["transaccion_id"]
+                resultados[indice] = {"indice": indice, "aplicado": True, "transaccion_id": params["transaccion_id"]}
+            if resumen["transaccion_id"]:
+                resumenes.append(resumen)
+                cambios["cuenta_ids"].append(cuenta_id)
+                cambios["deltas"].append(saldo - cuenta.saldo)
+                cambios["usos_web"].append(usos["web"])
+                cambios["usos_movil"].append(usos["movil"])
+
+        for tabla, query in INSERCIONES.items():
+            if filas[tabla]:
+                await db.execute(query, filas[tabla])
+        if resumenes:
+            await db.execute(ACTUALIZAR_CUENTAS, {**cambios, "dia": dia})
+            await db.execute(ACUMULAR_RESUMEN, resumenes)
+
+    aplicados = sum(1 for resultado in resultados if resultado["aplicado"])
+    return {"aplicados": aplicados, "rechazados": len(resultados) - aplicados, "resultados": resultados}
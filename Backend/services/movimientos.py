@@ -0,0 +1,224 @@
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+import pytz
+from sqlalchemy.sql import text
+from services.saldos import ejecutar_con_reintentos, diagnosticar, dia_limite, uso_hoy, set_uso
+from services.resumen_cuentas import resumen_desde
+
+COSTO_DEPOSITO = Decimal("0.50")
+COSTO_RETIRO_CON_TARJETA = Decimal("1.00")
+COSTO_RETIRO_SIN_TARJETA = Decimal("0.75")
+COSTO_RECIBO = Decimal("0.25")
+
+# Depósito completo en un solo viaje a la base: acreditación condicional (con
+# el contador de uso diario web) + TRANSACCION + DEPOSITO + RECIBO +
+# RESUMEN_CUENTA encadenados con CTEs. Si la cuenta o el cajero no son
+# válidos, "upd" no devuelve filas y ningún INSERT se ejecuta.
+DEPOSITO_CTE = text(f"""
+    WITH cajero AS (
+        SELECT 1 FROM CAJERO
+        WHERE CAJERO_ID = CAST(:cajero_id AS VARCHAR) AND CAJERO_ESTADO = 'ACTIVO'
+    ),
+    upd AS (
+        UPDATE CUENTA SET CUENTA_SALDO = CUENTA_SALDO + CAST(:monto AS NUMERIC),
+            {set_uso({"web": "CAST(:monto AS NUMERIC)"})}
+        WHERE CUENTA_ID = :cuenta_id AND CLIENTE_ID = :cliente_id AND CUENTA_ESTADO = 'ACTIVA'
+          AND {uso_hoy("web")} + CAST(:monto AS NUMERIC) <= CUENTA_LIMITE_TRANS_WEB
+          AND (CAST(:cajero_id AS VARCHAR) IS NULL OR EXISTS (SELECT 1 FROM cajero))
+        RETURNING CUENTA_ID, CUENTA_SALDO
+    ),
+    t AS (
+        INSERT INTO TRANSACCION (
+            TRANSACCION_ID, CUENTA_ID, TIPO, TRANSACCION_MONTO,
+            TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO
+        )
+        SELECT CAST(:transaccion_id AS VARCHAR), CUENTA_ID, 'DEPOSITO', CAST(:monto AS NUMERIC),
+               CAST(:costo AS NUMERIC), CAST(:fecha AS TIMESTAMPTZ), CAST(:recibo AS INTEGER)
+        FROM upd
+        RETURNING TRANSACCION_ID
+    ),
+    d AS (
+        INSERT INTO DEPOSITO (
+            TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO
+        )
+        SELECT TRANSACCION_ID, CAST(:cuenta_id AS VARCHAR), CAST(:costo AS NUMERIC),
+               CAST(:fecha AS TIMESTAMPTZ), CAST(:recibo AS INTEGER)
+        FROM t
+    ),
+    r AS (
+        INSERT INTO RECIBO (TRANSACCION_ID, CAJERO_ID, RECIBO_COSTO)
+        SELECT TRANSACCION_ID, CAST(:cajero_id AS VARCHAR), CAST(:recibo_costo AS NUMERIC)
+        FROM t
+        WHERE CAST(:con_recibo AS BOOLEAN)
+    ),
+    res AS ({resumen_desde("t", "CAST(:monto AS NUMERIC)", "0", 1, 0)})
+    SELECT
+        (SELECT TRANSACCION_ID FROM t) AS transaccion_id,
+        (SELECT CUENTA_SALDO FROM upd) AS cuenta_saldo,
+        EXISTS (SELECT 1 FROM cajero) AS cajero_ok
+""")
+
+# Retiro completo en un solo viaje: débito condicional (saldo, límite diario
+# móvil si usa tarjeta, cajero y tarjeta activos) + TRANSACCION + RETIRO + subtipo +
+# RECIBO + RESUMEN_CUENTA.
+RETIRO_CTE = text(f"""
+    WITH cajero AS (
+        SELECT 1 FROM CAJERO
+        WHERE CAJERO_ID = CAST(:cajero_id AS VARCHAR) AND CAJERO_ESTADO = 'ACTIVO'
+    ),
+    tarjeta AS (
+        SELECT 1 FROM TARJETA
+        WHERE TARJETA_ID = CAST(:tarjeta_id AS VARCHAR) AND CUENTA_ID = :cuenta_id AND TARJETA_ESTADO = 'ACTIVA'
+    ),
+    upd AS (
+        UPDATE CUENTA SET CUENTA_SALDO = CUENTA_SALDO - CAST(:monto AS NUMERIC),
+            {set_uso({"movil": "CASE WHEN CAST(:usar_tarjeta AS BOOLEAN) THEN CAST(:monto AS NUMERIC) ELSE 0 END"})}
+        WHERE CUENTA_ID = :cuenta_id AND CLIENTE_ID = :cliente_id AND CUENTA_ESTADO = 'ACTIVA'
+          AND CUENTA_SALDO >= CAST(:monto AS NUMERIC)
+          AND (NOT CAST(:usar_tarjeta AS BOOLEAN) OR {uso_hoy("movil")} + CAST(:monto AS NUMERIC) <= CUENTA_LIMITE_TRANS_MOVIL)
+          AND EXISTS (SELECT 1 FROM cajero)
+          AND (NOT CAST(:usar_tarjeta AS BOOLEAN) OR EXISTS (SELECT 1 FROM tarjeta))
+        RETURNING CUENTA_ID, CUENTA_SALDO
+    ),
+    t AS (
+        INSERT INTO TRANSACCION (
+            TRANSACCION_ID, CUENTA_ID, TIPO, TRANSACCION_MONTO,
+            TRANSACCION_COSTO, TRANSACCION_FECHA, TRANSACCION_RECIBO
+        )
+        SELECT CAST(:transaccion_id AS VARCHAR), CUENTA_ID, 'RETIRO', CAST(:monto AS NUMERIC),
+               CAST(:costo AS NUMERIC), CAST(:fecha AS TIMESTAMPTZ), CAST(:recibo AS INTEGER)
+        FROM upd
+        RETURNING TRANSACCION_ID
+    ),
+    rt AS (
+        INSERT INTO RETIRO (
+            TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
+            TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX
+        )
+        SELECT TRANSACCION_ID, CAST(:cuenta_id AS VARCHAR), CAST(:costo AS NUMERIC), CAST(:fecha AS TIMESTAMPTZ),
+               CAST(:recibo AS INTEGER), CAST(:monto AS NUMERIC), CAST(:monto_max AS NUMERIC)
+        FROM t
+    ),
+    ct AS (
+        INSERT INTO RETIRO_CON_TARJETA (
+            TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
+            TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX, RETIROCT_TARJETA,
+            RETIROCT_AID, RETIROCT_P22, RETIROCT_P38, RETIROCT_COSTO_INTERBANCARIO
+        )
+        SELECT TRANSACCION_ID, CAST(:cuenta_id AS VARCHAR), CAST(:costo AS NUMERIC), CAST(:fecha AS TIMESTAMPTZ),
+               CAST(:recibo AS INTEGER), CAST(:monto AS NUMERIC), CAST(:monto_max AS NUMERIC),
+               CAST(:tarjeta_id AS VARCHAR), CAST(:aid AS VARCHAR), CAST(:p22 AS VARCHAR),
+               CAST(:p38 AS VARCHAR), CAST(:costo_inter AS NUMERIC)
+        FROM t
+        WHERE CAST(:usar_tarjeta AS BOOLEAN)
+    ),
+    st AS (
+        INSERT INTO RETIRO_SIN_TARJETA (
+            TRANSACCION_ID, CUENTA_ID, TRANSACCION_COSTO, TRANSACCION_FECHA,
+            TRANSACCION_RECIBO, RETIRO_MONTO, RETIRO_MONTO_MAX,
+            RETIROST_CELULAR_BENEFICIARIO, RETIROST_CLAVE,
+            RETIROST_DURACION, RETIROST_MAXIMO_RETIROS
+        )
+        SELECT TRANSACCION_ID, CAST(:cuenta_id AS VARCHAR), CAST(:costo AS NUMERIC), CAST(:fecha AS TIMESTAMPTZ),
+               CAST(:recibo AS INTEGER), CAST(:monto AS NUMERIC), CAST(:monto_max AS NUMERIC),
+               CAST(:celular_beneficiario AS VARCHAR), CAST(:clave AS VARCHAR),
+               CAST(:duracion AS INTEGER), CAST(:maximo_retiros AS INTEGER)
+        FROM t
+        WHERE NOT CAST(:usar_tarjeta AS BOOLEAN)
+    ),
+    r AS (
+        INSERT INTO RECIBO (TRANSACCION_ID, CAJERO_ID, RECIBO_COSTO)
+        SELECT TRANSACCION_ID, CAST(:cajero_id AS VARCHAR), CAST(:recibo_costo AS NUMERIC)
+        FROM t
+        WHERE CAST(:con_recibo AS BOOLEAN)
+    ),
+    res AS ({resumen_desde("t", "0", "CAST(:monto AS NUMERIC)", 0, 1)})
+    SELECT
+        (SELECT TRANSACCION_ID FROM t) AS transaccion_id,
+        (SELECT CUENTA_SALDO FROM upd) AS cuenta_saldo,
+        EXISTS (SELECT 1 FROM cajero) AS cajero_ok,
+        EXISTS (SELECT 1 FROM tarjeta) AS tarjeta_ok
+""")
+
+
+def nuevo_transaccion_id():
+    # uuid4 completo (122 bits aleatorios): la PK particionada no garantiza la unicidad del ID
+    return uuid4().hex.upper()
+
+
+def parametros_deposito(deposito, fecha=None):
+    """Parámetros de DEPOSITO_CTE (y de los INSERT del lote) para un DepositoRequest."""
+    fecha = fecha or datetime.now(pytz.UTC)
+    return {
+        "transaccion_id": nuevo_transaccion_id(),
+        "cuenta_id": deposito.cuenta_id,
+        "cajero_id": deposito.cajero_id,
+        "monto": deposito.monto,
+        "costo": COSTO_DEPOSITO,
+        "fecha": fecha,
+        "dia": dia_limite(fecha),
+        "recibo": 1 if deposito.generar_recibo else None,
+        "con_recibo": bool(deposito.generar_recibo and deposito.cajero_id),
+        "recibo_costo": COSTO_RECIBO
+    }
+
+
+def parametros_retiro(retiro, fecha=None):
+    """Parámetros de RETIRO_CTE (y de los INSERT del lote) para un RetiroRequest."""
+    fecha = fecha or datetime.now(pytz.UTC)
+    usar_tarjeta = bool(retiro.usar_tarjeta and retiro.tarjeta_id)
+    return {
+        "transaccion_id": nuevo_transaccion_id(),
+        "cuenta_id": retiro.cuenta_id,
+        "cajero_id": retiro.cajero_id,
+        "usar_tarjeta": usar_tarjeta,
+        "tarjeta_id": retiro.tarjeta_id,
+        "monto": retiro.monto,
+        "monto_max": Decimal("1000"),
+        "costo": COSTO_RETIRO_CON_TARJETA if retiro.usar_tarjeta else COSTO_RETIRO_SIN_TARJETA,
+        "fecha": fecha,
+        "dia": dia_limite(fecha),
+        "recibo": 1 if retiro.generar_recibo else None,
+        "con_recibo": bool(retiro.generar_recibo and retiro.cajero_id),
+        "recibo_costo": COSTO_RECIBO,
+        "aid": "A0000000041010",
+        "p22": "123",
+        "p38": "123456",
+        "costo_inter": Decimal("0.10"),
+        "celular_beneficiario": "0999999999",
+        "clave": "1234",
+        "duracion": 24,
+        "maximo_retiros": 1
+    }
+
+
+class CajeroNoDisponible(Exception):
+    pass
+
+
+class TarjetaNoDisponible(Exception):
+    pass
+
+
+async def registrar_deposito(db, cliente_id, params):
+    """Ejecuta DEPOSITO_CTE; devuelve la fila resultado o lanza el motivo del rechazo."""
+    fila = await ejecutar_con_reintentos(db, DEPOSITO_CTE, {**params, "cliente_id": cliente_id})
+    if fila.transaccion_id is None:
+        error = await diagnosticar(db, params["cuenta_id"], cliente_id, params["monto"], 1, "web", params["dia"])
+        raise error or CajeroNoDisponible()
+    return fila
+
+
+async def registrar_retiro(db, cliente_id, params):
+    """Ejecuta RETIRO_CTE; devuelve la fila resultado o lanza el motivo del rechazo."""
+    fila = await ejecutar_con_reintentos(db, RETIRO_CTE, {**params, "cliente_id": cliente_id})
+    if fila.transaccion_id is None:
+        canal = "movil" if params["usar_tarjeta"] else None
+        error = await diagnosticar(db, params["cuenta_id"], cliente_id, params["monto"], -1, canal, params["dia"])
+        if error:
+            raise error
+        if not fila.cajero_ok:
+            raise CajeroNoDisponible()
+        raise TarjetaNoDisponible()
+    return fila
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime
+import pytz
+from sqlalchemy.sql import text, bindparam
+from dotenv import load_dotenv
+from config.database import AsyncSessionLocal
+from services.archivo import inicio_mes, mes_siguiente
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Meses por delante del actual que deben tener partición creada
+PARTICIONES_MESES_FUTUROS = int(os.getenv("PARTICIONES_MESES_FUTUROS", "3"))
+# Cada cuánto cada worker revisa y crea las particiones que falten; 0 = sólo al arrancar
+PARTICIONES_REVISION_SEGUNDOS = float(os.getenv("PARTICIONES_REVISION_SEGUNDOS", "21600"))
+LOCK_PARTICIONES = 72018  # clave de pg_advisory_xact_lock
+
+# Los subtipos primero: TRANSACCION es la última en perder un mes
+TABLAS_PARTICIONADAS = ("deposito", "retiro_con_tarjeta", "retiro_sin_tarjeta", "retiro", "transaccion")
+
+# Sólo crea las que faltan: CREATE TABLE ... PARTITION OF bloquea la tabla padre
+CREAR_FALTANTES = text("""
+    SELECT CREAR_PARTICION_MENSUAL(t.tabla, m.mes)
+    FROM unnest(CAST(:tablas AS TEXT[])) AS t(tabla)
+    CROSS JOIN LATERAL (
+        SELECT CAST(date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => n) AS DATE) AS mes
+        FROM generate_series(0, CAST(:meses AS INTEGER)) AS n
+    ) m
+    WHERE to_regclass(t.tabla || '_' || to_char(m.mes, 'YYYY_MM')) IS NULL
+""")
+
+PARTICION_MAS_LEJANA = text("""
+    SELECT p.relname, max(c.relname)
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname IN :tablas AND c.relname ~ '_[0-9]{4}_[0-9]{2}$'
+    GROUP BY p.relname
+""").bindparams(bindparam("tablas", expanding=True))
+
+# Fin (exclusivo) de la partición más lejana de cada tabla y momento de la última revisión correcta
+particiones_hasta = {}
+ultima_revision = None
+
+
+async def asegurar_particiones(meses_futuros=PARTICIONES_MESES_FUTUROS):
+    """Crea las particiones que falten del mes en curso a ``meses_futuros`` adelante.
+
+    Sin partición para su fecha un INSERT falla ("no partition of relation
+    found for row"), así que no depende sólo del cron de comandos.particiones.
+    El advisory lock serializa a los workers y el lock_timeout evita que el
+    bloqueo de la tabla padre frene los movimientos si hay una transacción larga.
+    Devuelve la cantidad de particiones creadas.
+    """
+    global ultima_revision
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SET LOCAL lock_timeout = '5s'"))
+        await db.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": LOCK_PARTICIONES})
+        creadas = (await db.execute(
+            CREAR_FALTANTES, {"tablas": list(TABLAS_PARTICIONADAS), "meses": meses_futuros}
+        )).fetchall()
+        filas = (await db.execute(PARTICION_MAS_LEJANA, {"tablas": list(TABLAS_PARTICIONADAS)})).fetchall()
+        await db.commit()
+    for tabla, nombre in filas:
+        mes = date(int(nombre[-7:-3]), int(nombre[-2:]), 1)
+        particiones_hasta[tabla] = inicio_mes(mes_siguiente(mes))
+    ultima_revision = datetime.now(pytz.UTC)
+    for (nombre,) in creadas:
+        logger.info("Creada la partición %s", nombre)
+    return len(creadas)
+
+
+async def mantener_particiones():
+    """Tarea de fondo de la app: asegura las particiones al arrancar y cada PARTICIONES_REVISION_SEGUNDOS."""
+    while True:
+        try:
+            await asegurar_particiones()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("No se pudieron asegurar las particiones futuras: %s", e)
+        if PARTICIONES_REVISION_SEGUNDOS <= 0:
+            return
+        await asyncio.sleep(PARTICIONES_REVISION_SEGUNDOS)
+
+
+def exposicion_particiones():
+    """Gauges de Prometheus para alertar antes de quedarse sin particiones."""
+    lineas = [
+        "# HELP db_particion_hasta_timestamp_seconds Fin de la partición mensual más lejana por tabla.",
+        "# TYPE db_particion_hasta_timestamp_seconds gauge",
+    ]
+    for tabla, hasta in sorted(particiones_hasta.items()):
+        lineas.append(f'db_particion_hasta_timestamp_seconds{{tabla="{tabla}"}} {hasta.timestamp():.0f}')
+    if ultima_revision is not None:
+        lineas.append("# TYPE db_particiones_revision_timestamp_seconds gauge")
+        lineas.append(f"db_particiones_revision_timestamp_seconds {ultima_revision.timestamp():.0f}")
+    return "\n".join(lineas) + "\n"
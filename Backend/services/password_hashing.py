@@ -0,0 +1,63 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Factor de costo de bcrypt y tamaño del pool dedicado al hashing
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordPoolSaturated(Exception):
+    """Se lanza cuando la cola del pool de hashing está llena."""
+
+
+class PasswordHasher:
+    """Ejecuta hash/verify de bcrypt en un pool de hilos acotado.
+
+    bcrypt libera el GIL, por lo que los hilos corren en paralelo sin bloquear
+    el event loop. Si ya hay ``max_pending`` operaciones en curso o en cola, la
+    llamada falla de inmediato con PasswordPoolSaturated (backpressure).
+    """
+
+    def __init__(self, context, workers, max_pending):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self.rejected = 0
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordPoolSaturated()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password):
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password, hashed):
+        return await self._run(self.context.verify, password, hashed)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        }
+
+
+password_hasher = PasswordHasher(pwd_context, PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING)
@@ -0,0 +1,94 @@
+from collections import defaultdict
+from sqlalchemy.sql import text
+from schemas.transaccion import (
+    ClienteResponse, CuentaResponse, TarjetaResponse,
+    TarjetaCreditoResponse, TarjetaDebitoResponse, TransaccionResponse
+)
+from services.escrituras import CLIENTE_RETURNING, tarjeta_credito_returning
+from services.transacciones import TRANSACCION_COLUMNAS
+
+RESUMEN_TRANSACCIONES_DEFECTO = 10
+RESUMEN_TRANSACCIONES_MAXIMO = 50
+
+# Cliente con la lista de sus cuentas en una sola consulta
+CLIENTE_CON_CUENTAS = text(f"SELECT {CLIENTE_RETURNING} FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
+
+CUENTAS_CLIENTE = text("SELECT * FROM CUENTA WHERE CLIENTE_ID = :cliente_id ORDER BY CUENTA_ID")
+
+TARJETAS_CUENTAS = text("SELECT t.* FROM TARJETA t WHERE t.CUENTA_ID = ANY(:ids)")
+
+TARJETAS_CREDITO_CUENTAS = text(f"""
+    SELECT {tarjeta_credito_returning("tc")}
+    FROM TARJETA_DE_CREDITO tc
+    WHERE tc.CUENTA_ID = ANY(:ids)
+""")
+
+TARJETAS_DEBITO_CUENTAS = text("SELECT td.* FROM TARJETA_DE_DEBITO td WHERE td.CUENTA_ID = ANY(:ids)")
+
+# Últimas :n transacciones de cada cuenta: un LATERAL por cuenta sobre el índice
+# (CUENTA_ID, TRANSACCION_FECHA DESC, TRANSACCION_ID DESC), todo en una consulta
+ULTIMAS_TRANSACCIONES = text(f"""
+    SELECT t.*
+    FROM unnest(CAST(:ids AS VARCHAR[])) AS c(cuenta_id)
+    CROSS JOIN LATERAL (
+        SELECT {TRANSACCION_COLUMNAS}
+        FROM TRANSACCION
+        WHERE CUENTA_ID = c.cuenta_id
+        ORDER BY TRANSACCION_FECHA DESC, TRANSACCION_ID DESC
+        LIMIT :n
+    ) t
+""")
+
+
+async def _por_cuenta(db, query, params, modelo):
+    result = await db.execute(query, params)
+    columns = result.keys()
+    agrupadas = defaultdict(list)
+    for fila in result.fetchall():
+        agrupadas[fila.cuenta_id].append(modelo(**{col: getattr(fila, col) for col in columns}))
+    return agrupadas
+
+
+async def resumen_cliente(db, cliente_id, transacciones=RESUMEN_TRANSACCIONES_DEFECTO):
+    """Cliente, cuentas, tarjetas de los tres tipos y últimas transacciones por cuenta.
+
+    Usa a lo sumo seis consultas sin importar cuántas cuentas tenga el cliente:
+    las de tarjetas y transacciones filtran con ``= ANY(:ids)`` sobre todas las
+    cuentas a la vez. Devuelve None si el cliente no existe.
+    """
+    result = await db.execute(CLIENTE_CON_CUENTAS, {"cliente_id": cliente_id})
+    cliente = result.fetchone()
+    if not cliente:
+        return None
+    columns = result.keys()
+    cliente = ClienteResponse(**{col: getattr(cliente, col) for col in columns})
+
+    result = await db.execute(CUENTAS_CLIENTE, {"cliente_id": cliente_id})
+    columns = result.keys()
+    cuentas = [CuentaResponse(**{col: getattr(cuenta, col) for col in columns}) for cuenta in result.fetchall()]
+
+    ids = [cuenta.cuenta_id for cuenta in cuentas]
+    tarjetas = tarjetas_credito = tarjetas_debito = ultimas = {}
+    if ids:
+        params = {"ids": ids}
+        tarjetas = await _por_cuenta(db, TARJETAS_CUENTAS, params, TarjetaResponse)
+        tarjetas_credito = await _por_cuenta(db, TARJETAS_CREDITO_CUENTAS, params, TarjetaCreditoResponse)
+        tarjetas_debito = await _por_cuenta(db, TARJETAS_DEBITO_CUENTAS, params, TarjetaDebitoResponse)
+        if transacciones:
+            ultimas = await _por_cuenta(
+                db, ULTIMAS_TRANSACCIONES, {"ids": ids, "n": transacciones}, TransaccionResponse
+            )
+
+    return {
+        "cliente": cliente,
+        "cuentas": [
+            {
+                **cuenta.model_dump(),
+                "tarjetas": tarjetas.get(cuenta.cuenta_id, []),
+                "tarjetas_credito": tarjetas_credito.get(cuenta.cuenta_id, []),
+                "tarjetas_debito": tarjetas_debito.get(cuenta.cuenta_id, []),
+                "transacciones": ultimas.get(cuenta.cuenta_id, []),
+            }
+            for cuenta in cuentas
+        ],
+    }
@@ -0,0 +1,168 @@
+from datetime import date
+from sqlalchemy.sql import text, bindparam
+from services.archivo import archivo_historial
+
+TIPOS_DEPOSITO = ("DEPOSITO",)
+TIPOS_RETIRO = ("RETIRO", "RETIRO_SIN_TARJETA")
+
+# Mes (UTC) al que se imputa un movimiento
+MES_DE = "CAST(date_trunc('month', CAST(:fecha AS TIMESTAMPTZ) AT TIME ZONE 'UTC') AS DATE)"
+
+RESUMEN_COLUMNAS = """
+    CUENTA_ID, RESUMEN_MES, RESUMEN_DEPOSITADO, RESUMEN_RETIRADO, RESUMEN_COSTOS,
+    RESUMEN_DEPOSITOS, RESUMEN_RETIROS, RESUMEN_ULTIMO_MOVIMIENTO, RESUMEN_ULTIMA_TRANSACCION
+"""
+
+# Suma el movimiento a la fila (cuenta, mes); compartido por las CTEs de
+# services.movimientos, retiro_sin_tarjeta y la ingesta por lotes
+RESUMEN_ON_CONFLICT = """
+    ON CONFLICT (CUENTA_ID, RESUMEN_MES) DO UPDATE SET
+        RESUMEN_DEPOSITADO = RESUMEN_CUENTA.RESUMEN_DEPOSITADO + EXCLUDED.RESUMEN_DEPOSITADO,
+        RESUMEN_RETIRADO = RESUMEN_CUENTA.RESUMEN_RETIRADO + EXCLUDED.RESUMEN_RETIRADO,
+        RESUMEN_COSTOS = RESUMEN_CUENTA.RESUMEN_COSTOS + EXCLUDED.RESUMEN_COSTOS,
+        RESUMEN_DEPOSITOS = RESUMEN_CUENTA.RESUMEN_DEPOSITOS + EXCLUDED.RESUMEN_DEPOSITOS,
+        RESUMEN_RETIROS = RESUMEN_CUENTA.RESUMEN_RETIROS + EXCLUDED.RESUMEN_RETIROS,
+        RESUMEN_ULTIMA_TRANSACCION = CASE
+            WHEN RESUMEN_CUENTA.RESUMEN_ULTIMO_MOVIMIENTO IS NULL
+              OR EXCLUDED.RESUMEN_ULTIMO_MOVIMIENTO >= RESUMEN_CUENTA.RESUMEN_ULTIMO_MOVIMIENTO
+            THEN EXCLUDED.RESUMEN_ULTIMA_TRANSACCION
+            ELSE RESUMEN_CUENTA.RESUMEN_ULTIMA_TRANSACCION
+        END,
+        RESUMEN_ULTIMO_MOVIMIENTO = GREATEST(RESUMEN_CUENTA.RESUMEN_ULTIMO_MOVIMIENTO, EXCLUDED.RESUMEN_ULTIMO_MOVIMIENTO)
+"""
+
+
+def resumen_desde(origen, depositado, retirado, depositos, retiros):
+    """INSERT ... SELECT que acumula en el resumen el movimiento de la CTE ``origen``
+    (que expone TRANSACCION_ID), para encadenarlo en la misma sentencia."""
+    return f"""
+        INSERT INTO RESUMEN_CUENTA ({RESUMEN_COLUMNAS})
+        SELECT
+            CAST(:cuenta_id AS VARCHAR), {MES_DE}, {depositado}, {retirado},
+            CAST(:costo AS NUMERIC)
+                + CASE WHEN CAST(:con_recibo AS BOOLEAN) THEN CAST(:recibo_costo AS NUMERIC) ELSE 0 END,
+            {depositos}, {retiros},
+            CAST(:fecha AS TIMESTAMPTZ), TRANSACCION_ID
+        FROM {origen}
+        {RESUMEN_ON_CONFLICT}
+    """
+
+
+ACUMULAR_RESUMEN = text(f"""
+    INSERT INTO RESUMEN_CUENTA ({RESUMEN_COLUMNAS})
+    VALUES (
+        :cuenta_id, {MES_DE}, :depositado, :retirado, :costos,
+        :depositos, :retiros, :fecha, :transaccion_id
+    )
+    {RESUMEN_ON_CONFLICT}
+""")
+
+LEER_RESUMEN = text("""
+    SELECT
+        c.CUENTA_ID AS cuenta_id,
+        COALESCE(m.RESUMEN_DEPOSITADO, 0) AS total_depositado,
+        COALESCE(m.RESUMEN_RETIRADO, 0) AS total_retirado,
+        COALESCE(m.RESUMEN_COSTOS, 0) AS costos_pagados,
+        COALESCE(m.RESUMEN_DEPOSITOS, 0) AS depositos,
+        COALESCE(m.RESUMEN_RETIROS, 0) AS retiros,
+        u.RESUMEN_ULTIMO_MOVIMIENTO AS ultimo_movimiento,
+        u.RESUMEN_ULTIMA_TRANSACCION AS ultima_transaccion_id
+    FROM CUENTA c
+    LEFT JOIN RESUMEN_CUENTA m ON m.CUENTA_ID = c.CUENTA_ID AND m.RESUMEN_MES = :mes
+    LEFT JOIN LATERAL (
+        SELECT RESUMEN_ULTIMO_MOVIMIENTO, RESUMEN_ULTIMA_TRANSACCION
+        FROM RESUMEN_CUENTA
+        WHERE CUENTA_ID = c.CUENTA_ID
+        ORDER BY RESUMEN_MES DESC
+        LIMIT 1
+    ) u ON TRUE
+    WHERE c.CUENTA_ID = :cuenta_id AND c.CLIENTE_ID = :cliente_id
+""")
+
+
+# Partición de TRANSACCION más vieja que sigue adjunta (<tabla>_AAAA_MM ordena por mes)
+PARTICION_MAS_VIEJA = text("""
+    SELECT min(c.relname) FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'transaccion'::regclass AND c.relname ~ '_[0-9]{4}_[0-9]{2}$'
+""")
+
+
+def consulta_reconstruccion(cuenta_id=None, desde=None, patron=None):
+    """Recalcula RESUMEN_CUENTA desde TRANSACCION (+ RECIBO para el costo del recibo)."""
+    filtro = "AND t.CUENTA_ID = :cuenta_id" if cuenta_id else ""
+    if patron:
+        filtro += " AND t.CUENTA_ID LIKE :patron"
+    if desde:
+        filtro += " AND t.TRANSACCION_FECHA >= CAST(CAST(:desde AS DATE) AS TIMESTAMP) AT TIME ZONE 'UTC'"
+    return text(f"""
+        INSERT INTO RESUMEN_CUENTA ({RESUMEN_COLUMNAS})
+        SELECT
+            t.CUENTA_ID,
+            CAST(date_trunc('month', t.TRANSACCION_FECHA AT TIME ZONE 'UTC') AS DATE),
+            COALESCE(SUM(t.TRANSACCION_MONTO) FILTER (WHERE t.TIPO IN :depositos), 0),
+            COALESCE(SUM(t.TRANSACCION_MONTO) FILTER (WHERE t.TIPO IN :retiros), 0),
+            COALESCE(SUM(COALESCE(t.TRANSACCION_COSTO, 0) + COALESCE(r.RECIBO_COSTO, 0)), 0),
+            COUNT(*) FILTER (WHERE t.TIPO IN :depositos),
+            COUNT(*) FILTER (WHERE t.TIPO IN :retiros),
+            MAX(t.TRANSACCION_FECHA),
+            (ARRAY_AGG(t.TRANSACCION_ID ORDER BY t.TRANSACCION_FECHA DESC, t.TRANSACCION_ID DESC))[1]
+        FROM TRANSACCION t
+        LEFT JOIN RECIBO r ON r.TRANSACCION_ID = t.TRANSACCION_ID
+        WHERE t.TIPO IN :tipos {filtro}
+        GROUP BY 1, 2
+    """).bindparams(
+        bindparam("depositos", expanding=True),
+        bindparam("retiros", expanding=True),
+        bindparam("tipos", expanding=True),
+    )
+
+
+async def primer_mes_en_base(db):
+    """Primer mes cuyos movimientos siguen todos en TRANSACCION, o None si no falta ninguno.
+
+    Es el mayor entre la frontera del archivo y el mes de la partición adjunta
+    más vieja: los meses anteriores ya no están (o no completos) en la base.
+    """
+    meses = []
+    limite = archivo_historial.limite()
+    if limite is not None:
+        meses.append(limite.date())
+    nombre = (await db.execute(PARTICION_MAS_VIEJA)).scalar()
+    if nombre:
+        meses.append(date(int(nombre[-7:-3]), int(nombre[-2:]), 1))
+    return max(meses) if meses else None
+
+
+async def reconstruir_resumen(db, cuenta_id=None, patron=None):
+    """Vacía y recalcula el resumen (de todas las cuentas, de una o de las que
+    cumplen el LIKE ``patron``) en la transacción de ``db``.
+
+    Sólo toca los meses que siguen en la base (primer_mes_en_base): las filas
+    de meses archivados o desasociados se conservan, porque ya no hay de
+    dónde recalcularlas. El LOCK espera a que terminen los movimientos en
+    curso y frena los nuevos hasta el commit, así ninguno queda contado dos
+    veces ni fuera del resumen. Devuelve la cantidad de filas (cuenta, mes)
+    generadas. El llamador hace commit.
+    """
+    await db.execute(text("LOCK TABLE RESUMEN_CUENTA IN EXCLUSIVE MODE"))
+    desde = await primer_mes_en_base(db)
+    params = {
+        "depositos": list(TIPOS_DEPOSITO),
+        "retiros": list(TIPOS_RETIRO),
+        "tipos": list(TIPOS_DEPOSITO + TIPOS_RETIRO),
+    }
+    condiciones = []
+    borrar = {}
+    if cuenta_id:
+        condiciones.append("CUENTA_ID = :cuenta_id")
+        borrar["cuenta_id"] = params["cuenta_id"] = cuenta_id
+    if patron:
+        condiciones.append("CUENTA_ID LIKE :patron")
+        borrar["patron"] = params["patron"] = patron
+    if desde:
+        condiciones.append("RESUMEN_MES >= :desde")
+        borrar["desde"] = params["desde"] = desde
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    await db.execute(text(f"DELETE FROM RESUMEN_CUENTA{where}"), borrar)
+    result = await db.execute(consulta_reconstruccion(cuenta_id, desde, patron), params)
+    return result.rowcount
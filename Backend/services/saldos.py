@@ -0,0 +1,177 @@
+import asyncio
+import os
+import random
+from datetime import datetime
+import pytz
+from psycopg import errors as pg_errors
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Reintentos ante errores transitorios (deadlock, serialización, lock timeout)
+SALDO_MAX_REINTENTOS = int(os.getenv("SALDO_MAX_REINTENTOS", "3"))
+SALDO_BACKOFF_SEGUNDOS = float(os.getenv("SALDO_BACKOFF_SEGUNDOS", "0.02"))
+
+# Zona horaria en la que se reinician los límites diarios
+LIMITES_ZONA_HORARIA = pytz.timezone(os.getenv("LIMITES_ZONA_HORARIA", "America/Guayaquil"))
+
+# Columnas de límite diario y de uso acumulado en el día, por canal
+LIMITES = {
+    "web": "CUENTA_LIMITE_TRANS_WEB",
+    "movil": "CUENTA_LIMITE_TRANS_MOVIL",
+}
+USOS = {
+    "web": "CUENTA_USO_WEB",
+    "movil": "CUENTA_USO_MOVIL",
+}
+
+ERRORES_TRANSITORIOS = (
+    pg_errors.DeadlockDetected,
+    pg_errors.SerializationFailure,
+    pg_errors.LockNotAvailable,
+)
+
+
+class CuentaNoDisponible(Exception):
+    """La cuenta no existe, no pertenece al cliente o no está activa."""
+
+
+class LimiteExcedido(Exception):
+    """El monto supera lo que queda del límite diario del canal."""
+
+
+class SaldoInsuficiente(Exception):
+    pass
+
+
+def dia_limite(momento=None):
+    """Día (en LIMITES_ZONA_HORARIA) al que se imputa un movimiento para los límites."""
+    return (momento or datetime.now(pytz.UTC)).astimezone(LIMITES_ZONA_HORARIA).date()
+
+
+def uso_hoy(canal):
+    """Uso del canal en el día :dia (0 si el contador guardado es de otro día)."""
+    return f"CASE WHEN CUENTA_USO_FECHA = CAST(:dia AS DATE) THEN {USOS[canal]} ELSE 0 END"
+
+
+def set_uso(montos):
+    """Asignaciones SET que suman ``montos[canal]`` (expresión SQL) al uso del día.
+
+    Reescribe los contadores de todos los canales y CUENTA_USO_FECHA, así un
+    contador de un día anterior se reinicia en la misma escritura. Va en el
+    mismo UPDATE que el saldo: la verificación del límite y el incremento son
+    atómicos con él.
+    """
+    asignaciones = [f"{USOS[canal]} = {uso_hoy(canal)} + {montos.get(canal, '0')}" for canal in USOS]
+    asignaciones.append("CUENTA_USO_FECHA = CAST(:dia AS DATE)")
+    return ", ".join(asignaciones)
+
+
+def _consulta_mutacion(signo, canal):
+    condiciones = [
+        "CUENTA_ID = :cuenta_id",
+        "CLIENTE_ID = :cliente_id",
+        "CUENTA_ESTADO = 'ACTIVA'",
+    ]
+    operador = "+" if signo > 0 else "-"
+    asignaciones = f"CUENTA_SALDO = CUENTA_SALDO {operador} :monto"
+    if signo < 0:
+        condiciones.append("CUENTA_SALDO >= :monto")
+    if canal:
+        condiciones.append(f"{uso_hoy(canal)} + :monto <= {LIMITES[canal]}")
+        asignaciones += ", " + set_uso({canal: ":monto"})
+    return text(f"""
+        UPDATE CUENTA SET {asignaciones}
+        WHERE {" AND ".join(condiciones)}
+        RETURNING CUENTA_SALDO AS cuenta_saldo
+    """)
+
+
+_CONSULTAS = {
+    (signo, canal): _consulta_mutacion(signo, canal)
+    for signo in (1, -1)
+    for canal in (None, *LIMITES)
+}
+
+
+_DIAGNOSTICO = text(f"""
+    SELECT CLIENTE_ID AS cliente_id, CUENTA_ESTADO AS cuenta_estado, CUENTA_SALDO AS cuenta_saldo,
+           CUENTA_LIMITE_TRANS_WEB AS web, CUENTA_LIMITE_TRANS_MOVIL AS movil,
+           {uso_hoy("web")} AS uso_web, {uso_hoy("movil")} AS uso_movil
+    FROM CUENTA WHERE CUENTA_ID = :cuenta_id
+""")
+
+# Límites, uso del día y disponible por canal (GET /cuentas/{cuenta_id}/limites)
+LEER_LIMITES = text(f"""
+    SELECT CUENTA_ID AS cuenta_id,
+           CUENTA_LIMITE_TRANS_WEB AS web, CUENTA_LIMITE_TRANS_MOVIL AS movil,
+           {uso_hoy("web")} AS uso_web, {uso_hoy("movil")} AS uso_movil
+    FROM CUENTA WHERE CUENTA_ID = :cuenta_id AND CLIENTE_ID = :cliente_id
+""")
+
+
+def _es_transitorio(error):
+    return isinstance(getattr(error, "orig", None), ERRORES_TRANSITORIOS)
+
+
+async def diagnosticar(db, cuenta_id, cliente_id, monto, signo, canal=None, dia=None):
+    """Motivo por el que la mutación condicional no afectó la cuenta.
+
+    Sólo se ejecuta en el camino de error. Devuelve la excepción a lanzar, o
+    None si la cuenta por sí sola admitiría el movimiento (el rechazo vino de
+    otra condición de la sentencia, p. ej. un cajero inactivo).
+    """
+    cuenta = (await db.execute(_DIAGNOSTICO, {"cuenta_id": cuenta_id, "dia": dia or dia_limite()})).fetchone()
+    if not cuenta or cuenta.cliente_id != cliente_id or cuenta.cuenta_estado != "ACTIVA":
+        return CuentaNoDisponible()
+    if signo < 0 and cuenta.cuenta_saldo < monto:
+        return SaldoInsuficiente()
+    if canal and getattr(cuenta, f"uso_{canal}") + monto > getattr(cuenta, canal):
+        return LimiteExcedido()
+    return None
+
+
+async def ejecutar_con_reintentos(db, query, params):
+    """Ejecuta la primera sentencia de una transacción reintentando errores transitorios.
+
+    Al ser la primera sentencia, el rollback ante un deadlock o fallo de
+    serialización no descarta trabajo previo. Devuelve la primera fila.
+    """
+    for intento in range(1, SALDO_MAX_REINTENTOS + 1):
+        try:
+            return (await db.execute(query, params)).fetchone()
+        except DBAPIError as e:
+            if not _es_transitorio(e) or intento == SALDO_MAX_REINTENTOS:
+                raise
+            await db.rollback()
+            await asyncio.sleep(SALDO_BACKOFF_SEGUNDOS * 2 ** (intento - 1) * (1 + random.random()))
+
+
+async def mutar_saldo(db, cuenta_id, cliente_id, monto, signo, canal=None):
+    """Aplica ``signo * monto`` al saldo en una sola sentencia condicional.
+
+    El UPDATE sólo afecta la fila si la cuenta es del cliente, está activa, el
+    monto cabe en lo que queda del límite diario del canal y (en débitos) hay
+    saldo suficiente; la comprobación, el saldo y el contador de uso se
+    escriben juntos, sin SELECT previo ni FOR UPDATE.
+    Debe ser la primera sentencia de la transacción (ver ejecutar_con_reintentos).
+
+    Devuelve el nuevo saldo o lanza CuentaNoDisponible, LimiteExcedido o
+    SaldoInsuficiente.
+    """
+    dia = dia_limite()
+    params = {"cuenta_id": cuenta_id, "cliente_id": cliente_id, "monto": monto, "dia": dia}
+    fila = await ejecutar_con_reintentos(db, _CONSULTAS[(signo, canal)], params)
+    if fila is None:
+        raise await diagnosticar(db, cuenta_id, cliente_id, monto, signo, canal, dia) or SaldoInsuficiente()
+    return fila.cuenta_saldo
+
+
+async def acreditar(db, cuenta_id, cliente_id, monto, canal=None):
+    return await mutar_saldo(db, cuenta_id, cliente_id, monto, 1, canal)
+
+
+async def debitar(db, cuenta_id, cliente_id, monto, canal=None):
+    return await mutar_saldo(db, cuenta_id, cliente_id, monto, -1, canal)
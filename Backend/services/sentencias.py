@@ -0,0 +1,291 @@
+"""Sentencias SQL de los endpoints de main.py, construidas una sola vez al importar.
+
+Los text() de nivel de módulo conservan su cache key memoizada, así que en
+cada petición SQLAlchemy encuentra el SQL compilado sin volver a parsear el
+texto, y psycopg recibe siempre el mismo string (ver DB_PREPARE_THRESHOLD en
+config.database) para usar sentencias preparadas del lado del servidor. Las
+consultas de los servicios viven en sus módulos: las fijas como constantes y
+las que dependen de los filtros (historial y exportación en
+services.transacciones) memoizadas por forma, igual que sentencia_actualizar.
+"""
+from functools import lru_cache
+from sqlalchemy.sql import text
+from services.escrituras import (
+    set_clause, CLIENTE_RETURNING, TARJETA_CREDITO_COLUMNAS, TARJETA_CREDITO_RETURNING, tarjeta_credito_returning
+)
+
+EXISTE_CLIENTE = text("SELECT 1 FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
+
+CLIENTE_POR_ID = text("SELECT * FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
+
+ACTUALIZAR_CONTRASENA = text("UPDATE CLIENTE SET cliente_contrasena = :password WHERE CLIENTE_ID = :cliente_id")
+
+INSERTAR_CLIENTE = text("""
+    INSERT INTO CLIENTE (
+        CLIENTE_ID, CLIENTE_NOMBRES, CLIENTE_APELLIDOS, CLIENTE_CORREO,
+        CLIENTE_CELULAR, CLIENTE_DIRECCION, CLIENTE_PROVINCIA,
+        CLIENTE_CIUDAD, CLIENTE_FCHNACIMIENTO, CLIENTE_CONTRASENA
+    ) VALUES (
+        :cliente_id, :nombres, :apellidos, :correo, :celular,
+        :direccion, :provincia, :ciudad, :fchnacimiento, :contrasena
+    ) RETURNING *
+""")
+
+ELIMINAR_CLIENTE = text("DELETE FROM CLIENTE WHERE CLIENTE_ID = :cliente_id")
+
+INSERTAR_CUENTA = text("""
+    INSERT INTO CUENTA (
+        CUENTA_ID, CLIENTE_ID, CUENTA_NOMBRE, CUENTA_SALDO,
+        CUENTA_APERTURA, CUENTA_ESTADO, CUENTA_LIMITE_TRANS_WEB,
+        CUENTA_LIMITE_TRANS_MOVIL
+    ) VALUES (
+        :cuenta_id, :cliente_id, :nombre, :saldo, :apertura,
+        :estado, :limite_web, :limite_movil
+    ) RETURNING *
+""")
+
+CUENTA_POR_ID = text("SELECT * FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
+
+CUENTAS_POR_CLIENTE = text("SELECT * FROM CUENTA WHERE CLIENTE_ID = :cliente_id")
+
+CLIENTE_DE_CUENTA = text("SELECT CLIENTE_ID AS cliente_id FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
+
+ELIMINAR_CUENTA = text("DELETE FROM CUENTA WHERE CUENTA_ID = :cuenta_id")
+
+INSERTAR_CAJERO = text("""
+    INSERT INTO CAJERO (
+        CAJERO_ID, CAJERO_UBICACION, CAJERO_TIPO, CAJERO_ESTADO,
+        CAJERO_LATITUD, CAJERO_LONGITUD
+    ) VALUES (
+        :cajero_id, :ubicacion, :tipo, :estado, :latitud, :longitud
+    ) RETURNING *
+""")
+
+CAJERO_POR_ID = text("SELECT * FROM CAJERO WHERE CAJERO_ID = :cajero_id")
+
+ELIMINAR_CAJERO = text("DELETE FROM CAJERO WHERE CAJERO_ID = :cajero_id")
+
+INSERTAR_TARJETA = text("""
+    INSERT INTO TARJETA (
+        TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
+        TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO,
+        TARJETA_CVV, TARJETA_ESTILO
+    ) VALUES (
+        :tarjeta_id, :cuenta_id, :nombre, :pin_seguridad, :fecha_caducidad,
+        :fecha_emision, :estado, :cvv, :estilo
+    ) RETURNING *
+""")
+
+TARJETAS_POR_CUENTA = text("""
+    SELECT t.* FROM TARJETA t
+    JOIN CUENTA c ON t.CUENTA_ID = c.CUENTA_ID
+    WHERE t.CUENTA_ID = :cuenta_id AND c.CLIENTE_ID = :cliente_id
+""")
+
+TARJETA_DEL_CLIENTE = text("""
+    SELECT t.* FROM TARJETA t
+    JOIN CUENTA c ON t.CUENTA_ID = c.CUENTA_ID
+    WHERE t.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
+""")
+
+ELIMINAR_TARJETA = text("DELETE FROM TARJETA WHERE TARJETA_ID = :tarjeta_id")
+
+INSERTAR_TARJETA_CREDITO = text(f"""
+    INSERT INTO TARJETA_DE_CREDITO (
+        TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
+        TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO,
+        TARJETA_CVV, TARJETA_ESTILO, TARJETACREDITO_CUPO,
+        TARJETA_CREDITO_PAGO_MINIMO, TARJETA_CREDITO_PAGO_TOTAL
+    ) VALUES (
+        :tarjeta_id, :cuenta_id, :nombre, :pin_seguridad, :fecha_caducidad,
+        :fecha_emision, :estado, :cvv, :estilo, :cupo, :pago_minimo, :pago_total
+    ) RETURNING {TARJETA_CREDITO_RETURNING}
+""")
+
+TARJETAS_CREDITO_POR_CUENTA = text("""
+    SELECT
+        tc.TARJETA_ID AS tarjeta_id,
+        tc.CUENTA_ID AS cuenta_id,
+        tc.TARJETA_NOMBRE AS tarjeta_nombre,
+        tc.TARJETA_PIN_SEGURIDAD AS tarjeta_pin_seguridad,
+        tc.TARJETA_FECHA_CADUCIDAD AS tarjeta_fecha_caducidad,
+        tc.TARJETA_FECHA_EMISION AS tarjeta_fecha_emision,
+        tc.TARJETA_ESTADO AS tarjeta_estado,
+        tc.TARJETA_CVV AS tarjeta_cvv,
+        tc.TARJETA_ESTILO AS tarjeta_estilo,
+        tc.TARJETACREDITO_CUPO AS tarjetacredito_cupo,
+        tc.TARJETA_CREDITO_PAGO_MINIMO AS tarjetacredito_pago_minimo,
+        tc.TARJETA_CREDITO_PAGO_TOTAL AS tarjeta_credito_pago_total
+    FROM TARJETA_DE_CREDITO tc
+    JOIN CUENTA c ON tc.CUENTA_ID = c.CUENTA_ID
+    WHERE tc.CUENTA_ID = :cuenta_id AND c.CLIENTE_ID = :cliente_id
+""")
+
+TARJETA_CREDITO_DEL_CLIENTE = text("""
+    SELECT
+        tc.TARJETA_ID AS tarjeta_id,
+        tc.CUENTA_ID AS cuenta_id,
+        tc.TARJETA_NOMBRE AS tarjeta_nombre,
+        tc.TARJETA_PIN_SEGURIDAD AS tarjeta_pin_seguridad,
+        tc.TARJETA_FECHA_CADUCIDAD AS tarjeta_fecha_caducidad,
+        tc.TARJETA_FECHA_EMISION AS tarjeta_fecha_emision,
+        tc.TARJETA_ESTADO AS tarjeta_estado,
+        tc.TARJETA_CVV AS tarjeta_cvv,
+        tc.TARJETA_ESTILO AS tarjeta_estilo,
+        tc.TARJETACREDITO_CUPO AS tarjetacredito_cupo,
+        tc.TARJETA_CREDITO_PAGO_MINIMO AS tarjetacredito_pago_minimo,
+        tc.TARJETA_CREDITO_PAGO_TOTAL AS tarjeta_credito_pago_total
+    FROM TARJETA_DE_CREDITO tc
+    JOIN CUENTA c ON tc.CUENTA_ID = c.CUENTA_ID
+    WHERE tc.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
+""")
+
+FILA_TARJETA_CREDITO_DEL_CLIENTE = text("""
+    SELECT tc.* FROM TARJETA_DE_CREDITO tc
+    JOIN CUENTA c ON tc.CUENTA_ID = c.CUENTA_ID
+    WHERE tc.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
+""")
+
+ELIMINAR_TARJETA_CREDITO = text("DELETE FROM TARJETA_DE_CREDITO WHERE TARJETA_ID = :tarjeta_id")
+
+INSERTAR_TARJETA_DEBITO = text("""
+    INSERT INTO TARJETA_DE_DEBITO (
+        TARJETA_ID, CUENTA_ID, TARJETA_NOMBRE, TARJETA_PIN_SEGURIDAD,
+        TARJETA_FECHA_CADUCIDAD, TARJETA_FECHA_EMISION, TARJETA_ESTADO,
+        TARJETA_CVV, TARJETA_ESTILO
+    ) VALUES (
+        :tarjeta_id, :cuenta_id, :nombre, :pin_seguridad, :fecha_caducidad,
+        :fecha_emision, :estado, :cvv, :estilo
+    ) RETURNING *
+""")
+
+TARJETAS_DEBITO_POR_CUENTA = text("""
+    SELECT td.* FROM TARJETA_DE_DEBITO td
+    JOIN CUENTA c ON td.CUENTA_ID = c.CUENTA_ID
+    WHERE td.CUENTA_ID = :cuenta_id AND c.CLIENTE_ID = :cliente_id
+""")
+
+TARJETA_DEBITO_DEL_CLIENTE = text("""
+    SELECT td.* FROM TARJETA_DE_DEBITO td
+    JOIN CUENTA c ON td.CUENTA_ID = c.CUENTA_ID
+    WHERE td.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
+""")
+
+ELIMINAR_TARJETA_DEBITO = text("DELETE FROM TARJETA_DE_DEBITO WHERE TARJETA_ID = :tarjeta_id")
+
+CUENTA_DEL_CLIENTE = text("""
+    SELECT CUENTA_ID AS cuenta_id, CLIENTE_ID AS cliente_id
+    FROM CUENTA
+    WHERE CUENTA_ID = :cuenta_id AND CLIENTE_ID = :cliente_id
+""")
+
+EXISTE_CUENTA_DEL_CLIENTE = text("SELECT 1 FROM CUENTA WHERE CUENTA_ID = :cuenta_id AND CLIENTE_ID = :cliente_id")
+
+INSERTAR_TRANSACCION = text("""
+    INSERT INTO TRANSACCION (
+        TRANSACCION_ID,
+        CUENTA_ID,
+        TIPO,
+        TRANSACCION_MONTO,
+        TRANSACCION_COSTO,
+        TRANSACCION_FECHA,
+        TRANSACCION_DESCRIPCION,
+        TRANSACCION_RECIBO
+    )
+    VALUES (
+        :transaccion_id,
+        :cuenta_id,
+        :transaccion_tipo,
+        :transaccion_monto,
+        :transaccion_costo,
+        :transaccion_fecha,
+        :transaccion_descripcion,
+        :transaccion_recibo
+    )
+    RETURNING *
+""")
+
+INSERTAR_RETIRO = text("""
+    INSERT INTO RETIRO (
+        TRANSACCION_ID,
+        CUENTA_ID,
+        TRANSACCION_COSTO,
+        TRANSACCION_FECHA,
+        TRANSACCION_RECIBO,
+        RETIRO_MONTO,
+        RETIRO_MONTO_MAX
+    ) VALUES (
+        :transaccion_id,
+        :cuenta_id,
+        :transaccion_costo,
+        :transaccion_fecha,
+        :transaccion_recibo,
+        :retiro_monto,
+        :retiro_monto_max
+    )
+""")
+
+INSERTAR_RETIRO_SIN_TARJETA = text("""
+    INSERT INTO RETIRO_SIN_TARJETA (
+        TRANSACCION_ID,
+        CUENTA_ID,
+        TRANSACCION_COSTO,
+        TRANSACCION_FECHA,
+        TRANSACCION_RECIBO,
+        RETIRO_MONTO,
+        RETIRO_MONTO_MAX,
+        RETIROST_CELULAR_BENEFICIARIO,
+        RETIROST_CLAVE,
+        RETIROST_DURACION,
+        RETIROST_MAXIMO_RETIROS
+    ) VALUES (
+        :transaccion_id,
+        :cuenta_id,
+        :transaccion_costo,
+        :transaccion_fecha,
+        :transaccion_recibo,
+        :retiro_monto,
+        :retiro_monto_max,
+        :celular_beneficiario,
+        :retirost_clave,
+        :duracion,
+        :maximo_retiros
+    )
+""")
+
+# UPDATE parciales de los endpoints actualizar_*: {set} son las columnas enviadas
+ACTUALIZAR = {
+    "cliente": (f"UPDATE CLIENTE SET {{set}} WHERE CLIENTE_ID = :cliente_id RETURNING {CLIENTE_RETURNING}", None),
+    "cuenta": ("UPDATE CUENTA SET {set} WHERE CUENTA_ID = :cuenta_id RETURNING *", None),
+    "cajero": ("UPDATE CAJERO SET {set} WHERE CAJERO_ID = :cajero_id RETURNING *", None),
+    # La propiedad de la tarjeta se valida en la misma sentencia (JOIN con CUENTA)
+    "tarjeta": ("""
+        UPDATE TARJETA t SET {set}
+        FROM CUENTA c
+        WHERE t.CUENTA_ID = c.CUENTA_ID AND t.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
+        RETURNING t.*
+    """, None),
+    "tarjeta_credito": (f"""
+        UPDATE TARJETA_DE_CREDITO t SET {{set}}
+        FROM CUENTA c
+        WHERE t.CUENTA_ID = c.CUENTA_ID AND t.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
+        RETURNING {tarjeta_credito_returning("t")}
+    """, TARJETA_CREDITO_COLUMNAS),
+    "tarjeta_debito": ("""
+        UPDATE TARJETA_DE_DEBITO t SET {set}
+        FROM CUENTA c
+        WHERE t.CUENTA_ID = c.CUENTA_ID AND t.TARJETA_ID = :tarjeta_id AND c.CLIENTE_ID = :cliente_id
+        RETURNING t.*
+    """, None),
+}
+
+
+@lru_cache(maxsize=256)
+def sentencia_actualizar(entidad, columnas):
+    """UPDATE de ``entidad`` para una tupla de columnas; se construye una vez por combinación.
+
+    Las columnas son los campos del esquema Pydantic enviados en la petición,
+    así que las combinaciones posibles son pocas y siempre en el mismo orden.
+    """
+    plantilla, mapeo = ACTUALIZAR[entidad]
+    return text(plantilla.format(set=set_clause(columnas, mapeo)))
@@ -0,0 +1,246 @@
+import asyncio
+import base64
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, date
+from decimal import Decimal
+from functools import lru_cache
+from sqlalchemy.sql import text
+from config.database import AsyncSessionLocal
+from services.archivo import archivo_historial, utc
+
+# Límite por defecto y máximo de filas por página del historial
+TRANSACCIONES_LIMITE_DEFECTO = 50
+TRANSACCIONES_LIMITE_MAXIMO = 500
+
+TRANSACCION_COLUMNAS = """
+        TRANSACCION_ID AS transaccion_id,
+        CUENTA_ID AS cuenta_id,
+        TIPO AS transaccion_tipo,
+        TRANSACCION_MONTO AS transaccion_monto,
+        TRANSACCION_COSTO AS transaccion_costo,
+        TRANSACCION_FECHA AS transaccion_fecha,
+        TRANSACCION_DESCRIPCION AS transaccion_descripcion,
+        TRANSACCION_RECIBO AS transaccion_recibo
+"""
+EXPORT_CAMPOS = [
+    "transaccion_id", "cuenta_id", "transaccion_tipo", "transaccion_monto",
+    "transaccion_costo", "transaccion_fecha", "transaccion_descripcion", "transaccion_recibo",
+]
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(transaccion_fecha, transaccion_id):
+    crudo = f"{transaccion_fecha.isoformat()}|{transaccion_id}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        fecha, transaccion_id = crudo.split("|", 1)
+        return datetime.fromisoformat(fecha), transaccion_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise CursorInvalido("Cursor de paginación inválido") from e
+
+
+def filtros_transacciones(cuenta_id, desde=None, hasta=None, tipo=None, monto_min=None, monto_max=None):
+    """Condiciones WHERE y parámetros comunes a historial y exportación.
+
+    Si hay meses archivados (services.archivo) la base sólo aporta las filas
+    desde la frontera del archivo; las anteriores se leen de los Parquet.
+    """
+    condiciones = ["CUENTA_ID = :cuenta_id"]
+    params = {"cuenta_id": cuenta_id}
+    archivado_hasta = archivo_historial.limite()
+    if archivado_hasta is not None:
+        condiciones.append("TRANSACCION_FECHA >= :archivado_hasta")
+        params["archivado_hasta"] = archivado_hasta
+    if desde is not None:
+        condiciones.append("TRANSACCION_FECHA >= :desde")
+        params["desde"] = desde
+    if hasta is not None:
+        condiciones.append("TRANSACCION_FECHA < :hasta")
+        params["hasta"] = hasta
+    if tipo is not None:
+        condiciones.append("TIPO = :tipo")
+        params["tipo"] = tipo
+    if monto_min is not None:
+        condiciones.append("TRANSACCION_MONTO >= :monto_min")
+        params["monto_min"] = monto_min
+    if monto_max is not None:
+        condiciones.append("TRANSACCION_MONTO <= :monto_max")
+        params["monto_max"] = monto_max
+    return condiciones, params
+
+
+def consulta_pagina_transacciones(cuenta_id, limit, cursor=None, **filtros):
+    """Página del historial ordenada por (fecha, id) descendente.
+
+    Usa paginación keyset sobre el índice (CUENTA_ID, TRANSACCION_FECHA,
+    TRANSACCION_ID), así que el costo no depende de cuán atrás esté la página.
+    Se pide una fila extra para saber si existe una página siguiente.
+
+    TRANSACCION está particionada por mes de TRANSACCION_FECHA: el orden por
+    fecha permite recorrer las particiones de la más nueva a la más vieja y
+    cortar en el LIMIT, y la cota simple sobre la fecha del cursor (la
+    comparación de tuplas no sirve para podar) descarta los meses posteriores.
+    """
+    condiciones, params = filtros_transacciones(cuenta_id, **filtros)
+    if cursor:
+        cursor_fecha, cursor_id = decodificar_cursor(cursor)
+        condiciones.append("TRANSACCION_FECHA <= :cursor_fecha")
+        condiciones.append("(TRANSACCION_FECHA, TRANSACCION_ID) < (:cursor_fecha, :cursor_id)")
+        params["cursor_fecha"] = cursor_fecha
+        params["cursor_id"] = cursor_id
+    params["limit"] = limit + 1
+    return sentencia_pagina(tuple(condiciones)), params
+
+
+# Una sentencia por combinación de filtros (y cursor): son pocas y el text()
+# reutilizado conserva su cache key y el SQL compilado entre peticiones
+@lru_cache(maxsize=128)
+def sentencia_pagina(condiciones):
+    return text(f"""
+    SELECT {TRANSACCION_COLUMNAS}
+    FROM TRANSACCION
+    WHERE {" AND ".join(condiciones)}
+    ORDER BY TRANSACCION_FECHA DESC, TRANSACCION_ID DESC
+    LIMIT :limit
+""")
+
+
+def alcanza_archivo(params, desde=None):
+    """True si la consulta (con sus parámetros ya armados) llega a meses archivados."""
+    archivado_hasta = params.get("archivado_hasta")
+    return archivado_hasta is not None and (desde is None or utc(desde) < archivado_hasta)
+
+
+async def pagina_transacciones(db, cuenta_id, limit, cursor=None, **filtros):
+    """Página del historial (hasta limit + 1 filas, como dicts) uniendo base y archivo.
+
+    Las filas de la base son todas posteriores a la frontera del archivo, así
+    que si la base no completa la página se sigue con los meses archivados.
+    """
+    query, params = consulta_pagina_transacciones(cuenta_id, limit, cursor, **filtros)
+    result = await db.execute(query, params)
+    filas = [tuple(fila) for fila in result.fetchall()]
+    faltan = limit + 1 - len(filas)
+    if faltan > 0 and alcanza_archivo(params, filtros.get("desde")):
+        antes = decodificar_cursor(cursor) if cursor else None
+        filas += await asyncio.to_thread(
+            archivo_historial.leer_cuenta, cuenta_id, EXPORT_CAMPOS, faltan, antes, **filtros
+        )
+    return [dict(zip(EXPORT_CAMPOS, fila)) for fila in filas]
+
+
+async def lotes_archivados(cuenta_id, **filtros):
+    """Filas archivadas de la cuenta en orden cronológico, un mes por lote."""
+    for mes in archivo_historial.meses(filtros.get("desde"), filtros.get("hasta"), descendente=False):
+        filas = await asyncio.to_thread(archivo_historial.leer_mes, cuenta_id, mes, EXPORT_CAMPOS, **filtros)
+        if filas:
+            yield filas
+
+
+# Filas por lote al leer con cursor del lado del servidor durante la exportación
+EXPORT_YIELD_PER = 1000
+
+
+def consulta_exportacion_transacciones(cuenta_id, **filtros):
+    """Historial completo en orden cronológico, para leerse con stream_results."""
+    condiciones, params = filtros_transacciones(cuenta_id, **filtros)
+    return sentencia_exportacion(tuple(condiciones)), params
+
+
+@lru_cache(maxsize=64)
+def sentencia_exportacion(condiciones):
+    return text(f"""
+    SELECT {TRANSACCION_COLUMNAS}
+    FROM TRANSACCION
+    WHERE {" AND ".join(condiciones)}
+    ORDER BY TRANSACCION_FECHA, TRANSACCION_ID
+""")
+
+
+def _valor_json(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def serializar_ndjson(filas):
+    return "".join(
+        json.dumps(dict(zip(EXPORT_CAMPOS, fila)), default=_valor_json, ensure_ascii=False) + "\n"
+        for fila in filas
+    )
+
+
+def serializar_csv(filas, encabezado=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if encabezado:
+        writer.writerow(EXPORT_CAMPOS)
+    writer.writerows(
+        [v.isoformat() if isinstance(v, datetime) else v for v in fila] for fila in filas
+    )
+    return buffer.getvalue()
+
+
+def acepta_gzip(accept_encoding):
+    """Si la cabecera Accept-Encoding admite gzip: por nombre exacto o por ``*``, con q > 0."""
+    calidades = {}
+    for elemento in (accept_encoding or "").split(","):
+        codificacion, *parametros = [parte.strip() for parte in elemento.split(";")]
+        if not codificacion:
+            continue
+        q = 1.0
+        for parametro in parametros:
+            nombre, _, valor = parametro.partition("=")
+            if nombre.strip().lower() == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        calidades[codificacion.lower()] = q
+    return calidades.get("gzip", calidades.get("*", 0.0)) > 0
+
+
+async def exportar_transacciones(query, params, formato="ndjson", comprimir=False, archivados=None):
+    """Genera el extracto lote a lote con memoria constante.
+
+    ``archivados`` (ver lotes_archivados) aporta primero los meses archivados,
+    que son todos anteriores a las filas de la base.
+
+    Abre su propia sesión: la sesión de la dependencia get_async_db ya está
+    cerrada cuando StreamingResponse empieza a iterar este generador.
+    """
+    compresor = zlib.compressobj(wbits=31) if comprimir else None
+
+    def codificar(filas):
+        texto = serializar_csv(filas) if formato == "csv" else serializar_ndjson(filas)
+        chunk = texto.encode()
+        return compresor.compress(chunk) if compresor else chunk
+
+    if formato == "csv":
+        chunk = serializar_csv([], encabezado=True).encode()
+        yield compresor.compress(chunk) if compresor else chunk
+    if archivados is not None:
+        async for filas in archivados:
+            chunk = codificar(filas)
+            if chunk:
+                yield chunk
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query, params, execution_options={"yield_per": EXPORT_YIELD_PER})
+        async for filas in result.partitions():
+            chunk = codificar(filas)
+            if chunk:
+                yield chunk
+    if compresor:
+        yield compresor.flush()